@@ -13,6 +13,7 @@ from __future__ import print_function
 # plugin imports
 from .abstract_api import JsonSettings
 from .m3u import M3UProvider
+from . import catchup
 from ..utils import APILoginFailed
 try:
 	from ..loc import translate as _
@@ -24,6 +25,7 @@ except ImportError:
 class OTTProvider(JsonSettings, M3UProvider):
 	NAME = "1ott"
 	AUTH_TYPE = "Login"
+	CATCHUP = catchup.ARCHIVE
 
 	def __init__(self, username, password):
 		super(OTTProvider, self).__init__(username, password)
@@ -35,9 +37,3 @@ class OTTProvider(JsonSettings, M3UProvider):
 		if not token:
 			raise APILoginFailed(_("Wrong number or pin"))
 		self.playlist_url = 'http://list.1ott.net/api/%s/high/ottplay.m3u' % token
-
-	def getStreamUrl(self, cid, pin, time=None):
-		url = self.channels_data[cid]['url']
-		if time:
-			url += '?archive=%s' % time.strftime('%s')
-		return url
@@ -16,6 +16,7 @@ from datetime import datetime
 # plugin imports
 from .abstract_api import JsonSettings
 from .m3u import M3UProvider
+from . import catchup
 from ..utils import APILoginFailed, ConfSelection
 try:
 	from ..loc import translate as _
@@ -27,6 +28,7 @@ except ImportError:
 class OTTProvider(JsonSettings, M3UProvider):
 	NAME = "73mtv"
 	AUTH_TYPE = "Login"
+	CATCHUP = catchup.ARCHIVE
 
 	def __init__(self, username, password):
 		super(OTTProvider, self).__init__(username, password)
@@ -48,12 +50,6 @@ class OTTProvider(JsonSettings, M3UProvider):
 		except (IndexError, KeyError):
 			return
 
-	def getStreamUrl(self, cid, pin, time=None):
-		url = self.channels_data[cid]['url']
-		if time:
-			url += '?archive=%s' % time.strftime('%s')
-		return url
-
 	def getLocalSettings(self):
 		settings = {
 			'format': ConfSelection(_("Streaming format"), 'm3u8', [('m3u', "TS"), ('m3u8', "HLS")])
@@ -17,13 +17,18 @@ from six.moves import http_cookiejar, urllib_request, urllib_parse
 from json import loads as json_loads
 from os import path as os_path
 from datetime import datetime
+from time import time
+from collections import OrderedDict
+from threading import Lock, RLock, Thread
+from email.utils import parsedate_tz, mktime_tz
 try:
-	from typing import Dict  # pylint: disable=unused-import
+	from typing import Dict, List, Optional, Tuple  # pylint: disable=unused-import
 except ImportError:
 	pass
 
 from ..utils import getHwAddr, Group, Channel, APIException, APILoginFailed, EPG, u2str
 from ..dist import VERSION, EPGSERVER
+from .. import perf
 
 MODE_STREAM = 0
 MODE_VIDEOS = 1
@@ -34,6 +39,133 @@ def renameDict(d, keys):
 		d[new] = d.pop(old)
 
 
+def responseTtl(headers):
+	"""Seconds the response can be reused according to Cache-Control and Expires headers"""
+	cache_control = (headers.get('Cache-Control') or '').lower()
+	if 'no-store' in cache_control or 'no-cache' in cache_control:
+		return 0
+	for directive in cache_control.split(','):
+		name, _sep, value = directive.strip().partition('=')
+		if name == 'max-age':
+			try:
+				return int(value)
+			except ValueError:
+				return 0
+	expires = headers.get('Expires')
+	if expires:
+		parsed = parsedate_tz(expires)
+		if parsed:
+			return int(mktime_tz(parsed) - time())
+	return 0
+
+
+class HttpCache(object):
+	"""
+	Thread safe LRU cache of http responses, limited by total size of responses in bytes.
+	"""
+
+	def __init__(self, max_bytes):
+		self.max_bytes = max_bytes
+		self.size = 0
+		self.hits = 0
+		self.misses = 0
+		self._data = OrderedDict()  # key -> (expire time, reply)
+		self._lock = Lock()
+
+	def get(self, key):
+		with self._lock:
+			try:
+				expire, reply = self._data.pop(key)
+			except KeyError:
+				self.misses += 1
+				return None
+			if expire <= time():
+				self.size -= len(reply)
+				self.misses += 1
+				return None
+			self._data[key] = (expire, reply)
+			self.hits += 1
+			return reply
+
+	def put(self, key, reply, ttl):
+		if ttl <= 0 or len(reply) > self.max_bytes:
+			return
+		with self._lock:
+			self._pop(key)
+			self._data[key] = (time() + ttl, reply)
+			self.size += len(reply)
+			while self.size > self.max_bytes:
+				_key, (_expire, old) = self._data.popitem(last=False)
+				self.size -= len(old)
+
+	def _pop(self, key):
+		try:
+			self.size -= len(self._data.pop(key)[1])
+		except KeyError:
+			pass
+
+	def drop(self, key):
+		with self._lock:
+			self._pop(key)
+
+	def dropMatching(self, predicate):
+		"""Remove all entries whose key satisfies predicate"""
+		with self._lock:
+			for key in [k for k in self._data if predicate(k)]:
+				self._pop(key)
+
+	def clear(self):
+		with self._lock:
+			self._data.clear()
+			self.size = 0
+
+	def hitRate(self):
+		total = self.hits + self.misses
+		return float(self.hits) / total if total else 0.
+
+	def stats(self):
+		return {
+			'entries': len(self._data), 'bytes': self.size, 'max_bytes': self.max_bytes,
+			'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hitRate(),
+		}
+
+
+# Responses shared by all provider instances, so UI and proxy server don't download the same data twice
+http_cache = HttpCache(4 * 1024 * 1024)
+
+
+class CurrentEpgCache(object):
+	"""
+	Responses of "current epg for all channels" endpoints, keyed by endpoint.
+	Response is fresh until the earliest end of programs in it,
+	so requests for other channels within this window don't download it again.
+	"""
+
+	def __init__(self):
+		self._data = {}  # type: Dict[str, Tuple[datetime, Dict[int, List[EPG]]]]
+
+	def get(self, endpoint):
+		"""Return dict of cid to programs if response is still fresh, otherwise None"""
+		try:
+			expire, epg = self._data[endpoint]
+		except KeyError:
+			return None
+		if datetime.now() < expire:
+			return epg
+		del self._data[endpoint]
+		return None
+
+	def put(self, endpoint, epg):
+		now = datetime.now()
+		ends = [p.end for programs in epg.values() for p in programs if p.end > now]
+		if ends:
+			self._data[endpoint] = (min(ends), epg)
+		return epg
+
+	def clear(self):
+		self._data.clear()
+
+
 class AbstractAPI(object):
 	MODE = MODE_STREAM
 	PROVIDER = "free"
@@ -44,6 +176,12 @@ class AbstractAPI(object):
 	HAS_PIN = False
 	USE_SEEK = True
 	AUTH_TYPE = "Login"
+	# Response cache is opt-in. When HTTP_CACHE is True responses are reused according to Cache-Control/Expires.
+	# HTTP_CACHE_TTL maps part of url to seconds and overrides response headers for matching urls.
+	HTTP_CACHE = False
+	HTTP_CACHE_TTL = {}  # type: Dict[str, int]
+	# Stream url may be given to several clients of the proxy for a short time. False for single-use urls.
+	SHARED_URL = True
 
 	def __init__(self, username, password):
 		# type: (str, str) -> None
@@ -52,6 +190,8 @@ class AbstractAPI(object):
 		self.sid = None
 		self.packet_expire = None
 		self.settings = {}
+		# held around calls that may run in a background thread and in the main thread at the same time
+		self.lock = RLock()
 
 		socket.setdefaulttimeout(10)
 		self.uuid = getHwAddr('eth0')
@@ -100,18 +240,78 @@ class AbstractAPI(object):
 		"""Save local settings"""
 		pass
 
+	def _cacheable(self, request):
+		return self.HTTP_CACHE or any(part in request for part in self.HTTP_CACHE_TTL)
+
+	def _cacheTtl(self, request, headers):
+		for part, ttl in self.HTTP_CACHE_TTL.items():
+			if part in request:
+				return ttl
+		if self.HTTP_CACHE:
+			return responseTtl(headers)
+		return 0
+
+	def _cacheKey(self, request):
+		# Responses can depend on account, so they are not shared between users
+		return self.username, request
+
+	def dropHttpCache(self, part):
+		"""Forget cached responses of urls that contain part, call after changing data on server"""
+		http_cache.dropMatching(lambda key: key[0] == self.username and part in key[1])
+
+	@perf.timed('api.readHttp')
 	def readHttp(self, request):
+		use_cache = self._cacheable(request)
+		if use_cache:
+			reply = http_cache.get(self._cacheKey(request))
+			if reply is not None:
+				perf.count('api.readHttp.cached')
+				return reply
 		try:
 			o = self.urlopener.open(request.replace("technic.cf", EPGSERVER))
 			enc = o.headers.get('Content-Encoding')
 			if enc and 'gzip' in enc:
 				reply = zlib.decompress(o.read(), 16+zlib.MAX_WBITS)
-				return reply
 			else:
-				return o.read()
+				reply = o.read()
 		except Exception as e:
 			self.trace("Failed to parse url - error %s" % str(e))
+			perf.count('api.readHttp.failed')
 			return b""
+		perf.count('api.readHttp.bytes', len(reply))
+		if use_cache and reply:
+			http_cache.put(self._cacheKey(request), reply, self._cacheTtl(request, o.headers))
+		return reply
+
+	def readHttpMany(self, requests, threads=None):
+		"""
+		Download independent urls concurrently, using at most threads connections if given.
+		Return list of replies in the same order, failed downloads are represented by exception instances.
+		"""
+		results = [None] * len(requests)
+		queue = enumerate(requests)
+		lock = Lock()
+
+		def read():
+			while True:
+				with lock:
+					try:
+						i, request = next(queue)
+					except StopIteration:
+						return
+				try:
+					results[i] = self.readHttp(request)
+				except Exception as e:  # pylint: disable=broad-except
+					results[i] = e
+
+		n = len(requests) if threads is None else min(threads, len(requests))
+		workers = [Thread(target=read) for _ in range(n - 1)]
+		for t in workers:
+			t.start()
+		read()
+		for t in workers:
+			t.join()
+		return results
 
 	def getData(self, url, params, name='', fromauth=None):
 		if not self.sid and not fromauth:
@@ -146,11 +346,13 @@ class AbstractAPI(object):
 			self.sid = None
 			raise APIException(e)
 		try:
-			json = json_loads(reply)
+			with perf.span('api.parseJson'):
+				json = json_loads(reply)
 		except Exception as e:
 			self.sid = None
 			raise APIException("Failed to parse json response: %s" % str(e))
 		if 'error' in json:
+			http_cache.drop(self._cacheKey(request))
 			self.sid = None
 			self.cookiejar.clear()
 			if reauthOnError and not fromauth:
@@ -299,8 +501,9 @@ class OfflineFavourites(AbstractStream):
 	def __init__(self, username, password):
 		super(OfflineFavourites, self).__init__(username, password)
 		self._favorites_file = self._resolveConfigurationFile('%s.txt' % self.NAME)
+		self._legacy_ids = None  # type: Optional[Dict[int, int]]
 
-	def getFavourites(self):
+	def _savedFavourites(self):
 		if not os_path.isfile(self._favorites_file):
 			return []
 		with open(self._favorites_file) as f:
@@ -309,6 +512,9 @@ class OfflineFavourites(AbstractStream):
 				return []
 			return [int(c) for c in data.split(',')]
 
+	def getFavourites(self):
+		return self._migrateFavourites(self._savedFavourites())
+
 	def uploadFavourites(self, current):
 		try:
 			with open(self._favorites_file, 'w') as f:
@@ -316,6 +522,32 @@ class OfflineFavourites(AbstractStream):
 		except Exception as e:
 			raise APIException(str(e))
 
+	def _legacyCids(self):
+		"""
+		Yield (key, cid) for channels whose id was python hash() of key before ids became stable
+		"""
+		return ()
+
+	def _legacyIds(self):
+		"""Map ids saved by old versions to current ones. Built once, reset it to None when channels are loaded"""
+		if self._legacy_ids is None:
+			self._legacy_ids = dict((hash(key), cid) for key, cid in self._legacyCids())
+		return self._legacy_ids
+
+	def _migrateFavourites(self, favourites):
+		"""Replace ids saved by old versions with current ones and rewrite the file"""
+		if all(cid in self.channels for cid in favourites):
+			return favourites
+		legacy = self._legacyIds()
+		migrated = [legacy.get(cid, cid) for cid in favourites]
+		if migrated != favourites:
+			self.trace("Migrate favourites")
+			try:
+				self.uploadFavourites(migrated)
+			except APIException as e:
+				self.trace("Failed to save migrated favourites", e)
+		return migrated
+
 
 class JsonSettings(AbstractAPI):
 	def __init__(self, username, password):
@@ -27,6 +27,7 @@ except ImportError:
 class TeleportAPI(AbstractAPI):
 	PROVIDER = ""
 	NUMBER_PASS = False
+	HTTP_CACHE_TTL = {'/get_favorites_tv?': 5 * 60}
 	site = ""
 
 	def __init__(self, username, password):
@@ -145,6 +146,7 @@ class TeleportStream(AbstractStream, TeleportAPI):
 
 	def uploadFavourites(self, current):
 		self.getJsonData(self.site + "/set_favorites_tv?", {'val': ','.join(map(str, self.favourites))})
+		self.dropHttpCache("/get_favorites_tv?")
 
 	def getPiconUrl(self, cid):
 		return self.icons_url.replace("%ICON%", self.icons[cid])
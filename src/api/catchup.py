@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+#  enigma2 iptv player
+#
+#  Copyright (c) 2020 Alex Maystrenko <alexeytech@gmail.com>
+#
+# This is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation; either version 2, or (at your option) any later
+# version.
+
+"""
+Archive (catchup) url templates.
+Template is compiled once and getting archive url is a string fill without server requests.
+
+Placeholders are written as {name} or ${name}:
+	url - live stream url
+	sep - '&' if live url already has query, otherwise '?'
+	utc, start - unix time of archive position
+	lutc, now, timestamp - current unix time
+	offset - archive position relative to now, negative
+	duration - seconds, minutes - duration in minutes, utcend, end - utc + duration
+	Y, m, d, H, M, S - local time of archive position
+Unknown placeholders, like {catchup-id} of programme in guide, are removed.
+"""
+
+from __future__ import print_function
+
+import re
+
+from ..utils import syncTime, toTimestamp
+
+DURATION = 3 * 60 * 60  # seconds, when length of requested archive is unknown
+
+FIELDS = frozenset((
+	'url', 'sep', 'utc', 'start', 'lutc', 'now', 'timestamp', 'offset',
+	'duration', 'minutes', 'utcend', 'end', 'Y', 'm', 'd', 'H', 'M', 'S',
+))
+
+_placeholder = re.compile(r'\$?\{([\w-]+)\}')
+
+
+class CatchupTemplate(object):
+	__slots__ = ('pattern', 'replace', '_format')
+
+	def __init__(self, pattern, replace=None, fields=()):
+		"""
+		:param str pattern: archive url with placeholders
+		:param str|None replace: if given, only this part of live url is replaced by filled pattern
+		:param fields: names of extra placeholders passed to fill by provider
+		"""
+		self.pattern = pattern
+		self.replace = replace
+		known = FIELDS.union(fields)
+
+		def sub(m):
+			if m.group(1) in known:
+				return '%%(%s)s' % m.group(1)
+			return ''
+		self._format = _placeholder.sub(sub, pattern.replace('%', '%%'))
+
+	def fill(self, url, time, duration=DURATION, **fields):
+		"""
+		:param str url: live stream url
+		:param datetime time: archive position
+		"""
+		start = toTimestamp(time)
+		now = toTimestamp(syncTime())
+		fields.update(
+			url=url, sep='&' if '?' in url else '?',
+			utc=start, start=start, lutc=now, now=now, timestamp=now, offset=start - now,
+			duration=duration, minutes=duration // 60, utcend=start + duration, end=start + duration,
+			Y=time.strftime('%Y'), m=time.strftime('%m'), d=time.strftime('%d'),
+			H=time.strftime('%H'), M=time.strftime('%M'), S=time.strftime('%S'),
+		)
+		archive = self._format % fields
+		if self.replace is not None:
+			return url.replace(self.replace, archive)
+		return archive
+
+	def __repr__(self):
+		return "CatchupTemplate(%r, %r)" % (self.pattern, self.replace)
+
+
+# Schemes used by providers
+UTC_LUTC = CatchupTemplate('{url}?utc={utc}&lutc={lutc}')
+UTC = CatchupTemplate('{url}?utc={utc}')
+ARCHIVE = CatchupTemplate('{url}?archive={utc}')
+OFFSET = CatchupTemplate('{url}{sep}offset={offset}')
+FLUSSONIC_HLS = CatchupTemplate('video-timeshift_abs-{utc}.m3u8', replace='video.m3u8')
+FLUSSONIC_TS = CatchupTemplate('timeshift_abs-{utc}.ts', replace='mpegts')
+FLUSSONIC_TS_DIR = CatchupTemplate('timeshift_abs/{utc}', replace='mpegts')
+
+# Schemes of catchup attribute in m3u playlists
+SHIFT = CatchupTemplate('{url}{sep}utc={utc}&lutc={lutc}')
+
+_flussonic_hls = re.compile(r'/([^/?]+)\.m3u8')
+_xtream = re.compile(r'^(https?://[^/]+)/(?:live/)?([^/]+)/([^/]+)/(\d+)\.(\w+)$')
+
+# Compiled templates shared by channels
+_compiled = {}
+
+
+def _flussonic(url):
+	if '/mpegts' in url:
+		return FLUSSONIC_TS
+	m = _flussonic_hls.search(url)
+	if m:
+		name = m.group(1)
+		return CatchupTemplate('/%s-timeshift_abs-{utc}.m3u8' % name, replace='/%s.m3u8' % name)
+	return None
+
+
+def _xc(url):
+	m = _xtream.match(url)
+	if m:
+		host, user, password, stream, ext = m.groups()
+		return CatchupTemplate(
+			'%s/timeshift/%s/%s/{minutes}/{Y}-{m}-{d}:{H}-{M}/%s.%s' % (host, user, password, stream, ext))
+	return None
+
+
+def fromPlaylist(mode, source, url):
+	"""
+	Compile catchup and catchup-source attributes of m3u channel.
+	Return None if channel should use default scheme of provider.
+	"""
+	mode = (mode or '').lower()
+	if mode in ('flussonic', 'flussonic-hls', 'flussonic-ts', 'fs'):
+		return _flussonic(url)
+	if mode in ('xc', 'xtream'):
+		return _xc(url)
+	key = (mode, source)
+	try:
+		return _compiled[key]
+	except KeyError:
+		pass
+	if mode in ('shift', 'timeshift'):
+		template = SHIFT
+	elif mode == 'append' and source:
+		template = CatchupTemplate('{url}' + source)
+	elif mode in ('default', '') and source:
+		template = CatchupTemplate(source)
+	else:
+		template = None
+	_compiled[key] = template
+	return template
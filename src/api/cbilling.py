@@ -15,8 +15,9 @@ from six.moves import urllib_parse
 from json import loads as json_loads
 
 # plugin imports
-from .abstract_api import OfflineFavourites
-from ..utils import syncTime, APIException, APILoginFailed, EPG, Channel, Group, u2str
+from .abstract_api import OfflineFavourites, CurrentEpgCache
+from . import catchup
+from ..utils import stableHash, syncTime, APIException, APILoginFailed, EPG, Channel, Group, u2str
 
 try:
 	from ..loc import translate as _
@@ -36,6 +37,7 @@ class OTTProvider(OfflineFavourites):
 		self._token = password
 		self.web_names = {}
 		self.urls = {}
+		self._current_epg = CurrentEpgCache()
 
 	def start(self):
 		self.authorize()
@@ -69,6 +71,7 @@ class OTTProvider(OfflineFavourites):
 		self.parseChannels(data['channels'])
 
 	def parseChannels(self, channelsData):
+		self._legacy_ids = None
 		self.channels = {}
 		self.groups = {}
 		self.web_names = {}
@@ -84,17 +87,21 @@ class OTTProvider(OfflineFavourites):
 				group_names[group] = gid
 				g = self.groups[gid] = Group(gid, group, [])
 
-			cid = hash(ch['web_name'])
+			cid = stableHash(ch['web_name'])
 			c = Channel(cid, u2str(ch['name']), number, bool(ch['archive']), False)
 			self.channels[cid] = c
 			self.web_names[cid] = u2str(ch['web_name'])
 			self.urls[cid] = u2str(ch['url'])
 			g.channels.append(c)
 
+	def _legacyCids(self):
+		for cid, web_name in self.web_names.items():
+			yield web_name, cid
+
 	def getStreamUrl(self, cid, pin, time=None):
 		if time is None:
 			return self.urls[cid]
-		return self.urls[cid].replace('video.m3u8', 'video-timeshift_abs-%s.m3u8' % time.strftime('%s'))
+		return catchup.FLUSSONIC_HLS.fill(self.urls[cid], time)
 
 	def getDayEpg(self, cid, date):
 		data = self._getJson(self.api_site + "/epg/%s/?" % self.web_names[cid], {"date": date.strftime("%Y-%m-%d")})
@@ -104,9 +111,18 @@ class OTTProvider(OfflineFavourites):
 		]
 
 	def getChannelsEpg(self, cids):
-		data = self._getJson(self.api_site + "/epg/current", {})
-		for c in data:
-			yield hash(c['alias']), [
-				EPG(e['time'], e['time_to'], u2str(e['name']), u2str(e['descr']))
-				for e in c['epg']
-			]
+		url = self.api_site + "/epg/current"
+		epg = self._current_epg.get(url)
+		if epg is None:
+			data = self._getJson(url, {})
+			epg = self._current_epg.put(url, dict(
+				(stableHash(c['alias']), [
+					EPG(e['time'], e['time_to'], u2str(e['name']), u2str(e['descr']))
+					for e in c['epg']
+				]) for c in data
+			))
+		for cid in cids:
+			try:
+				yield cid, epg[cid]
+			except KeyError:
+				continue
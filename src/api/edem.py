@@ -14,7 +14,7 @@ from __future__ import print_function
 from json import loads as json_loads
 
 # plugin imports
-from .m3u import M3UProvider
+from .m3u import M3UProvider, ChannelData, urlCid
 from ..utils import Channel, APIException, u2str
 
 
@@ -53,5 +53,5 @@ class OTTProvider(M3UProvider):
 			except KeyError:
 				pass
 		else:
-			cid = hash(url)
-		return Channel(cid, name, num, rec), {'tvg': tvg, 'url': url, 'logo': logo}
+			cid = urlCid(url)
+		return Channel(cid, name, num, rec), ChannelData(tvg, url, logo)
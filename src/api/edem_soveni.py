@@ -13,7 +13,7 @@ from __future__ import print_function
 # plugin imports
 from .abstract_api import JsonSettings
 from ..utils import Channel
-from .m3u import M3UProvider
+from .m3u import M3UProvider, ChannelData, urlCid
 
 from ..utils import ConfSelection
 try:
@@ -50,7 +50,7 @@ class OTTProvider(JsonSettings, M3UProvider):
 		if m:
 			cid = int(m.group(1))
 		else:
-			cid = hash(url)
+			cid = urlCid(url)
 			self.trace("Failed to get cid from url", url)
 		url = url.replace("localhost", self._domain).replace("00000000000000", self._key)
-		return Channel(cid, name, num, True), {'tvg': tvg, 'url': url, 'logo': logo}
+		return Channel(cid, name, num, True), ChannelData(tvg, url, logo)
@@ -35,9 +35,10 @@ class OTTProvider(JsonSettings, M3UProvider):
 		self.playlist_url = "http://pl.fox-tv.fun/%s/%s/tv.m3u" % (username, password)
 
 	def start(self):
+		self._bootstrap(self.playlist_url)
 		self._downloadTvgMap()
 		try:
-			self._parsePlaylist(self.readHttp(self.playlist_url).split(b'\n'))
+			self._parsePlaylist(self._readBootstrapped(self.playlist_url).split(b'\n'))
 		except HTTPError as e:
 			self.trace("HTTPError:", e, type(e), e.getcode())
 			if e.code in (403, 404):
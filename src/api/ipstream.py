@@ -17,7 +17,7 @@ from json import loads as json_loads
 
 # plugin imports
 from .abstract_api import JsonSettings
-from .m3u import M3UProvider
+from .m3u import M3UProvider, ChannelData, urlCid
 from ..utils import APIException, APILoginFailed, Channel, u2str
 
 try:
@@ -64,9 +64,10 @@ class IpStreamOne(JsonSettings, M3UProvider):
 			raise APILoginFailed(_("Invalid key"))
 
 	def start(self):
+		self._bootstrap(self.playlist_url % self._token)
 		self._downloadTvgMap()
 		try:
-			self._parsePlaylist(self.readHttp(self.playlist_url % self._token).split(b'\n'))
+			self._parsePlaylist(self._readBootstrapped(self.playlist_url % self._token).split(b'\n'))
 		except HTTPError as e:
 			self.trace("HTTPError:", e, type(e), e.getcode())
 			if e.code in (403, 404):
@@ -78,7 +79,7 @@ class IpStreamOne(JsonSettings, M3UProvider):
 			raise APIException(e)
 
 	def makeChannel(self, num, name, url, tvg, logo, rec):
-		return Channel(hash(url), name, num, rec), {'tvg': tvg, 'url': url, 'logo': logo}
+		return Channel(urlCid(url), name, num, rec), ChannelData(tvg, url, logo)
 
 	def setChannelsList(self):
 		# Channels are downloaded during start, to allow handling login exceptions
@@ -15,7 +15,8 @@ import re
 
 # plugin imports
 from .abstract_api import JsonSettings
-from .m3u import M3UProvider
+from .m3u import M3UProvider, ChannelData, urlCid
+from .catchup import CatchupTemplate
 from ..utils import Channel, ConfSelection
 try:
 	from ..loc import translate as _
@@ -27,6 +28,7 @@ except ImportError:
 class OTTProvider(JsonSettings, M3UProvider):
 	NAME = "IPTV-E2-soveni"
 	TVG_MAP = True
+	CATCHUP = CatchupTemplate('{url}&utcstart={utc}')
 
 	def __init__(self, username, password):
 		super(OTTProvider, self).__init__(username, password)
@@ -45,16 +47,10 @@ class OTTProvider(JsonSettings, M3UProvider):
 		if m:
 			cid = int(m.group(1))
 		else:
-			cid = hash(url)
+			cid = urlCid(url)
 			self.trace("Failed to get cid from url", url)
 		url = url.replace("localhost", self._domain).replace("00000000000000", self._key)
-		return Channel(cid, name, num, name.endswith("(A)")), {'tvg': tvg, 'url': url, 'logo': logo}
-
-	def getStreamUrl(self, cid, pin, time=None):
-		url = self.channels_data[cid]['url']
-		if time:
-			url += '&utcstart=%s' % (time.strftime('%s'))
-		return url
+		return Channel(cid, name, num, name.endswith("(A)")), ChannelData(tvg, url, logo)
 
 	def getLocalSettings(self):
 		settings = {
@@ -17,6 +17,7 @@ from json import loads as json_loads, dumps as json_dumps
 
 # plugin imports
 from .abstract_api import OfflineFavourites
+from . import catchup
 from ..utils import syncTime, APIException, APILoginFailed, EPG, Channel, Group, u2str
 
 try:
@@ -75,7 +76,7 @@ class OTTProvider(OfflineFavourites):
 		url = self.channels_data[cid]['url']
 		if time is None:
 			return url
-		return url.replace('video.m3u8', 'video-timeshift_abs-%s.m3u8' % time.strftime('%s'))
+		return catchup.FLUSSONIC_HLS.fill(url, time)
 
 	def getChannelsEpg(self, cids):
 		req = '/epg/{"chid": [%s]}/1' % ",".join(
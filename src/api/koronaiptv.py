@@ -14,9 +14,10 @@ from __future__ import print_function
 from six.moves.urllib_error import HTTPError
 
 # plugin imports
-from .m3u import M3UProvider
+from .m3u import M3UProvider, ChannelData, urlCid
 from .abstract_api import JsonSettings
 from ..utils import APIException, APILoginFailed, Channel, Group, ConfSelection, b2str, str2u
+from .. import perf
 try:
 	from ..loc import translate as _
 except ImportError:
@@ -41,9 +42,10 @@ class Korona(JsonSettings, M3UProvider):
 		pass
 
 	def start(self):
+		self._bootstrap(self.playlist_url)
 		self._downloadTvgMap()
 		try:
-			self._parsePlaylist(self.readHttp(self.playlist_url).split(b'\n'))
+			self._parsePlaylist(self._readBootstrapped(self.playlist_url).split(b'\n'))
 		except HTTPError as e:
 			self.trace("HTTPError:", e, type(e), e.getcode())
 			if e.code in (403, 404):
@@ -54,6 +56,7 @@ class Korona(JsonSettings, M3UProvider):
 			self.trace("IOError:", e, type(e))
 			raise APIException(e)
 
+	@perf.timed('m3u.parsePlaylist')
 	def _parsePlaylist(self, lines):
 		# Copy of M3U class with some modifications
 		self.tvg_ids = {}
@@ -130,12 +133,12 @@ class Korona(JsonSettings, M3UProvider):
 
 				num += 1
 				if cid is None:
-					cid = hash(url)
+					cid = urlCid(url)
 				c = Channel(cid, name, num, archive)
 				self.channels[cid] = c
 				g.channels.append(c)
 
-				self.channels_data[cid] = {'tvg': tvg, 'url': url, 'logo': logo}
+				self.channels_data[cid] = ChannelData(tvg, url, logo)
 				if tvg is not None:
 					try:
 						self.tvg_ids[tvg].append(cid)
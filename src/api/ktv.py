@@ -8,9 +8,10 @@
 # Software Foundation; either version 2, or (at your option) any later
 # version.
 
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 from datetime import datetime, timedelta
 from hashlib import md5
+from time import time
 
 from .abstract_api import AbstractAPI, OfflineFavourites
 from ..utils import toDate, EPG, Channel, Group, APIWrongPin, u2str
@@ -73,10 +74,15 @@ class KartinaAPI(AbstractAPI):
 class KtvStream(OfflineFavourites, KartinaAPI):
 	HAS_PIN = True
 	icons_url = ""
+	DAY_CACHE_SIZE = 100  # channel days kept in memory
+	EMPTY_DAY_TTL = 5 * 60  # seconds, server may have no programs for the day yet
 
 	def __init__(self, username, password):
 		super(KtvStream, self).__init__(username, password)
-		self.day_ends = defaultdict(dict)
+		# Server gives only start times, end of the day's last program is the start of the next day
+		self.day_ends = defaultdict(dict)  # cid -> {toDate(day): end of the last program}
+		self._days = OrderedDict()  # (cid, toDate(day)) -> [(start, name, desc)]
+		self._empty_days = {}  # (cid, toDate(day)) -> time until the day is not requested again
 		self.icons = {}
 
 	@staticmethod
@@ -134,30 +140,42 @@ class KtvStream(OfflineFavourites, KartinaAPI):
 				e = (t, name, desc)
 			yield cid, programs
 
-	def getDayEpg(self, cid, date):
-		date = datetime(date.year, date.month, date.day)
+	def _loadDay(self, cid, date):
+		"""Return raw programs of the day, every day is downloaded once and fills the end of the previous day"""
+		key = (cid, toDate(date))
 		try:
-			t_end = self.day_ends[cid][toDate(date)]
+			programs = self._days.pop(key)
 		except KeyError:
-			programs = list(self._getDayEpg(cid, date + timedelta(1)))
-			try:
-				t_end, _, _ = programs[0]
-				self.day_ends[cid][toDate(date)] = t_end
-			except IndexError:
-				t_end = None
-
-		programs = list(self._getDayEpg(cid, date))
-		try:
-			t_start, _, _ = programs[0]
-			self.day_ends[cid][date - timedelta(1)] = t_start
-		except IndexError:
-			pass
+			now = time()
+			if now < self._empty_days.get(key, 0):
+				return []
+			programs = list(self._getDayEpg(cid, date))
+			if not programs:
+				if len(self._empty_days) >= self.DAY_CACHE_SIZE:
+					self._empty_days = dict((k, t) for k, t in self._empty_days.items() if t > now)
+				self._empty_days[key] = now + self.EMPTY_DAY_TTL
+				return programs
+			self._empty_days.pop(key, None)
+			self.day_ends[cid][toDate(date - timedelta(1))] = programs[0][0]
+		self._days[key] = programs
+		while len(self._days) > self.DAY_CACHE_SIZE:
+			self._days.popitem(last=False)
+		return programs
+
+	def getDayEpg(self, cid, date):
+		date = datetime(date.year, date.month, date.day)
+		programs = self._loadDay(cid, date)
+		if not programs:
+			return
+		if toDate(date) not in self.day_ends[cid]:
+			self._loadDay(cid, date + timedelta(1))
+		t_end = self.day_ends[cid].get(toDate(date))
 
 		for (i, p) in enumerate(programs[1:]):
 			t, name, desc = programs[i]  # p is programs[i+1]
 			e = EPG(t, p[0], name, desc)
 			yield e
-		if t_end is not None and len(programs) > 0:
+		if t_end is not None:
 			t, name, desc = programs[-1]
 			yield EPG(t, t_end, name, desc)
 
@@ -13,19 +13,92 @@ from __future__ import print_function
 # system imports
 import os
 import re
-from time import mktime
+from time import mktime, time
+from datetime import datetime, timedelta
+from threading import Thread
 from json import loads as json_loads
+from six.moves import intern, urllib_parse
 
 # plugin imports
 from .abstract_api import OfflineFavourites
-from ..utils import u2str, str2u, b2str, syncTime, APIException, EPG, Channel, Group
+from . import catchup
+from .xmltv import openGuide, iterProgrammes, XmltvError
+from ..utils import u2str, str2u, b2str, syncTime, stableHash, APIException, EPG, Channel, Group
 from ..loc import translate as _
+from .. import perf
+
+def _splitUrl(url, at_host=False):
+	"""
+	Split url after host or after last slash.
+	Prefix is interned because it is shared by most channels of a playlist.
+	"""
+	if not isinstance(url, str):
+		return url, ""
+	if at_host:
+		i = url.find('/', url.find('://') + 3) + 1
+		if i <= 0:
+			i = len(url)
+	else:
+		i = url.rfind('/') + 1
+	return intern(url[:i]), url[i:]
+
+
+# query parameters that change between playlist downloads
+VOLATILE_PARAMS = frozenset(('token', 'key', 'auth', 'sid', 'session', 'expires', 'utc', 'lutc', 'wmsauthsign'))
+
+
+def urlCid(url):
+	"""
+	Stable channel id for channels that have no id in url.
+	Host, path and query are hashed, volatile query parameters such as tokens are ignored.
+	"""
+	parts = urllib_parse.urlsplit(url)
+	query = [q for q in parts.query.split('&') if q and q.split('=', 1)[0].lower() not in VOLATILE_PARAMS]
+	return stableHash((parts.hostname or '') + parts.path + ('?' + '&'.join(query) if query else ''))
+
+
+class ChannelData(tuple):
+	"""
+	Compact record of playlist channel: tvg id, stream url and logo url.
+	Fields can be read as attributes or by key, like dict that was used before.
+	"""
+	__slots__ = ()
+
+	def __new__(cls, tvg, url, logo):
+		return tuple.__new__(cls, (tvg,) + _splitUrl(url, at_host=True) + _splitUrl(logo))
+
+	@property
+	def tvg(self):
+		return tuple.__getitem__(self, 0)
+
+	@property
+	def url(self):
+		return tuple.__getitem__(self, 1) + tuple.__getitem__(self, 2)
+
+	@property
+	def logo(self):
+		return tuple.__getitem__(self, 3) + tuple.__getitem__(self, 4)
+
+	def __getitem__(self, key):
+		if key in ('tvg', 'url', 'logo'):
+			return getattr(self, key)
+		raise KeyError(key)
+
+	def __repr__(self):
+		return "ChannelData(%r, %r, %r)" % (self.tvg, self.url, self.logo)
+
 
 class M3UProvider(OfflineFavourites):
 	NAME = "M3U"
 	AUTH_TYPE = ""
 
 	TVG_MAP = False  # True if tvg-id are non-numerical and we need to get map from server
+	HTTP_CACHE = True  # playlists and maps are requested several times on start
+	HTTP_CACHE_TTL = {'/channels': 60 * 60, 'tvg.json': 60 * 60}  # channel maps of epg server
+	CATCHUP = catchup.UTC_LUTC  # archive url of channels without catchup attributes in playlist
+	XMLTV = True  # use guide from url-tvg of playlist for channels it has, False if the guide is worse than server EPG
+	XMLTV_DAYS = (-1, 2)  # days around today that are kept from the guide
+	XMLTV_TTL = 12 * 60 * 60  # reload guide after this time
 
 	def __init__(self, username, password):
 		super(M3UProvider, self).__init__(username, password)
@@ -35,12 +108,23 @@ class M3UProvider(OfflineFavourites):
 		self.playlist_url = ""
 		self.channels = {}
 		self.groups = {}
-		# map from channel ids in playlist to epg server ids
+		# map from channel ids in playlist to ChannelData
 		self.channels_data = {}
 		# map from xmltv keys to epg server ids
 		self.tvg_map = {}
 		# map from epg server ids to channel ids
 		self.tvg_ids = {}
+		# archive url templates from catchup attributes of playlist
+		self.catchup = {}
+		# xmltv guides from playlist header, raw tvg-id -> channel ids
+		self.xmltv_urls = []
+		self._xmltv_ids = {}
+		self._xmltv_cids = set()  # channels with EPG from the guide
+		self._xmltv_range = None  # (first day, day after the last) kept from the guide
+		self._xmltv_time = None
+		self._xmltv_loading = False
+		# replies downloaded by _bootstrap
+		self._bootstrapped = {}
 		self._domain = ''
 		self._key = ''
 		# regexp to extract channel id
@@ -82,18 +166,39 @@ class M3UProvider(OfflineFavourites):
 		self._extractKeyFromPlaylist(url_regexp)
 
 	def setChannelsList(self):
+		self._bootstrap(self.playlist_url)
 		self._downloadTvgMap()
 		try:
-			self._parsePlaylist(self.readHttp(self.playlist_url).split(b'\n'))
+			self._parsePlaylist(self._readBootstrapped(self.playlist_url).split(b'\n'))
 		except IOError as e:
 			self.trace("error!", e, type(e))
 			#raise APIException(e)
 
+	def _bootstrap(self, *urls):
+		"""
+		Download urls needed to build channel list concurrently, tvg map is added when needed.
+		Replies are taken by _readBootstrapped, so start costs one round-trip instead of several.
+		"""
+		if self.TVG_MAP:
+			urls = (self.site + "/channels",) + urls
+		urls = [u for u in urls if u]
+		self._bootstrapped = dict(zip(urls, self.readHttpMany(urls)))
+
+	def _readBootstrapped(self, url):
+		"""Return reply downloaded by _bootstrap, or download it now"""
+		try:
+			reply = self._bootstrapped.pop(url)
+		except KeyError:
+			return self.readHttp(url)
+		if isinstance(reply, Exception):
+			raise reply
+		return reply
+
 	def _downloadTvgMap(self):
 		self.tvg_map = {}
 		if self.TVG_MAP:
 			try:
-				self.tvg_map = json_loads(self.readHttp(self.site + "/channels"))['data']
+				self.tvg_map = json_loads(self._readBootstrapped(self.site + "/channels"))['data']
 			except IOError as e:
 				self.trace("error!", e)
 				self.tvg_map = {}
@@ -109,11 +214,12 @@ class M3UProvider(OfflineFavourites):
 		if m:
 			cid = int(m.group(1))
 		else:
-			cid = hash(url)
+			cid = urlCid(url)
 			self.trace("Failed to get cid from url", url)
 		url = url.replace("localhost", self._domain).replace("00000000000000", self._key)
-		return Channel(cid, name, num, rec), {'tvg': tvg, 'url': url, 'logo': logo}
+		return Channel(cid, name, num, rec), ChannelData(tvg, url, logo)
 
+	@perf.timed('m3u.parsePlaylist')
 	def _parsePlaylist(self, lines):
 		group_names = {}
 		num = 0
@@ -130,6 +236,16 @@ class M3UProvider(OfflineFavourites):
 		rec_regexp = re.compile('#EXTINF:.*tvg-rec="([^"]*)"')
 		catchup_regexp = re.compile('#EXTINF:.*catchup-days="([^"]*)"')
 		timeshift_regexp = re.compile('#EXTINF:.*timeshift="([^"]*)"')
+		catchup_mode_regexp = re.compile('#EXTINF:.*catchup="([^"]*)"')
+		catchup_source_regexp = re.compile('#EXTINF:.*catchup-source="([^"]*)"')
+		catchup_mode = catchup_source = None
+		# old versions used hash() of playlist url as channel id, keep only ids that are in favourites
+		legacy_favourites = frozenset(self._savedFavourites())
+		self._legacy_ids = {}
+		self.xmltv_urls = []
+		self._xmltv_ids = {}
+		xmltv_regexp = re.compile('#EXTM3U.*(?:url-tvg|x-tvg-url)="([^"]*)"')
+		tvg_id = None
 
 		import codecs
 		if lines:
@@ -142,6 +258,7 @@ class M3UProvider(OfflineFavourites):
 			if line.startswith("#EXTINF:"):
 				name = line.split(',')[1].strip()
 				m = tvg_regexp.match(line)
+				tvg_id = m and m.group(1)
 				if m:
 					if self.tvg_map:
 						k = str2u(m.group(1))
@@ -181,8 +298,16 @@ class M3UProvider(OfflineFavourites):
 								rec = False
 						else:
 							rec = False
+				m = catchup_mode_regexp.match(line)
+				catchup_mode = m and m.group(1)
+				m = catchup_source_regexp.match(line)
+				catchup_source = m and m.group(1)
 			elif line.startswith("#EXTGRP:"):
 				group = line.strip().split(':')[1]
+			elif line.startswith("#EXTM3U"):
+				m = xmltv_regexp.match(line)
+				if m and self.XMLTV:
+					self.xmltv_urls = [u.strip() for u in m.group(1).split(',') if u.strip()]
 			elif line.startswith("#"):
 				continue
 			elif not line.strip():
@@ -203,9 +328,20 @@ class M3UProvider(OfflineFavourites):
 				num += 1
 				c, d = self.makeChannel(num, name, url, tvg, logo, rec)
 				cid = c.cid
+				if legacy_favourites and hash(url) in legacy_favourites:
+					self._legacy_ids[hash(url)] = cid
 				self.channels[cid] = c
 				g.channels.append(c)
 				self.channels_data[cid] = d
+				if catchup_mode or catchup_source:
+					template = catchup.fromPlaylist(catchup_mode, catchup_source, d['url'])
+					if template is not None:
+						self.catchup[cid] = template
+				if tvg_id and self.xmltv_urls:
+					try:
+						self._xmltv_ids[tvg_id].append(cid)
+					except KeyError:
+						self._xmltv_ids[tvg_id] = [cid]
 
 				# reset
 				group = "Unknown"
@@ -230,11 +366,67 @@ class M3UProvider(OfflineFavourites):
 
 	def getStreamUrl(self, cid, pin, time=None):
 		url = self.channels_data[cid]['url']
-		if time:
-			url += '?utc=%s&lutc=%s' % (time.strftime('%s'), syncTime().strftime('%s'))
-		return url
+		if time is None:
+			return url
+		return self.catchup.get(cid, self.CATCHUP).fill(url, time)
+
+	def _updateXmltv(self):
+		"""Load guide in background if it's not loaded yet or is outdated"""
+		if not self.xmltv_urls or self._xmltv_loading:
+			return
+		if self._xmltv_time is not None and time() - self._xmltv_time < self.XMLTV_TTL:
+			return
+		self._xmltv_loading = True
+		t = Thread(target=self._loadXmltv)
+		t.daemon = True
+		t.start()
+
+	def _loadXmltv(self):
+		try:
+			today = syncTime().replace(hour=0, minute=0, second=0, microsecond=0)
+			first, last = (today + timedelta(d) for d in self.XMLTV_DAYS)
+			t_first, t_last = mktime(first.timetuple()), mktime(last.timetuple())
+			names = {}
+			for cid, c in self.channels.items():
+				names.setdefault(c.name.strip().lower(), []).append(cid)
+			days = {}  # cid -> {day: [EPG]}
+			for url in self.xmltv_urls:
+				self.trace("Loading xmltv", url)
+				try:
+					f = openGuide(self.urlopener.open(url), url)
+					for cids, start, stop, title, desc in iterProgrammes(f, self._xmltv_ids, names):
+						if stop <= t_first or start >= t_last:
+							continue
+						e = EPG(start, stop, title, desc)
+						day = datetime(e.begin.year, e.begin.month, e.begin.day)
+						for cid in cids:
+							days.setdefault(cid, {}).setdefault(day, []).append(e)
+				except (IOError,) + XmltvError as e:
+					self.trace("Failed to load xmltv", url, e)
+			for channel_days in days.values():
+				for programs in channel_days.values():
+					programs.sort(key=lambda e: e.begin)
+			with self.lock:
+				for cid, channel_days in days.items():
+					for day, programs in channel_days.items():
+						self.channels[cid].replaceEpgDay(day, programs)
+				self._xmltv_range = (first, last)
+				self._xmltv_cids = set(days.keys())
+			self.trace("Loaded xmltv for {} channels".format(len(days)))
+		finally:
+			self._xmltv_time = time()
+			self._xmltv_loading = False
+
+	def _fromXmltv(self, cid, date):
+		if cid not in self._xmltv_cids:
+			return False
+		first, last = self._xmltv_range
+		return first <= datetime(date.year, date.month, date.day) < last
 
 	def getDayEpg(self, cid, date):
+		self._updateXmltv()
+		if self._fromXmltv(cid, date):
+			return self.channels[cid].epgDay(date)
 		params = {"id": self.channels_data[cid]['tvg'], "day": date.strftime("%Y.%m.%d")}
 		data = self.getJsonData(self.site + "/epg_day?", params)
 		return [EPG(
@@ -242,6 +434,17 @@ class M3UProvider(OfflineFavourites):
 			u2str(e['title']), u2str(e['description'])) for e in data['data']]
 
 	def getChannelsEpg(self, cids):
+		self._updateXmltv()
+		if self._xmltv_cids:
+			now = syncTime()
+			for cid in cids:
+				if cid in self._xmltv_cids:
+					epg = self.channels[cid].epgCurrent(now)
+					if epg:
+						yield cid, [epg]
+			cids = [cid for cid in cids if cid not in self._xmltv_cids]
+			if not cids:
+				return
 		t = mktime(syncTime().timetuple())
 		tvgs = set(self.channels_data[cid]['tvg'] or 0 for cid in cids)
 		data = self.getJsonData(self.site + "/epg_list?", {
@@ -16,7 +16,8 @@ import re
 
 # plugin imports
 from .abstract_api import JsonSettings
-from .m3u import M3UProvider
+from .m3u import M3UProvider, ChannelData, urlCid
+from . import catchup
 from ..utils import APILoginFailed, Channel, ConfSelection
 try:
 	from ..loc import translate as _
@@ -50,9 +51,9 @@ class OTTProvider(JsonSettings, M3UProvider):
 		if m:
 			cid = int(m.group(1))
 		else:
-			cid = hash(url)
+			cid = urlCid(url)
 			self.trace("Failed to get cid from url", url)
-		return Channel(cid, name, num, rec), {'tvg': tvg, 'url': url, 'logo': logo}
+		return Channel(cid, name, num, rec), ChannelData(tvg, url, logo)
 
 	def getLocalSettings(self):
 		return self._safeLoadSettings({
@@ -65,6 +66,6 @@ class OTTProvider(JsonSettings, M3UProvider):
 		if time is None:
 			return url
 		if self._format == "hls":
-			return url.replace('video.m3u8', 'video-timeshift_abs-%s.m3u8' % time.strftime('%s'))
+			return catchup.FLUSSONIC_HLS.fill(url, time)
 		else:
-			return url.replace('mpegts', 'timeshift_abs/%s' % time.strftime('%s'))
+			return catchup.FLUSSONIC_TS_DIR.fill(url, time)
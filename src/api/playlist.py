@@ -14,9 +14,10 @@ from __future__ import print_function
 from json import loads as json_loads
 
 # plugin imports
-from .m3u import M3UProvider
+from .m3u import M3UProvider, ChannelData, urlCid
 from .abstract_api import JsonSettings
-from ..utils import APIException, Channel, ConfSelection, ConfString, str2u, syncTime
+from . import catchup
+from ..utils import APIException, Channel, ConfSelection, ConfString, str2u
 try:
 	from ..loc import translate as _
 except ImportError:
@@ -42,8 +43,10 @@ class Playlist(JsonSettings, M3UProvider):
 		self.name_map = {}
 
 	def start(self):
+		# channel list is built right after start, so its downloads are started here too
+		self._bootstrap(self.site + "/channels_names", self._m3u_from == 'url' and self.playlist_url or None)
 		try:
-			self.name_map = json_loads(self.readHttp(self.site + "/channels_names"))['data']
+			self.name_map = json_loads(self._readBootstrapped(self.site + "/channels_names"))['data']
 		except (IOError, ValueError, AttributeError, TypeError) as e:
 			self.trace("error!", e)
 			self.name_map = {}
@@ -61,7 +64,7 @@ class Playlist(JsonSettings, M3UProvider):
 					self._parsePlaylist(f.readlines())
 			elif self._m3u_from == 'url':
 				try:
-					lines = self.readHttp(self.playlist_url).split(b'\n')
+					lines = self._readBootstrapped(self.playlist_url).split(b'\n')
 				except (IOError, ValueError, AttributeError, TypeError) as e:
 					self.trace("error!", e, type(e))
 					raise APIException(e)
@@ -82,26 +85,23 @@ class Playlist(JsonSettings, M3UProvider):
 			archive = name.endswith('(A)') or rec
 		else:
 			archive = True
-		cid = self._m3u_from == 'file' and hash(url) or num
-		return Channel(cid, name, num, archive), {'tvg': tvg, 'url': url, 'logo': logo}
+		cid = self._m3u_from == 'file' and urlCid(url) or num
+		return Channel(cid, name, num, archive), ChannelData(tvg, url, logo)
 
 	def getStreamUrl(self, cid, pin, time=None):
 		url = self.channels_data[cid]['url']
-		if self._archive_url == 'default':
-			if time:
-				if any(x in url for x in ['.zala.', 'zabava']):
-					t = int(time.strftime('%s')) - int(syncTime().strftime('%s'))
-					sv = '?'
-					if 'version=2' in url:
-						sv = '&'
-					url += '%soffset=%d' % (sv, t)
-				else:
-					url += '?utc=%s&lutc=%s' % (time.strftime('%s'), syncTime().strftime('%s'))
+		if time is None:
 			return url
+		try:
+			return self.catchup[cid].fill(url, time)
+		except KeyError:
+			pass
+		if self._archive_url == 'default':
+			if any(x in url for x in ['.zala.', 'zabava']):
+				return catchup.OFFSET.fill(url, time)
+			return catchup.UTC_LUTC.fill(url, time)
 		elif self._archive_url == 'flusonic':
-			if time is None:
-				return url
-			return url.replace('video.m3u8', 'video-timeshift_abs-%s.m3u8' % time.strftime('%s'))
+			return catchup.FLUSSONIC_HLS.fill(url, time)
 		else:
 			raise Exception(_("Unknown archive_url"))
 
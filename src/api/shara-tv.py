@@ -15,7 +15,7 @@ from six.moves.urllib_error import HTTPError
 
 # plugin imports
 from .abstract_api import JsonSettings
-from .m3u import M3UProvider
+from .m3u import M3UProvider, ChannelData, urlCid
 from ..utils import APIException, APILoginFailed, Channel
 try:
 	from ..loc import translate as _
@@ -35,9 +35,10 @@ class OTTProvider(JsonSettings, M3UProvider):
 		self.playlist_url = "http://tvfor.pro/g/%s:%s/1/playlist.m3u" % (username, password)
 
 	def start(self):
+		self._bootstrap(self.playlist_url)
 		self._downloadTvgMap()
 		try:
-			self._parsePlaylist(self.readHttp(self.playlist_url).split(b'\n'))
+			self._parsePlaylist(self._readBootstrapped(self.playlist_url).split(b'\n'))
 		except HTTPError as e:
 			self.trace("HTTPError:", e, type(e), e.getcode())
 			if e.code in (403, 404):
@@ -57,6 +58,6 @@ class OTTProvider(JsonSettings, M3UProvider):
 		if m:
 			cid = int(m.group(1))
 		else:
-			cid = hash(url)
+			cid = urlCid(url)
 			# self.trace("Failed to get cid from url", url)
-		return Channel(cid, name, num, rec), {'tvg': tvg, 'url': url, 'logo': logo}
+		return Channel(cid, name, num, rec), ChannelData(tvg, url, logo)
@@ -11,17 +11,18 @@
 from __future__ import print_function
 
 # system imports
-from six.moves import urllib_parse
 from six.moves.urllib_error import HTTPError
 from re import compile
-from time import mktime, time
+from time import mktime
+from datetime import datetime
 from json import loads as json_loads
 
 # plugin imports
 from .abstract_api import JsonSettings
-from .m3u import M3UProvider
+from .m3u import M3UProvider, ChannelData, urlCid
+from . import catchup
 from ..utils import APIException, APILoginFailed, Channel, ConfSelection
-from ..utils import u2str, str2u, b2str, syncTime, APIException, APILoginFailed, EPG, Channel, Group
+from ..utils import u2str, str2u, b2str, syncTime, toDate, APIException, APILoginFailed, EPG, Channel, Group
 try:
 	from ..loc import translate as _
 except ImportError:
@@ -33,6 +34,8 @@ class OTTProvider(JsonSettings, M3UProvider):
 	NAME = "SharavozTV"
 	AUTH_TYPE = "OTT ID"
 	TVG_MAP = True
+	CATCHUP = catchup.FLUSSONIC_TS
+	EPG_THREADS = 8  # parallel requests to the per channel program api
 
 	def __init__(self, username, password):
 		super(OTTProvider, self).__init__(username, password)
@@ -43,9 +46,10 @@ class OTTProvider(JsonSettings, M3UProvider):
 		self._url_regexp = compile(r"https?://[\w.]+/(\d+)/mpegts")
 
 	def start(self):
+		self._bootstrap(self.playlist_url)
 		self._downloadTvgMap()
 		try:
-			self._parsePlaylist(self.readHttp(self.playlist_url).split(b'\n'))
+			self._parsePlaylist(self._readBootstrapped(self.playlist_url).split(b'\n'))
 		except HTTPError as e:
 			self.trace("HTTPError:", e, type(e), e.getcode())
 			if e.code in (403, 404):
@@ -70,24 +74,48 @@ class OTTProvider(JsonSettings, M3UProvider):
 					try:
 						cid = int(tvg)
 					except:
-						cid = hash(url)
+						cid = urlCid(url)
 				else:
 					cid = num
 		else:
 			cid = num
-		return Channel(cid, name, num, rec), {'tvg': tvg, 'url': url, 'logo': logo}
+		return Channel(cid, name, num, rec), ChannelData(tvg, url, logo)
 
-	def _getJson(self, url, params):
-		try:
-			self.trace(url)
-			reply = self.readHttp(url + urllib_parse.urlencode(params))
-		except IOError as e:
-			raise APIException(e)
+	def _programUrl(self, tvg, date):
+		return self.site + "/program?epg=%s&date=%s" % (tvg, date.strftime("%Y-%m-%d"))
+
+	@staticmethod
+	def _parseProgram(reply):
 		try:
-			json = json_loads(reply)
+			data = json_loads(reply)
 		except Exception as e:
 			raise APIException(_("Failed to parse json: %s") % str(e))
-		return json
+		if data and "epg_data" in data:
+			return [EPG(e['time'], e['time_to'], u2str(e['name']), u2str(e['descr'])) for e in data["epg_data"]]
+		return []
+
+	def _hasDay(self, cid, day):
+		days_start = self.channels[cid].days_start
+		return bool(days_start) and toDate(day) in days_start
+
+	def _loadDays(self, tvgs, day):
+		"""
+		Download program of the day for each teleguide id in parallel,
+		and keep the whole day in the channels, so getDayEpg and next getChannelsEpg don't download it again.
+		"""
+		tvgs = list(tvgs)
+		replies = self.readHttpMany([self._programUrl(tvg, day) for tvg in tvgs], threads=self.EPG_THREADS)
+		for tvg, reply in zip(tvgs, replies):
+			if isinstance(reply, Exception) or not reply:
+				self.trace("Failed to get program of", tvg, reply)
+				continue
+			try:
+				epg_list = self._parseProgram(reply)
+			except APIException as e:
+				self.trace(tvg, e)
+				continue
+			for cid in self.tvg_ids.get(tvg, ()):
+				self.channels[cid].addEpgDay(day, epg_list)
 
 	def getDayEpg(self, cid, date):
 		if self.site == "http://technic.cf/epg-sharovoz":
@@ -95,9 +123,14 @@ class OTTProvider(JsonSettings, M3UProvider):
 			data = self.getJsonData(self.site + "/epg_day?", params)
 			return [EPG(int(e['begin']), int(e['end']), u2str(e['title']), u2str(e['description'])) for e in data['data']]
 		else:
-			data = self._getJson(self.site + "/program?epg=%s&date=%s" % (self.channels_data[cid]['tvg'], date.strftime("%Y-%m-%d")), {})
-			if data and "epg_data" in data:
-				return [EPG(e['time'], e['time_to'], u2str(e['name']), u2str(e['descr'])) for e in data["epg_data"]]
+			day = datetime(date.year, date.month, date.day)
+			if self._hasDay(cid, day):
+				return self.channels[cid].epgDay(day)
+			try:
+				reply = self.readHttp(self._programUrl(self.channels_data[cid]['tvg'], date))
+			except IOError as e:
+				raise APIException(e)
+			return self._parseProgram(reply)
 
 	def getChannelsEpg(self, cids):
 		if self.site == "http://technic.cf/epg-sharovoz":
@@ -113,19 +146,16 @@ class OTTProvider(JsonSettings, M3UProvider):
 				for cid in cids:
 					yield cid, [EPG(int(e['begin']), int(e['end']), u2str(e['title']), u2str(e['description'])) for e in c['programs']]
 		else:
-			tvgs = set(self.channels_data[cid]['tvg'] or 0 for cid in cids)
-			date = syncTime().strftime("%Y-%m-%d")
-			t = int(time())
-			for tvg in tvgs:
-				data = self._getJson(self.site + "/program?epg=%s&date=%s" % (tvg, date), {})
-				if data and "epg_data" in data:
-					yield tvg, [EPG(e['time'], e['time_to'], u2str(e['name']), u2str(e['descr'])) for e in data["epg_data"] if (e['time'] <= t and e['time_to'] >= t)]
-
-	def getStreamUrl(self, cid, pin, time=None):
-		url = self.channels_data[cid]['url']
-		if time is None:
-			return url
-		return url.replace('mpegts', 'timeshift_abs-%s.ts' % time.strftime('%s'))
+			t = syncTime()
+			day = datetime(t.year, t.month, t.day)
+			cids = [cid for cid in cids if self.channels_data[cid]['tvg']]
+			missing = set(self.channels_data[cid]['tvg'] for cid in cids if not self._hasDay(cid, day))
+			if missing:
+				self._loadDays(missing, day)
+			for cid in cids:
+				epg = self.channels[cid].epgCurrent(t)
+				if epg:
+					yield cid, [epg]
 
 	def getLocalSettings(self):
 		sharavoz_domains = [('spr24.net', 'spr24.net'), ('sh365.org', 'sh365.org'), ('sharavoz.space', 'sharavoz.space'), ('sharavoz.link', 'sharavoz.link'), ('sh24.one', 'sh24.one')]
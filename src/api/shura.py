@@ -16,7 +16,7 @@ from six.moves.urllib_error import HTTPError
 from json import loads as json_loads
 
 # plugin imports
-from .m3u import M3UProvider
+from .m3u import M3UProvider, ChannelData, urlCid
 from .abstract_api import JsonSettings
 from ..utils import Channel, APIException, APILoginFailed, ConfInteger, str2u
 try:
@@ -40,15 +40,16 @@ class OTTProvider(JsonSettings, M3UProvider):
 		self.name_map = {}
 
 	def start(self):
+		self._bootstrap(self.site + "/channels_names", self.playlist_url)
 		try:
-			self.name_map = json_loads(self.readHttp(self.site + "/channels_names"))['data']
+			self.name_map = json_loads(self._readBootstrapped(self.site + "/channels_names"))['data']
 		except:
 			self.trace("error! load 'http://technic.cf/epg-1ott/'")
 			self.name_map = {}
 
 		self._downloadTvgMap()
 		try:
-			self._parsePlaylist(self.readHttp(self.playlist_url).split(b'\n'))
+			self._parsePlaylist(self._readBootstrapped(self.playlist_url).split(b'\n'))
 		except HTTPError as e:
 			self.trace("HTTPError:", e, type(e), e.getcode())
 			if e.code in (403, 404):
@@ -73,9 +74,9 @@ class OTTProvider(JsonSettings, M3UProvider):
 		if m:
 			cid = int(m.group(1))
 		else:
-			cid = hash(url)
+			cid = urlCid(url)
 			self.trace("Failed to get cid from url", url)
-		return Channel(cid, name, num, rec), {'tvg': tvg, 'url': url, 'logo': logo}
+		return Channel(cid, name, num, rec), ChannelData(tvg, url, logo)
 
 	def getLocalSettings(self):
 		settings = {
@@ -14,7 +14,8 @@ from __future__ import print_function
 from six.moves.urllib_error import HTTPError
 # plugin imports
 from .abstract_api import JsonSettings
-from .m3u import M3UProvider
+from .m3u import M3UProvider, ChannelData, urlCid
+from . import catchup
 from ..utils import APIException, APILoginFailed, Channel
 try:
 	from ..loc import translate as _
@@ -27,6 +28,7 @@ class OTTProvider(JsonSettings, M3UProvider):
 	NAME = "SchurikTV"
 	AUTH_TYPE = "Key"
 	TVG_MAP = True
+	CATCHUP = catchup.FLUSSONIC_TS_DIR
 
 	def __init__(self, username, password):
 		super(OTTProvider, self).__init__(username, password)
@@ -63,12 +65,6 @@ class OTTProvider(JsonSettings, M3UProvider):
 		if m:
 			cid = int(m.group(1))
 		else:
-			cid = hash(url)
+			cid = urlCid(url)
 			# self.trace("Failed to get cid from url", url)
-		return Channel(cid, name, num, True), {'tvg': tvg, 'url': url, 'logo': logo}
-
-	def getStreamUrl(self, cid, pin, time=None):
-		url = self.channels_data[cid]['url']
-		if time is None:
-			return url
-		return url.replace('mpegts', 'timeshift_abs/%s' % time.strftime('%s'))
+		return Channel(cid, name, num, True), ChannelData(tvg, url, logo)
@@ -15,10 +15,16 @@ from six.moves.urllib_error import URLError
 from six.moves import urllib_parse
 from hashlib import md5
 from json import loads as json_loads
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from time import time
+from collections import deque
+from threading import Lock, Thread
 
 # plugin imports
 from .abstract_api import JsonSettings, OfflineFavourites
-from ..utils import APIException, APILoginFailed, Channel, Group, EPG, u2str
+from .catchup import CatchupTemplate
+from ..utils import trace, APIException, APILoginFailed, Channel, Group, EPG, u2str, toTimestamp
 
 try:
 	from ..loc import translate as _
@@ -26,23 +32,97 @@ except ImportError:
 	def _(text):
 		return text
 
+
+class TokenPool(object):
+	"""
+	Stream tokens obtained in batches. Pool is refilled in background when it gets low,
+	so getting token for a stream url normally doesn't wait for the server.
+	"""
+	BATCH = 30
+	LOW_WATER = 10
+	TTL = 30 * 60  # seconds, older tokens are not used
+
+	def __init__(self, download):
+		"""
+		:param download: function (count) -> list of tokens
+		"""
+		self._download = download
+		self._tokens = deque()  # (time received, token)
+		self._lock = Lock()
+		self._refilling = False
+
+	def trace(self, *args):
+		trace("TokenPool", *args)
+
+	def _dropStale(self):
+		expire = time() - self.TTL
+		while self._tokens and self._tokens[0][0] < expire:
+			self._tokens.popleft()
+
+	def _fill(self):
+		tokens = self._download(self.BATCH)
+		now = time()
+		with self._lock:
+			self._tokens.extend((now, t) for t in tokens)
+
+	def _refill(self):
+		try:
+			self._fill()
+		except APIException as e:
+			self.trace("refill failed", e)
+		finally:
+			self._refilling = False
+
+	def refill(self):
+		"""Start background download of tokens unless it's already running"""
+		with self._lock:
+			if self._refilling:
+				return
+			self._refilling = True
+		t = Thread(target=self._refill)
+		t.daemon = True
+		t.start()
+
+	def take(self):
+		"""Return fresh token, download them now if pool is empty. Can raise APIException"""
+		with self._lock:
+			self._dropStale()
+			token = self._tokens.popleft()[1] if self._tokens else None
+			low = len(self._tokens) < self.LOW_WATER
+		if token is None:
+			self._fill()
+			with self._lock:
+				if not self._tokens:
+					raise APIException(_("No stream tokens received"))
+				token = self._tokens.popleft()[1]
+		elif low:
+			self.refill()
+		return token
+
+
 class OTTProvider(OfflineFavourites, JsonSettings):
 	NAME = "TvTeam"
 	AUTH_TYPE = "Login"
+	SHARED_URL = False  # every url has own token from the pool
+	CATCHUP = CatchupTemplate('{url}?token={token}&utc={utc}', fields=('token',))
+	SCHEDULE_TTL = 6 * 60 * 60  # download schedule again after this time, programs may change
+	SCHEDULE_RETRY = 10 * 60  # don't download schedule again sooner when requested day is beyond it
 
 	def __init__(self, username, password):
 		super(OTTProvider, self).__init__(username, password)
 		self.site = "http://tvteam.eu/api/?"
 		self.channels_data = {}
-		self._tokens = []
+		self._tokens = TokenPool(self._getTokens)
+		# getTvProgram returns all days of the channel, days are sliced from it
+		self._schedule = {}  # cid -> (download time, [start timestamps], [EPG])
 
 	def start(self):
 		self.authorize()
+		self._tokens.refill()
 
 	def authorize(self):
 		self.trace("Username", self.username)
 		self.sid = None
-		self._tokens = []
 		response = self._getJson(self.site, {'userLogin': self.username, 'userPasswd': md5(self.password.encode('utf-8')).hexdigest(),}, reauth=False)
 		self.sid = response['sessionId']
 		self.trace("Session", self.sid)
@@ -102,23 +182,51 @@ class OTTProvider(OfflineFavourites, JsonSettings):
 			except APIException as e:
 				raise APILoginFailed(str(e))
 
-		if not self._tokens:
-			data = self._getJson(self.site, {'apiAction': 'getRandomTokens', 'cnt': 30,})
-			self._tokens = [u2str(t) for t in data['tokens']]
-		token = self._tokens.pop()
+		token = self._tokens.take()
 
 		url = self.channels_data[cid]['url']
 		if time is None:
 			return url + "?token=%s" % token
-		return url + "?token=%s&utc=%s" % (token, time.strftime('%s'))
+		return self.CATCHUP.fill(url, time, token=token)
 
-	def getDayEpg(self, cid, date):
-		data = self._getJson(self.site, {'apiAction': 'getTvProgram', 'channelId': cid,})
+	def _loadSchedule(self, cid):
+		data = self._getJson(self.site, {'apiAction': 'getTvProgram', 'channelId': cid})
 		try:
-			return [EPG(int(e['prStartSec']), int(e['prStopSec']), u2str(e['prTitle']), u2str(e['prSubTitle'])) for e in data['tvProgram']]
+			programs = [
+				EPG(int(e['prStartSec']), int(e['prStopSec']), u2str(e['prTitle']), u2str(e['prSubTitle']))
+				for e in data['tvProgram']
+			]
 		except Exception as e:
 			self.trace("Failed to parse: %s" % str(e))
-			return []
+			return None
+		programs.sort(key=lambda e: e.begin)
+		schedule = self._schedule[cid] = (time(), [toTimestamp(e.begin) for e in programs], programs)
+		return schedule
+
+	def _expired(self, schedule, end):
+		loaded, _, programs = schedule
+		age = time() - loaded
+		if age > self.SCHEDULE_TTL:
+			return True
+		return (not programs or programs[-1].end < end) and age > self.SCHEDULE_RETRY
+
+	def _getTokens(self, count):
+		# called from the refill thread too, session must not be renewed concurrently
+		with self.lock:
+			data = self._getJson(self.site, {'apiAction': 'getRandomTokens', 'cnt': count})
+		return [u2str(t) for t in data['tokens']]
+
+	def getDayEpg(self, cid, date):
+		start = datetime(date.year, date.month, date.day)
+		end = start + timedelta(1)
+		schedule = self._schedule.get(cid)
+		if schedule is None or self._expired(schedule, end):
+			schedule = self._loadSchedule(cid) or schedule
+			if schedule is None:
+				return []
+		_, starts, programs = schedule
+		i = bisect_left(starts, toTimestamp(start))
+		return programs[i:bisect_left(starts, toTimestamp(end), i)]
 
 	def getChannelsEpg(self, cids):
 		data = self._getJson(self.site, {'apiAction': 'getCurrentPrograms'})
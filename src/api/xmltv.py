@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+#  enigma2 iptv player
+#
+#  Copyright (c) 2020 Alex Maystrenko <alexeytech@gmail.com>
+#
+# This is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation; either version 2, or (at your option) any later
+# version.
+
+"""
+Streaming reader of XMLTV guides.
+Guide is parsed while it is downloaded and parsed elements are dropped, so memory doesn't depend on guide size.
+"""
+
+from __future__ import print_function
+
+import zlib
+from calendar import timegm
+try:
+	from xml.etree.cElementTree import iterparse, ParseError
+except ImportError:
+	from xml.etree.ElementTree import iterparse, ParseError
+
+from ..utils import u2str
+
+# errors of broken or truncated guide
+XmltvError = (ParseError, zlib.error, EOFError)
+
+
+class GunzipReader(object):
+	"""File object that decompresses gzip stream while it is read, source may be not seekable"""
+
+	CHUNK = 64 * 1024
+
+	def __init__(self, f):
+		self._f = f
+		self._z = zlib.decompressobj(16 + zlib.MAX_WBITS)
+		self._buf = b""
+
+	def read(self, size=-1):
+		while size < 0 or len(self._buf) < size:
+			data = self._f.read(self.CHUNK)
+			if not data:
+				self._buf += self._z.flush()
+				break
+			self._buf += self._z.decompress(data)
+		if size < 0:
+			size = len(self._buf)
+		data, self._buf = self._buf[:size], self._buf[size:]
+		return data
+
+
+def openGuide(f, url=""):
+	"""Wrap downloaded file object, guides with .gz extension are decompressed on the fly"""
+	if url.split('?', 1)[0].endswith('.gz'):
+		return GunzipReader(f)
+	return f
+
+
+def parseTime(s):
+	"""Convert XMLTV time '20200501123000 +0300' to unix timestamp"""
+	t = timegm((int(s[0:4]), int(s[4:6]), int(s[6:8]), int(s[8:10]), int(s[10:12]), int(s[12:14]), 0, 0, 0))
+	tz = s[14:].strip()
+	if tz:
+		offset = int(tz[1:3]) * 3600 + int(tz[3:5]) * 60
+		t -= offset if tz[0] != '-' else -offset
+	return t
+
+
+def iterProgrammes(f, ids, names=None):
+	"""
+	Yield (key, start, stop, title, description) for programmes of known channels.
+	:param f: file object with guide
+	:param dict ids: xmltv channel id -> key
+	:param dict names: lower case channel name -> key, used for channels with unknown id
+	"""
+	ids = dict(ids)
+	context = iterparse(f, events=('start', 'end'))
+	_, root = next(context)
+	for event, elem in context:
+		if event != 'end':
+			continue
+		if elem.tag == 'programme':
+			key = ids.get(elem.get('channel'))
+			if key is not None:
+				try:
+					start, stop = parseTime(elem.get('start')), parseTime(elem.get('stop'))
+				except (TypeError, ValueError):
+					pass
+				else:
+					yield key, start, stop, u2str(elem.findtext('title') or ''), u2str(elem.findtext('desc') or '')
+			root.clear()
+		elif elem.tag == 'channel':
+			cid = elem.get('id')
+			if names and cid not in ids:
+				for name in elem.findall('display-name'):
+					key = names.get(u2str(name.text or '').strip().lower())
+					if key is not None:
+						ids[cid] = key
+						break
+			root.clear()
@@ -10,11 +10,16 @@
 
 from __future__ import print_function
 
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from time import time
+from twisted.internet.defer import Deferred
+from twisted.internet.threads import deferToThread
 
 # from api.abstract_api import AbstractStream
-from .utils import trace, APIException, EPG
+from .utils import trace, syncTime, APIException, EPG
 from .layer import eTimer, enigma2Qt
+from . import perf
 
 try:
 	from typing import List, Dict, Callable, Tuple  # pylint: disable=unused-import
@@ -52,6 +57,7 @@ class LiveEpgWorker(object):
 		else:
 			self.run_update()
 
+	@perf.timed('epg.live.update')
 	def run_update(self):
 		t = datetime.now()
 		self.trace("update() at", t)
@@ -64,8 +70,9 @@ class LiveEpgWorker(object):
 
 		if to_update:
 			try:
-				data = self.db.getChannelsEpg(to_update)
-				self._epg.update(data)
+				with self.db.lock:
+					data = self.db.getChannelsEpg(to_update)
+					self._epg.update(data)
 			except APIException as ex:
 				self.trace("get data failed!", ex)
 				self._timer.startLongTimer(60)  # retry in one minute
@@ -129,3 +136,152 @@ class LiveEpgWorker(object):
 				return self._epg[cid][1]
 			except:
 				return None
+
+
+class DayEpgCache(object):
+	"""
+	Read-through cache of day EPG lists, used by EPG screen.
+	Loaded days are also added to the channel EPGDB. Neighbour days can be prefetched in background.
+	Empty days are remembered only for EMPTY_TTL, provider may have no EPG for them yet.
+	"""
+	SIZE = 100  # number of (channel, day) lists to keep
+	EMPTY_TTL = 5 * 60  # seconds
+
+	def __init__(self, db):
+		self.db = db  # type: AbstractStream
+		self._days = OrderedDict()  # type: Dict[Tuple[int, datetime], List[EPG]]
+		self._empty = {}  # type: Dict[Tuple[int, datetime], float]
+		self._pending = {}  # type: Dict[Tuple[int, datetime], List[Deferred]]
+
+	def trace(self, *args):
+		trace("DayEpgCache", *args)
+
+	@staticmethod
+	def _key(cid, date):
+		return cid, datetime(date.year, date.month, date.day)
+
+	def get(self, cid, date):
+		"""Return programs of the day if they are cached, otherwise None"""
+		key = self._key(cid, date)
+		try:
+			epg_list = self._days.pop(key)
+		except KeyError:
+			if time() < self._empty.get(key, 0):
+				return []
+			return None
+		self._days[key] = epg_list
+		return epg_list
+
+	def load(self, cid, date):
+		"""Return programs of the day, download them if they are not cached. Can raise APIException"""
+		epg_list = self.get(cid, date)
+		if epg_list is None:
+			key = self._key(cid, date)
+			epg_list = self._store(key, self._download(key))
+		return epg_list
+
+	def loading(self, cid, date):
+		"""Return Deferred that fires with programs of the day if they are being prefetched, otherwise None"""
+		try:
+			consumers = self._pending[self._key(cid, date)]
+		except KeyError:
+			return None
+		consumers.append(Deferred())
+		return consumers[-1]
+
+	def prefetch(self, cid, date):
+		key = self._key(cid, date)
+		if enigma2Qt or key in self._pending or self.get(cid, date) is not None:
+			return
+		self._pending[key] = []
+		deferToThread(self._download, key).addCallbacks(
+			self._onLoad, self._onError, callbackArgs=(key,), errbackArgs=(key,))
+
+	def _download(self, key):
+		cid, date = key
+		with self.db.lock:
+			return list(self.db.getDayEpg(cid, date) or [])
+
+	def _store(self, key, epg_list):
+		if not epg_list:
+			now = time()
+			if len(self._empty) >= self.SIZE:
+				self._empty = dict((k, t) for k, t in self._empty.items() if t > now)
+			self._empty[key] = now + self.EMPTY_TTL
+			return epg_list
+		self._empty.pop(key, None)
+		cid, date = key
+		self._days[key] = epg_list
+		try:
+			self.db.channels[cid].addEpgDay(date, epg_list)
+		except KeyError:
+			pass
+		while len(self._days) > self.SIZE:
+			self._days.popitem(last=False)
+		return epg_list
+
+	def _onLoad(self, epg_list, key):
+		self._store(key, epg_list)
+		for consumer in self._pending.pop(key):
+			consumer.callback(epg_list)
+
+	def _onError(self, err, key):
+		self.trace("prefetch failed", key, err.getErrorMessage())
+		for consumer in self._pending.pop(key):
+			consumer.errback(err)
+
+
+class StandbyWarmup(object):
+	"""
+	Prefetch day EPG of favourite and recently watched channels while receiver is in standby,
+	so EPG screen opens without waiting after wake up. Downloads run one by one with a pause between them.
+	"""
+	START_DELAY = 5 * 60  # seconds in standby before starting
+	INTERVAL = 2000  # ms between downloads
+	CHANNELS = 20  # don't push out more than that from DayEpgCache
+	DAYS = (0, 1)  # today and tomorrow
+
+	def __init__(self, day_epg, channels):
+		"""
+		:param DayEpgCache day_epg:
+		:param channels: function that returns channel ids in order of importance
+		"""
+		self.day_epg = day_epg
+		self.channels = channels
+		self._jobs = []  # type: List[Tuple[int, datetime]]
+		self._timer = eTimer()
+		self._timer.callback.append(self._next)
+
+	def trace(self, *args):
+		trace("StandbyWarmup", *args)
+
+	def start(self):
+		today = syncTime()
+		cids = []
+		for cid in self.channels():
+			if cid not in cids:
+				cids.append(cid)
+		cids = cids[:self.CHANNELS]
+		self._jobs = [(cid, today + timedelta(d)) for d in self.DAYS for cid in cids]
+		self._jobs.reverse()
+		self.trace("scheduled", len(self._jobs))
+		self._timer.startLongTimer(self.START_DELAY)
+
+	def stop(self):
+		if self._jobs:
+			self.trace("stopped,", len(self._jobs), "left")
+		self._jobs = []
+		self._timer.stop()
+
+	def _next(self):
+		while self._jobs:
+			cid, date = self._jobs.pop()
+			self.day_epg.prefetch(cid, date)
+			d = self.day_epg.loading(cid, date)
+			if d is not None:
+				d.addBoth(self._done)
+				return
+
+	def _done(self, result):
+		if self._jobs:
+			self._timer.start(self.INTERVAL, True)
@@ -14,7 +14,10 @@ from __future__ import print_function
 
 from functools import wraps
 from six import b
-from twisted.web.client import downloadPage as _downloadPage
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred, CancelledError
+from twisted.python.compat import nativeString
+from twisted.web.client import HTTPDownloader
 
 from Components.config import ConfigText
 from Components.Sources.StaticText import StaticText
@@ -54,14 +57,26 @@ class DownloadException(Exception):
 
 def downloadError(err):
 	"""Wrap twisted download failure in DownloadException"""
+	if err.check(CancelledError):
+		return err
 	raise DownloadException(err.getErrorMessage())
 
 
-def downloadPage(url, path):
+def downloadPage(url, path, headers=None):
+	"""Same as twisted downloadPage, but cancelling returned Deferred closes the connection"""
 	try:
-		return _downloadPage(b(url), path).addErrback(downloadError)
-	except:
+		factory = HTTPDownloader(b(url), path, headers=headers)
+		if factory.scheme == b'https':
+			from twisted.internet import ssl
+			connector = reactor.connectSSL(nativeString(factory.host), factory.port, factory, ssl.ClientContextFactory())
+		else:
+			connector = reactor.connectTCP(nativeString(factory.host), factory.port, factory)
+	except (ValueError, ImportError) as e:
+		trace("can't download", url, e)
 		return None
+	d = Deferred(lambda _d: connector.disconnect())
+	factory.deferred.chainDeferred(d)
+	return d.addErrback(downloadError)
 
 
 class ConfigNumberText(ConfigText):
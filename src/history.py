@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+# Enigma2 IPtvDream player framework
+#
+#  Copyright (c) 2020 Alex Maystrenko <alexeytech@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+from __future__ import print_function
+
+from os import rename
+
+from .utils import trace
+
+try:
+	from typing import Dict, Optional  # pylint: disable=unused-import
+except ImportError:
+	pass
+
+
+class _Link(object):
+	__slots__ = ('older', 'newer', 'entry')
+
+	def __init__(self, older, entry):
+		self.older = older  # type: Optional[_Link]
+		self.newer = None  # type: Optional[_Link]
+		self.entry = entry
+
+
+class History(object):
+	"""
+	Recently played channels, one entry per channel, oldest first.
+	Entries are kept in a linked list indexed by cid, so moving, dropping and deleting them doesn't scan the history.
+	Whole history is stored in a small file, rewritten once per SAVE_ZAPS zaps and on exit.
+	"""
+
+	SAVE_ZAPS = 5
+
+	def __init__(self, size, path=None):
+		self._size = size
+		self._links = {}  # type: Dict[int, _Link]
+		self._oldest = None  # type: Optional[_Link]
+		self._newest = None  # type: Optional[_Link]
+		self._current = None  # type: Optional[_Link]
+		self._path = path
+		self._zaps = 0  # since last save
+		if path:
+			self.load()
+
+	def isEmpty(self):
+		return len(self._links) == 0
+
+	def counts(self):
+		return len(self._links)
+
+	def _iterLinks(self):
+		"""Oldest first"""
+		link = self._oldest
+		while link is not None:
+			yield link
+			link = link.newer
+
+	def _unlink(self, cid):
+		link = self._links.pop(cid)
+		if link.older is None:
+			self._oldest = link.newer
+		else:
+			link.older.newer = link.newer
+		if link.newer is None:
+			self._newest = link.older
+		else:
+			link.newer.older = link.older
+		if link is self._current:
+			# keep position on the older entry, or on the oldest one if there is none
+			self._current = link.older or link.newer
+		return link
+
+	def _moveToEnd(self, entry):
+		if entry.cid in self._links:
+			self._unlink(entry.cid)
+		link = self._links[entry.cid] = _Link(self._newest, entry)
+		if self._newest is None:
+			self._oldest = link
+		else:
+			self._newest.newer = link
+		self._newest = link
+		if self._current is None:
+			self._current = link
+
+	def _dropOldest(self, count):
+		for _ in range(count):
+			self._unlink(self._oldest.entry.cid)
+
+	def setSize(self, size):
+		self._size = size
+		extra = len(self._links) - size
+		if extra > 0:
+			self._dropOldest(extra)
+
+	def replace(self, curr):
+		if self.counts() > 1 and curr in self._links:
+			current = self._current
+			self._moveToEnd(self._links[curr].entry)
+			if current.entry.cid == curr:
+				self._current = self._newest
+
+	def clear(self):
+		if self.counts() > 1:
+			self._dropOldest(len(self._links) - 1)
+			self._current = self._newest
+			self.save()
+			return True
+		return False
+
+	def delCurrent(self, curr):
+		if self.counts() > 1 and curr in self._links:
+			self._unlink(curr)
+			self.save()
+			return True
+		return False
+
+	def append(self, val):
+		self._moveToEnd(val)
+		if len(self._links) > self._size:
+			self._dropOldest(1)
+		self._current = self._newest
+		self._zaps += 1
+		if self._zaps >= self.SAVE_ZAPS:
+			self.save()
+
+	def historyPrev(self):
+		if self._current is None or self._current.older is None:
+			return None
+		else:
+			self._current = self._current.older
+			return self._current.entry
+
+	def historyNext(self):
+		if self._current is None or self._current.newer is None:
+			return None
+		else:
+			self._current = self._current.newer
+			return self._current.entry
+
+	def now(self):
+		if self._current is not None:
+			return self._current.entry
+		else:
+			return None
+
+	def cids(self):
+		"""Channel ids, most recent first"""
+		return list(reversed([link.entry.cid for link in self._iterLinks()]))
+
+	def load(self):
+		try:
+			with open(self._path) as f:
+				lines = f.read().split()
+		except (IOError, OSError):
+			return
+		try:
+			index = int(lines[0])
+			entries = [HistoryEntry.fromStr(s) for s in lines[1:]]
+		except (IndexError, ValueError, TypeError) as e:
+			trace("History: bad file", self._path, e)
+			return
+		self._links = {}
+		self._oldest = self._newest = self._current = None
+		for entry in entries:
+			self._moveToEnd(entry)
+		extra = len(self._links) - self._size
+		if extra > 0:
+			self._dropOldest(extra)
+			index -= extra
+		links = list(self._iterLinks())
+		if 0 <= index < len(links):
+			self._current = links[index]
+		else:
+			self._current = self._newest
+
+	def save(self):
+		"""Write current position and all entries in one go"""
+		self._zaps = 0
+		if not self._path:
+			return
+		links = list(self._iterLinks())
+		index = links.index(self._current) if self._current is not None else -1
+		lines = [str(index)] + [link.entry.toStr() for link in links]
+		try:
+			with open(self._path + '.tmp', 'w') as f:
+				f.write("\n".join(lines))
+			rename(self._path + '.tmp', self._path)
+		except (IOError, OSError) as e:
+			trace("History: save failed", e)
+
+	def __repr__(self):
+		return repr([str(link.entry) for link in self._iterLinks()])
+
+
+class HistoryEntry(object):
+	def __init__(self, mode, gid, gr_idx, cid, ch_idx):
+		self.mode = mode
+		self.gid, self.gr_idx = gid, gr_idx
+		self.cid, self.ch_idx = cid, ch_idx
+
+	def copy(self):
+		return HistoryEntry(self.mode, self.gid, self.gr_idx, self.cid, self.ch_idx)
+
+	@classmethod
+	def fromStr(cls, s):
+		return cls(*[int(v) if v else None for v in s.split(",")])
+
+	def toStr(self):
+		return ",".join("" if v is None else str(v) for v in self.makeTuple())
+
+	def makeTuple(self):
+		return self.mode, self.gid, self.gr_idx, self.cid, self.ch_idx
+
+	def __repr__(self):
+		return "HistoryEntry(%r, (%r, %r), (%r, %r))" % (self.mode, self.gid, self.gr_idx, self.cid, self.ch_idx)
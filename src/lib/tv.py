@@ -12,12 +12,24 @@
 
 from __future__ import print_function
 
-from collections import deque
-from os import mkdir, listdir, path as os_path
+from collections import OrderedDict
+from heapq import heappush, heappop, heapify
+from functools import partial
+from os import makedirs, listdir, remove, rename, path as os_path
+from time import time
+from email.utils import formatdate
+from json import load as json_load, dump as json_dump
+from six import b
 from twisted.internet.defer import Deferred, succeed, CancelledError
+from twisted.internet.threads import deferToThread
+try:
+	from PIL import Image
+except ImportError:
+	Image = None
 
 from Components.AVSwitch import AVSwitch
 from Components.config import config, ConfigSelection
+from Tools.LoadPixmap import LoadPixmap
 from enigma import eBackgroundFileEraser, ePicLoad
 try:
 	from enigma import gPixmapPtr
@@ -26,11 +38,16 @@ except:
 	empty_picon = None
 
 from ..loc import translate as _
-from ..layer import enigma2Qt
+from ..layer import eTimer, enigma2Qt
 from ..api.abstract_api import AbstractStream
-from ..utils import trace
+from ..utils import trace, stableHash
 from ..common import fatalError, downloadPage, DownloadException
 
+try:
+	from typing import Dict, List  # pylint: disable=unused-import
+except ImportError:
+	pass
+
 
 class SortOrderSettings(object):
 	def __init__(self):
@@ -56,75 +73,389 @@ class SortOrderSettings(object):
 		self.c.save()
 
 
-PICON_PATH = '/tmp/IPtvDream/'
+PICON_LOCATIONS = [
+	('/tmp/IPtvDream/', _("RAM (cleared on reboot)")),
+	('/etc/enigma2/iptvdream/picons/', _("Flash")),
+	('/media/usb/IPtvDream/picons/', "USB"),
+	('/media/hdd/IPtvDream/picons/', "HDD"),
+]
+PICON_CACHE_SIZES = [("2", "2 MB"), ("5", "5 MB"), ("10", "10 MB"), ("20", "20 MB"), ("50", "50 MB")]
+
+
+def scalePicon(src, dst, width, height):
+	"""Scale picon keeping aspect ratio and center it on transparent canvas of widget size, like ePicLoad does"""
+	img = Image.open(src).convert('RGBA')
+	ratio = min(float(width) / img.size[0], float(height) / img.size[1])
+	size = (max(1, int(img.size[0] * ratio)), max(1, int(img.size[1] * ratio)))
+	img = img.resize(size, getattr(Image, 'LANCZOS', None) or Image.ANTIALIAS)
+	canvas = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+	canvas.paste(img, ((width - size[0]) // 2, (height - size[1]) // 2), img)
+	canvas.save(dst, 'PNG')
+
+
+PRIORITY_HIGH = 0
+PRIORITY_LOW = 10
+
+
+class DownloadJob(object):
+	__slots__ = ('priority', 'seq', 'url', 'path', 'headers', 'host', 'deferred', 'download')
+
+	def __init__(self, priority, seq, url, path, headers):
+		self.priority = priority
+		self.seq = seq
+		self.url = url
+		self.path = path
+		self.headers = headers
+		self.host = url.split('/')[2] if '://' in url else ''
+		self.deferred = None  # type: Deferred
+		self.download = None  # type: Deferred
+
+	def __lt__(self, other):
+		return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class DownloadScheduler(object):
+	"""
+	Runs downloadPage with limited number of connections, in total and per host.
+	Jobs with lower priority value start first, jobs with equal priority in order of requests.
+	Cancelling the returned Deferred removes queued job or closes connection of the running one.
+	"""
+
+	def __init__(self, max_active=4, max_per_host=2):
+		self.max_active = max_active
+		self.max_per_host = max_per_host
+		self._queue = []  # type: List[DownloadJob]
+		self._jobs = {}  # type: Dict[Deferred, DownloadJob]
+		self._hosts = {}  # type: Dict[str, int]
+		self._running = 0
+		self._seq = 0
+
+	def download(self, url, path, headers=None, priority=PRIORITY_LOW):
+		self._seq += 1
+		job = DownloadJob(priority, self._seq, url, path, headers)
+		job.deferred = Deferred(partial(self._cancel, job))
+		self._jobs[job.deferred] = job
+		heappush(self._queue, job)
+		self._startNext()
+		return job.deferred
+
+	def raisePriority(self, d, priority):
+		"""Move queued job of the Deferred returned by download ahead"""
+		job = self._jobs.get(d)
+		if job is not None and job.download is None and priority < job.priority:
+			job.priority = priority
+			heapify(self._queue)
+
+	def _startNext(self):
+		postponed = []
+		while self._queue and self._running < self.max_active:
+			job = heappop(self._queue)
+			if self._hosts.get(job.host, 0) >= self.max_per_host:
+				postponed.append(job)
+				continue
+			self._start(job)
+		for job in postponed:
+			heappush(self._queue, job)
+
+	def _start(self, job):
+		job.download = downloadPage(job.url, job.path, job.headers)
+		if job.download is None:
+			self._jobs.pop(job.deferred, None)
+			job.deferred.errback(DownloadException("Bad url %s" % job.url))
+			return
+		self._running += 1
+		self._hosts[job.host] = self._hosts.get(job.host, 0) + 1
+		job.download.addBoth(self._finished, job)
+
+	def _finished(self, result, job):
+		self._running -= 1
+		self._hosts[job.host] -= 1
+		if not self._hosts[job.host]:
+			del self._hosts[job.host]
+		self._jobs.pop(job.deferred, None)
+		self._startNext()
+		job.deferred.callback(result)
+
+	def _cancel(self, job, _d):
+		self._jobs.pop(job.deferred, None)
+		if job.download is not None:
+			job.download.cancel()
+		else:
+			self._queue.remove(job)
+			heapify(self._queue)
+
+
+scheduler = DownloadScheduler()
 
 
 class PiconCache(object):
-	CACHE_SIZE = 50
+	"""
+	Picons downloaded to configurable location. Files are named by hash of url,
+	least recently used ones are removed when entry or size limits are exceeded.
+	The index is saved next to picons, and is rebuilt from the directory listing if it is lost.
+	Picons older than REVALIDATE seconds are shown and downloaded again if they changed on server.
+	When PIL is available, picons scaled to widget size are cached as separate entries.
+	"""
+	MAX_ENTRIES = 2000
+	REVALIDATE = 7 * 24 * 3600
+	INDEX_FILE = 'index.json'
+	SAVE_DELAY = 10  # seconds
 
 	def __init__(self):
-		self.picons = {}
+		self.path = PICON_LOCATIONS[0][0]
+		self.max_bytes = 5 * 1024 * 1024
+		self.size = 0
+		self.picons = None  # type: OrderedDict  # key -> [url, size, checked time], least recently used first
 		self.defers = {}
-		self.requests = deque()
+		self._revalidating = set()
+		self._scaling = {}  # key of scaled variant -> list of consumers
+		self._prefetch = []  # type: List[Deferred]
+		self._dirty = False
+		self._save_timer = eTimer()
+		self._save_timer.callback.append(self.saveIndex)
 		self.trace("init")
+
+	@staticmethod
+	def trace(*args):
+		print("[IPtvDream] PiconCache", ' '.join(map(str, args)))
+
+	@staticmethod
+	def key(url):
+		ext = os_path.splitext(url.split('?')[0])[1].lower()
+		if len(ext) > 5:
+			ext = ''
+		return '%016x%s' % (stableHash(url), ext)
+
+	def setLocation(self, path, max_bytes):
+		if self.picons is not None:
+			self.saveIndex()
+		self.path = path
+		self.max_bytes = max_bytes
+		self.picons = None
+
+	def _loadIndex(self):
+		"""Called on first use, because the cache is created at import time"""
+		self.picons = OrderedDict()
+		self.size = 0
 		try:
-			if not os_path.exists(PICON_PATH):
-				mkdir(PICON_PATH)
-			else:
-				for f in listdir(PICON_PATH):
-					self._onLoad(None, f, loaded=False)
-		except IOError as e:
-			self.trace(e)
-
-	def get(self, url):
-		f = url.split('/')[-1]
+			if not os_path.exists(self.path):
+				makedirs(self.path)
+		except (IOError, OSError) as e:
+			self.trace("can't use", self.path, e)
+			self.path = PICON_LOCATIONS[0][0]
+			if not os_path.exists(self.path):
+				makedirs(self.path)
 		try:
-			p = self.picons[f]
-			self.trace("return", url)
-			return succeed(p)
+			with open(self.path + self.INDEX_FILE) as f:
+				entries = json_load(f)
+		except (IOError, OSError, ValueError):
+			entries = self._rebuildIndex()
+		for k, url, size, checked in entries:
+			if os_path.isfile(self.path + k):
+				self.picons[k] = [url, size, checked]
+				self.size += size
+		self.trace("loaded", len(self.picons), "picons", self.size, "bytes from", self.path)
+		self._evict()
+
+	def _rebuildIndex(self):
+		self.trace("rebuild index")
+		entries = []
+		for k in listdir(self.path):
+			if k == self.INDEX_FILE or k.endswith('.new'):
+				continue
+			f = self.path + k
+			entries.append((k, None, os_path.getsize(f), os_path.getmtime(f)))
+		entries.sort(key=lambda e: e[3])
+		return entries
+
+	def saveIndex(self):
+		if self.picons is None or not self._dirty:
+			return
+		f = self.path + self.INDEX_FILE
+		try:
+			with open(f + '.new', 'w') as fd:
+				json_dump([[k] + v for k, v in self.picons.items()], fd)
+			rename(f + '.new', f)
+		except (IOError, OSError) as e:
+			self.trace("failed to save index", e)
+		else:
+			self._dirty = False
+
+	def _changed(self):
+		self._dirty = True
+		self._save_timer.start(self.SAVE_DELAY * 1000, True)
+
+	def _touch(self, k):
+		"""Mark entry as most recently used, new order is saved together with the next change"""
+		entry = self.picons[k]
+		if next(reversed(self.picons)) != k:
+			del self.picons[k]
+			self.picons[k] = entry
+			self._dirty = True
+		return entry
+
+	def get(self, url, priority=PRIORITY_HIGH):
+		if self.picons is None:
+			self._loadIndex()
+		k = self.key(url)
+		try:
+			entry = self._touch(k)
 		except KeyError:
-			return self.load(url, f)
+			return self.load(url, k, priority)
+		if entry[0] is None:
+			entry[0] = url  # entry from rebuilt index
+			self._changed()
+		if time() - entry[2] > self.REVALIDATE:
+			self.revalidate(url, k)
+		return succeed(self.path + k)
 
-	def load(self, url, f):
-		self.trace("load", url)
+	def load(self, url, k, priority=PRIORITY_HIGH):
+		consumer = Deferred(partial(self._consumerCancelled, k))
 		try:
-			d, consumers = self.defers[f]
-			consumers.append(Deferred())
+			d, consumers = self.defers[k]
 		except KeyError:
-			d = downloadPage(url, PICON_PATH + f)
-			if d:
-				d.addCallback(self._onLoad, f).addErrback(self._onError, f)
-				consumers = [Deferred()]
-				self.defers[f] = (d, consumers)
-			else:
-				return None
-		return consumers[-1]
-
-	def _onLoad(self, result, f, loaded=True):
-		pixmap = PICON_PATH + f
-		self.picons[f] = pixmap
-		self.requests.append(f)
-		if loaded:
-			d, consumers = self.defers.pop(f)
-			for consumer in consumers:
-				consumer.callback(pixmap)
-			del d
-		if len(self.requests) >= self.CACHE_SIZE:
-			self.trace("wipe cache", self.requests)
-			for _i in range(self.CACHE_SIZE // 2):
-				fname = self.requests.popleft()
-				del self.picons[fname]
-				eBackgroundFileEraser.getInstance().erase(PICON_PATH + fname)
-
-	def _onError(self, err, f):
-		self.trace(err)
-		_, consumers = self.defers.pop(f)
+			self.trace("load", url)
+			d = scheduler.download(url, self.path + k + '.new', priority=priority)
+			self.defers[k] = (d, [consumer])
+			d.addCallback(self._onLoad, url, k).addErrback(self._onError, k)
+		else:
+			consumers.append(consumer)
+			scheduler.raisePriority(d, priority)
+		return consumer
+
+	def _consumerCancelled(self, k, consumer):
+		"""Abort download when nobody waits for it"""
+		try:
+			d, consumers = self.defers[k]
+		except KeyError:
+			return
+		consumers.remove(consumer)
+		if not consumers:
+			self.trace("cancel", k)
+			del self.defers[k]
+			d.cancel()
+
+	def revalidate(self, url, k):
+		"""Download picon again if it was modified on server since it was saved"""
+		if k in self._revalidating or k in self.defers:
+			return
+		headers = {b'If-Modified-Since': b(formatdate(self.picons[k][2], usegmt=True))}
+		self._revalidating.add(k)
+		scheduler.download(url, self.path + k + '.new', headers, PRIORITY_LOW)\
+			.addCallback(self._onLoad, url, k).addErrback(self._onRevalidateError, url, k)
+
+	def _store(self, url, k):
+		f = self.path + k
+		rename(f + '.new', f)
+		try:
+			self.size -= self.picons.pop(k)[1]
+			self._dropVariants(k)
+		except KeyError:
+			pass
+		size = os_path.getsize(f)
+		self.picons[k] = [url, size, time()]
+		self.size += size
+		self._evict()
+		self._changed()
+		return f
+
+	def _onLoad(self, result, url, k):
+		self._revalidating.discard(k)
+		pixmap = self._store(url, k)
+		try:
+			d, consumers = self.defers.pop(k)
+		except KeyError:
+			return
 		for consumer in consumers:
-			consumer.errback(err)
+			consumer.callback(pixmap)
 
 	@staticmethod
-	def trace(*args):
-		print("[IPtvDream] PiconCache", ' '.join(map(str, args)))
+	def _variantPrefix(k):
+		return os_path.splitext(k)[0] + '_'
+
+	def _dropVariants(self, k):
+		prefix = self._variantPrefix(k)
+		for v in [v for v in self.picons if v.startswith(prefix)]:
+			self.size -= self.picons.pop(v)[1]
+			eBackgroundFileEraser.getInstance().erase(self.path + v)
+
+	def getScaled(self, url, width, height, priority=PRIORITY_HIGH):
+		"""
+		Like get, but fires with tuple (file name, scaled).
+		When PIL is available the picon is scaled to widget size once and the result is cached.
+		"""
+		d = self.get(url, priority)
+		if Image is None or not (width and height):
+			return d.addCallback(lambda f: (f, False))
+		return d.addCallback(self._scaled, width, height)
+
+	def _scaled(self, original, width, height):
+		k = '%s%dx%d.png' % (self._variantPrefix(os_path.basename(original)), width, height)
+		try:
+			self._touch(k)
+			return self.path + k, True
+		except KeyError:
+			pass
+
+		consumer = Deferred()
+		try:
+			self._scaling[k].append(consumer)
+			return consumer
+		except KeyError:
+			self._scaling[k] = [consumer]
+
+		def done(_result):
+			self._store(None, k)
+			return self.path + k, True
+
+		def failed(err):
+			self.trace("scale failed", err.getErrorMessage())
+			try:
+				remove(self.path + k + '.new')
+			except OSError:
+				pass
+			return original, False
+
+		def notify(result):
+			for c in self._scaling.pop(k):
+				c.callback(result)
+
+		deferToThread(scalePicon, original, self.path + k + '.new', width, height)\
+			.addCallbacks(done, failed).addCallback(notify)
+		return consumer
+
+	def prefetch(self, urls, width=0, height=0):
+		"""Download and scale picons in background with low priority, unfinished previous prefetch is cancelled"""
+		prefetch, self._prefetch = self._prefetch, []
+		for d in reversed(prefetch):  # queued jobs first, so they don't start when running ones are aborted
+			d.cancel()
+		for url in urls:
+			if url:
+				d = self.getScaled(url, width, height, PRIORITY_LOW).addErrback(lambda err: None)
+				if not d.called:
+					self._prefetch.append(d)
+
+	def _evict(self):
+		while self.picons and (self.size > self.max_bytes or len(self.picons) > self.MAX_ENTRIES):
+			k, (_url, size, _checked) = self.picons.popitem(last=False)
+			self.size -= size
+			eBackgroundFileEraser.getInstance().erase(self.path + k)
+
+	def _onRevalidateError(self, err, url, k):
+		self._revalidating.discard(k)
+		if k in self.picons:
+			# Not modified (304) or server is not available, check again later
+			self.picons[k][2] = time()
+			self._changed()
+
+	def _onError(self, err, k):
+		try:
+			_, consumers = self.defers.pop(k)
+		except KeyError:
+			return  # cancelled
+		self.trace(err)
+		for consumer in consumers:
+			consumer.errback(err)
 
 
 cache = PiconCache()
@@ -140,23 +471,34 @@ class Picon(object):
 		else:
 			self.picload.PictureData.get().append(self._paint)
 
+	def size(self):
+		if self.pixmap.instance is None:
+			return 0, 0
+		size = self.pixmap.instance.size()
+		return size.width(), size.height()
+
 	def setIcon(self, url):
 		self.pixmap.instance.setPixmap(empty_picon)
 		if self.d:
 			self.d.cancel()
 		if not url:
 			return
-		self.d = cache.get(url)
+		self.d = cache.getScaled(url, *self.size())
 		if self.d:
 			self.d.addCallback(self._onReady).addErrback(self._onFail).addErrback(fatalError)
 
-	def _onReady(self, file_name):
+	def prefetch(self, urls):
+		cache.prefetch(urls, *self.size())
+
+	def _onReady(self, result):
+		file_name, scaled = result
+		if scaled:
+			self.pixmap.instance.setPixmap(LoadPixmap(file_name))
+			return
 		sc = AVSwitch().getFramebufferScale()
 		trace(sc)
-		self.picload.setPara((
-			self.pixmap.instance.size().width(),
-			self.pixmap.instance.size().height(),
-			sc[0], sc[1], False, 1, "#00000000"))
+		width, height = self.size()
+		self.picload.setPara((width, height, sc[0], sc[1], False, 1, "#00000000"))
 		self.picload.startDecode(file_name)
 
 	def _paint(self, picInfo=None):
@@ -12,13 +12,14 @@
 from __future__ import print_function
 
 # system imports
-from os import system
+from os import system, path as os_path
 from datetime import datetime, timedelta
 from time import time, localtime, strftime, mktime
 from six.moves import urllib_parse
+from twisted.internet.defer import CancelledError
 try:
 	# noinspection PyUnresolvedReferences
-	from typing import Callable, Optional, List, Tuple  # pylint: disable=unused-import
+	from typing import Callable, Optional, List, Tuple, Dict  # pylint: disable=unused-import
 except ImportError:
 	pass
 
@@ -95,20 +96,18 @@ from enigma import eListboxPythonMultiContent, RT_HALIGN_LEFT, RT_HALIGN_RIGHT,
 	eLabel, eSize, ePoint, getDesktop, eServiceReference, eActionMap
 from skin import parseFont, parseColor
 
-try:
-	from enigma import iRecordableService
-except:
-	pass
-
 # plugin imports
 from .layer import eTimer
 from .common import NumberEnter
-from .utils import trace, tdSec, secTd, syncTime, APIException, APIWrongPin, EPG, SetEvent, timeit
+from .utils import trace, tdSec, secTd, syncTime, archiveJump, seekDistance, APIException, APIWrongPin, EPG, SetEvent
+from . import perf
 from .api.abstract_api import AbstractStream
 from .loc import translate as _
 from .common import ShowHideScreen, AutoAudioSelection, MainMenuScreen
 from .standby import standbyNotifier
-from .cache import LiveEpgWorker
+from .recordings import serverRecordings, streamHosts, ServerRecordings
+from .history import History, HistoryEntry
+from .cache import LiveEpgWorker, DayEpgCache, StandbyWarmup
 from .lib.epg import EpgProgress
 from .lib.tv import SortOrderSettings, Picon
 
@@ -312,6 +311,10 @@ class IPtvDreamStreamPlayer(
 		self.event = None
 		self.origProgramInfoAndEvent = None
 		self.shift = 0
+		# consecutive archive jumps restart the stream once, after the last one
+		self.jumpTimer = eTimer()
+		self.jumpTimer.callback.append(self.jumpTimerRun)
+		self.archive_pin = None  # (cid, pin) entered for the archive of the channel
 
 		self.waitMessageTimer = eTimer()
 		self.waitMessageTimer.callback.append(self.showWaitMessage)
@@ -319,9 +322,7 @@ class IPtvDreamStreamPlayer(
 		self.waitScreenSaverTimer = eTimer()
 		self.waitScreenSaverTimer.callback.append(self.ScreenSaverTimerStart)
 
-		if availabilityRecordTimers:
-			self.waitTimersCheck = eTimer()
-			self.waitTimersCheck.callback.append(self.waitTimersCheckStart)
+		self.recordings = None  # type: Optional[ServerRecordings]
 
 		if InfoBar.instance is not None:
 			try:
@@ -357,11 +358,8 @@ class IPtvDreamStreamPlayer(
 				InfoBar.instance.getProgramInfoAndEvent = self.origProgramInfoAndEvent
 		except:
 			pass
-		try:
-			if checkServerRecording and self.checkServerRecordings in self.session.nav.record_event:
-				self.session.nav.record_event.remove(self.checkServerRecordings)
-		except:
-			pass
+		if self.recordings is not None:
+			self.recordings.onChanged.remove(self.checkServerRecordings)
 		self.close(ret)
 
 	def confirmExit(self):
@@ -468,6 +466,7 @@ class IPtvDreamStreamPlayer(
 		trace("play cid =", cid)
 
 		self.cid = cid
+		self.jumpTimer.stop()
 		self.session.nav.stopService()
 		self.event = None
 		self.archive_pause = None
@@ -485,6 +484,8 @@ class IPtvDreamStreamPlayer(
 		if self.db.channels[cid].is_protected:
 			trace("protected by api")
 			code = self.cfg.parental_code.value
+			if not code and self.shift and self.archive_pin and self.archive_pin[0] == cid:
+				code = self.archive_pin[1]
 			if code:
 				trace("using saved code")
 				self.getUrl(code)
@@ -498,7 +499,8 @@ class IPtvDreamStreamPlayer(
 
 	def getUrl(self, pin):
 		try:
-			url = self.db.getStreamUrl(self.cid, pin, self.time())
+			with self.db.lock:
+				url = self.db.getStreamUrl(self.cid, pin, self.time())
 		except APIWrongPin:
 			self.session.openWithCallback(
 					lambda ret: self.enterPin(), MessageBox, _("Wrong pin!"),
@@ -508,59 +510,33 @@ class IPtvDreamStreamPlayer(
 			self.showError(_("Error while getting stream url:") + str(e))
 			self.updateLabels()
 			return
+		if pin is not None:
+			self.archive_pin = (self.cid, pin)
 		self.playUrl(url)
 
-	def checkServerRecordings(self, service, event):
-		if event in (iRecordableService.evEnd, iRecordableService.evStart, None):
-			self.waitTimersCheck.stop()
-			self.waitTimersCheck.start(5000, True)
-
-	def waitTimersCheckStart(self):
-		if self["inServerRecording"].getBoolean():
-			self["inServerRecording"].setBoolean(False)
-		try:
-			if checkServerRecording:
-				try:
-					timersrecords = self.session.nav.RecordTimer.timer_list[:]
-				except:
-					timersrecords = []
-				try:
-					processed_timers = self.session.nav.RecordTimer.processed_timers[:]
-				except:
-					processed_timers  = []
-				alltimers = timersrecords + processed_timers
-				if alltimers:
-					for timer in alltimers:
-						if timer and timer.service_ref and timer.service_ref.ref and not timer.justplay and not timer.disabled and timer.state in (1, 2):
-							str_timer_ref = timer.service_ref.ref.toString()
-							if '%3a//' in str_timer_ref and checkServerRecording in str_timer_ref:
-								if not self["inServerRecording"].getBoolean():
-									self["inServerRecording"].setBoolean(True)
-								break
-		except:
-			pass
+	def checkServerRecordings(self):
+		recording = bool(self.recordings and checkServerRecording and self.recordings.isRecording(checkServerRecording))
+		if self["inServerRecording"].getBoolean() != recording:
+			self["inServerRecording"].setBoolean(recording)
 
 	def initMonitoringRecording(self):
 		global checkServerRecording
 		if availabilityRecordTimers and self.play_service and checkServerRecording is None:
 			try:
-				if self.checkServerRecordings not in self.session.nav.record_event:
-					self.session.nav.record_event.append(self.checkServerRecordings)
-				server = ""
-				str_service = self.play_service.toString()
-				splitref = str_service.split('/')
-				if not self.cfg.use_hlsgw.value:
-					if len(splitref) > 2 and splitref[2]:
-						server = splitref[2]
-				elif len(splitref) > 5 and splitref[5]:
-					server = splitref[5]
-				if server:
-					checkServerRecording = server
-					self.checkServerRecordings(None, None)
-				else:
-					checkServerRecording = False
+				hosts = streamHosts(self.play_service.getPath())
+				if self.cfg.use_hlsgw.value:
+					hosts -= streamHosts(self.play_service.getPath().split('/url=')[0])
+				checkServerRecording = hosts or False
+			except:
+				checkServerRecording = False
+		if checkServerRecording and self.recordings is None:
+			try:
+				self.recordings = serverRecordings(self.session.nav)
 			except:
 				checkServerRecording = False
+				return
+			self.recordings.onChanged.append(self.checkServerRecordings)
+			self.checkServerRecordings()
 
 	def playUrl(self, url):
 		global checkServerRecording
@@ -577,12 +553,17 @@ class IPtvDreamStreamPlayer(
 				system("echo 1 > /proc/sys/vm/drop_caches") 
 		#ref.setUnsignedData(1, cid)
 		self.play_service = ref
-		if availabilityRecordTimers and checkServerRecording is None:
+		if availabilityRecordTimers and (checkServerRecording is None or self.recordings is None):
 			self.initMonitoringRecording()
 		self.session.nav.playService(ref)
 		self.channels.current_cid = cid
 		self.updateLabels()
 
+	PICON_PREFETCH = 100  # channels
+
+	def prefetchPicons(self, channels):
+		self._picon.prefetch([self.db.getPiconUrl(c.cid) for c in channels[:self.PICON_PREFETCH]])
+
 	def updateLabels(self):
 		cid = self.cid
 		self["channelName"].setText("%d. %s" % ((self.channels.mode != 1 and self.alternativeNumber and self.db.channels[cid].alt_number) or self.db.channels[cid].number, self.db.channels[cid].name))
@@ -660,16 +641,51 @@ class IPtvDreamStreamPlayer(
 			minutes = 0
 		return minutes and self.rwdJump(minutes * 60)
 
+	ARCHIVE_JUMP_DELAY = 700  # ms
+
 	def fwdJump(self, seconds):
 		trace("fwdSeek", seconds)
-		self.shift += seconds
-		if self.shift > 0:
+		self.shift = archiveJump(self.shift, seconds)
+		if not self.shift:
 			self.setArchiveShift(0)
-		self.play(self.cid)
+			self.play(self.cid)
+		else:
+			self.seekArchive(seconds)
 
 	def rwdJump(self, seconds):
 		trace("rwdSeek", seconds)
-		self.shift -= seconds
+		self.shift = archiveJump(self.shift, -seconds)
+		self.seekArchive(-seconds)
+
+	def seekArchive(self, seconds):
+		"""
+		Move archive playback by seconds, self.shift is already changed.
+		Seek inside the running service if target is already downloaded,
+		otherwise restart stream when user stops jumping.
+		"""
+		if not self.seekInService(seconds):
+			self.jumpTimer.start(self.ARCHIVE_JUMP_DELAY, True)
+		self.epgEvent()
+
+	def seekInService(self, seconds):
+		if not self.cfg.use_hlsgw.value or self.archive_pause or self.jumpTimer.isActive():
+			return False
+		service = self.session.nav.getCurrentService()
+		seek = service and service.seek()
+		if not seek or not seek.isCurrentlySeekable():
+			return False
+		length = seek.getLength()
+		position = seek.getPlayPosition()
+		if length[0] or position[0]:
+			return False
+		pts = seekDistance(position[1], length[1], seconds)
+		if pts is None:
+			return False
+		trace("seek in service", seconds)
+		seek.seekRelative(seconds < 0 and -1 or 1, abs(pts))
+		return True
+
+	def jumpTimerRun(self):
 		self.play(self.cid)
 
 	def jump(self, n):
@@ -769,7 +785,8 @@ class IPtvDreamStreamPlayer(
 
 		if not setEpgCurrent():
 			try:
-				self.db.loadDayEpg(cid, this_time)
+				with self.db.lock:
+					self.db.loadDayEpg(cid, this_time)
 			except APIException as e:
 				trace("ERROR load epg failed! cid =", cid, bool(self.shift), e)
 			if not setEpgCurrent():
@@ -790,7 +807,8 @@ class IPtvDreamStreamPlayer(
 
 		if not setEpgNext():
 			try:
-				self.db.loadDayEpg(cid, this_time)
+				with self.db.lock:
+					self.db.loadDayEpg(cid, this_time)
 			except APIException:
 				trace("load epg next failed!")
 			if not setEpgNext():
@@ -813,7 +831,9 @@ class IPtvDreamStreamPlayer(
 
 	def showEpg(self):
 		if self.cid:
-			self.session.openWithCallback(self.programSelected, IPtvDreamEpg, self.db, self.cid, self.shift, self.channels.mode, self.cfg)
+			self.session.openWithCallback(
+				self.programSelected, IPtvDreamEpg, self.db, self.cid, self.shift, self.channels.mode, self.cfg,
+				self.channels.day_epg)
 
 	def programSelected(self, cid=None, archive_time=None, zaptimer=None):
 		if zaptimer is not None and cid is not None:
@@ -877,7 +897,7 @@ class IPtvDreamStreamPlayer(
 			self.waitScreenSaverTimer.stop()
 			self.waitScreenSaverTimer.start(200, True)
 		if checkServerRecording:
-			self.checkServerRecordings(None, None)
+			self.checkServerRecordings()
 		if action is None:
 			self.channelSelected(cid, time)
 		elif isinstance(action, int):
@@ -1294,6 +1314,7 @@ class ChannelList(MenuList):
 				0, RT_HALIGN_LEFT | RT_VALIGN_CENTER, group.title)
 		]
 
+	@perf.timed('ui.channels.buildEntry')
 	def buildChannelEntry(self, entry):
 		"""
 		:type entry: Tuple[utils.Channel, utils.EPG]
@@ -1362,107 +1383,6 @@ class ChannelList(MenuList):
 		return lst
 
 
-class History(object):
-	def __init__(self, size):
-		self._size = size
-		self._history = []  # type: List[HistoryEntry]
-		self._index = -1
-
-	def isEmpty(self):
-		return len(self._history) == 0
-
-	def counts(self):
-		return len(self._history)
-
-	def replace(self, curr):
-		add = None
-		if self.counts() > 1:
-			for s in self._history:
-				if curr and curr == s.cid:
-					add = s
-					self._history.remove(s)
-					break
-			if add:
-				self._history.append(add)
-				#self._index = len(self._history) - 1
-
-	def clear(self):
-		if self.counts() > 1:
-			self._history = self._history[-1:]
-			self._index = 0
-			return True
-		return False
-
-	def delCurrent(self, curr):
-		if self.counts() > 1:
-			for s in self._history:
-				if curr and curr == s.cid:
-					self._history.remove(s)
-					self._index -= 1
-					return True
-		return False
-
-	def append(self, val):
-		#while len(self._history) > self._index + 1:
-		#	self._history.pop()
-		oldlst = self._history[:]
-		for s in oldlst:
-			if val.cid and val.cid == s.cid:
-				oldlst.remove(s)
-				self._index -= 1
-				break
-		self._history = oldlst
-		self._history.append(val)
-		if len(self._history) > self._size:
-			self._history.pop(0)
-		self._index = len(self._history) - 1
-
-	def historyPrev(self):
-		if self._index < 1:
-			return None
-		else:
-			self._index -= 1
-			return self._history[self._index]
-
-	def historyNext(self):
-		if self._index + 1 == len(self._history):
-			return None
-		else:
-			self._index += 1
-			return self._history[self._index]
-
-	def now(self):
-		if len(self._history):
-			return self._history[self._index]
-		else:
-			return None
-
-	def __repr__(self):
-		return repr(list(map(str, self._history)))
-
-
-class HistoryEntry(object):
-	def __init__(self, mode, gid, gr_idx, cid, ch_idx):
-		self.mode = mode
-		self.gid, self.gr_idx = gid, gr_idx
-		self.cid, self.ch_idx = cid, ch_idx
-
-	def copy(self):
-		return HistoryEntry(self.mode, self.gid, self.gr_idx, self.cid, self.ch_idx)
-
-	def fromStr(self, s):
-		self.mode, self.gid, self.gr_idx, self.cid, self.ch_idx = list(map(int, s.split(",")))
-
-	def toStr(self):
-		return ",".join(map(str, (self.mode, self.gid, self.gr_idx, self.cid, self.ch_idx)))
-
-	def makeTuple(self):
-		return self.mode, self.gid, self.gr_idx, self.cid, self.ch_idx
-
-	def __repr__(self):
-		return "HistoryEntry(%d, (%d, %d), (%d, %d))" % (self.mode, self.gid, self.gr_idx, self.cid, self.ch_idx)
-
-
 class VerticalLayoutPart(object):
 	"""
 	Grow program name label while title does not fit, and shrink program description accordingly
@@ -1509,8 +1429,9 @@ class IPtvDreamChannels(Screen):
 		Screen.__init__(self, session)
 
 		trace("channels init")
-		self.history = History(config.plugins.IPtvDream.numbers_history.value)
 		self.db = db  # type: AbstractStream
+		self.history = History(
+			config.plugins.IPtvDream.numbers_history.value, os_path.join(EPGMAP_PATH, '%s.history' % db.NAME))
 		self.player = player
 		from .manager import manager
 		self.cfg = manager.getConfig(self.db.NAME)
@@ -1541,11 +1462,16 @@ class IPtvDreamChannels(Screen):
 		self._worker = LiveEpgWorker(db)
 		self._worker.onUpdate.append(self.updatePrograms)
 		self.onClose.append(self._worker.destroy)
+		self.day_epg = DayEpgCache(db)
+		self._warmup = StandbyWarmup(self.day_epg, self.warmupChannels)
+		self.onClose.append(self._warmup.stop)
 
 		def workerStandby(sleep):
 			if sleep:
 				self._worker.stop()
+				self._warmup.start()
 			else:
+				self._warmup.stop()
 				self._worker.update()
 		standbyNotifier.onStandbyChanged.append(workerStandby)
 		self.onClose.append(lambda: standbyNotifier.onStandbyChanged.remove(workerStandby))
@@ -1607,6 +1533,7 @@ class IPtvDreamChannels(Screen):
 	def start(self):
 		trace("Channels list shown")
 		self.saved_state = None
+		self.history.setSize(config.plugins.IPtvDream.numbers_history.value)
 		if not self.history.isEmpty():
 			if self.history.counts() > 1:
 				self["key_yellow"].setText(_("History"))
@@ -1619,13 +1546,9 @@ class IPtvDreamChannels(Screen):
 
 	def saveQuery(self):
 		trace("save query")
-		h = self.history.now()
-		if h is not None:
-			self.cfg.last_played.value = self.history.now().toStr()
-		else:
-			self.cfg.last_played.value = ""
-		self.cfg.last_played.save()
+		# position is kept in the history file, config.last_played is not used anymore
 		configfile.save()
+		self.history.save()
 
 	def createHistoryEntry(self):
 		entry = self.getSelected()
@@ -1680,7 +1603,7 @@ class IPtvDreamChannels(Screen):
 				self["key_yellow"].setText("")
 			self.close(cid, time)
 
-	@timeit
+	@perf.timed('ui.channels.updateProgress')
 	def updateProgramsProgress(self):
 		if self.mode != self.GROUPS:
 			#print("Updating list progressbars")
@@ -1698,9 +1621,11 @@ class IPtvDreamChannels(Screen):
 					continue
 				self.list.updateChannel(cid, (channel, epg))
 
-	@timeit
+	@perf.timed('ui.channels.setChannels')
 	def setChannels(self, channels):
 		self.list.setChannelsList((c, self._worker.get(c.cid)) for c in channels)
+		if self.player:
+			self.player.prefetchPicons(channels)
 
 	def fillGroupsList(self):
 		self.setTitle(" / ".join([self.db.NAME, _("Groups")]))
@@ -1715,6 +1640,7 @@ class IPtvDreamChannels(Screen):
 			else:
 				self.gid = None
 
+	@perf.timed('ui.channels.fillList')
 	def fillList(self):
 		title = [self.db.NAME]
 		order = self.order_config.getValue()
@@ -1851,15 +1777,18 @@ class IPtvDreamChannels(Screen):
 	def prevGroup(self):
 		self.npGroup(-1)
 
+	def warmupChannels(self):
+		"""Channels to prefetch EPG for in standby: recently watched, then favourites"""
+		cids = self.history.cids()
+		if self.db.got_favourites:
+			cids += self.db.favourites
+		return [cid for cid in cids if cid in self.db.channels]
+
 	def openHistory(self):
 		self.historyList = []
-		history = [entry.cid for entry in self.history._history]
-		if len(history) > 1:
-			for cid in reversed(history):
-				try:
-					self.historyList.append(self.db.channels[cid])
-				except:
-					trace("error history cid ", cid)
+		if self.history.counts() > 1:
+			channels = self.db.channels
+			self.historyList = [channels[cid] for cid in self.history.cids() if cid in channels]
 			if self.historyList:
 				self.mode = self.HISTORY
 				self.fillList()
@@ -2131,7 +2060,8 @@ class IPtvDreamChannels(Screen):
 	def showEpgList(self):
 		channel = self.getSelected()
 		if channel and self.modeChannels():
-			self.session.openWithCallback(self.showEpgCB, IPtvDreamEpg, self.db, channel.cid, 0, self.mode, self.cfg)
+			self.session.openWithCallback(
+				self.showEpgCB, IPtvDreamEpg, self.db, channel.cid, 0, self.mode, self.cfg, self.day_epg)
 
 	def showEpgCB(self, cid=None, archive_time=None, zaptimer=None):
 		if zaptimer is not None and self.player:
@@ -2250,7 +2180,7 @@ class IPtvDreamChannels(Screen):
 
 
 class IPtvDreamEpg(Screen):
-	def __init__(self, session, db, cid, shift, mode, cfg):
+	def __init__(self, session, db, cid, shift, mode, cfg, day_epg=None):
 		Screen.__init__(self, session)
 
 		self["caption"] = Label(_("EPG List"))
@@ -2296,8 +2226,11 @@ class IPtvDreamEpg(Screen):
 		self.curr = False
 		self.day = 0
 		self.mode = mode
+		self.day_epg = day_epg or DayEpgCache(db)
+		self._loading = None
 		self.list.onSelectionChanged.append(self.updateLabels)
 		self.onShown.append(self.start)
+		self.onClose.append(self.cancelLoading)
 
 	def start(self):
 		self.onShown.remove(self.start)
@@ -2310,28 +2243,60 @@ class IPtvDreamEpg(Screen):
 			pixmap = None
 		return entry, pixmap, entry.begin.strftime('%a'), entry.begin.strftime('%H:%M'), entry.name
 
-	def fillList(self, init=False):
+	@perf.timed('ui.epg.fillList')
+	def fillList(self, init=False, select_last=False):
 		if self.cid is None:
 			return
+		self.cancelLoading()
 
 		time = syncTime() + secTd(self.shift)
 		d = time + timedelta(self.day)
+		date = datetime(d.year, d.month, d.day)
+
+		epg_list = self.day_epg.get(self.cid, date)
+		if epg_list is None:
+			self._loading = self.day_epg.loading(self.cid, date)
+			if self._loading is not None:
+				# day is being prefetched, show it when ready
+				self.list.setList([])
+				self._loading.addCallback(self.showDay, date, time, init, select_last).addErrback(self.loadFailed)
+				return
+			try:
+				epg_list = self.day_epg.load(self.cid, date)
+			except APIException as e:
+				self.session.open(MessageBox, _("Can not load EPG:") + str(e), MessageBox.TYPE_ERROR, 5)
+				epg_list = []
+		self.showDay(epg_list, date, time, init, select_last)
 
-		epg_list = []
-		try:
-			epg_list = self.db.getDayEpg(self.cid, datetime(d.year, d.month, d.day))
-		except APIException as e:
-			self.session.open(MessageBox, _("Can not load EPG:") + str(e), MessageBox.TYPE_ERROR, 5)
+	def showDay(self, epg_list, date, time, init, select_last):
+		self._loading = None
 		self.list.setList(list(map(self.buildEpgEntry, epg_list)))
-		self.list.setIndex(0)
+		if select_last:
+			self.list.setIndex(max(0, self.list.count() - 1))
+		else:
+			self.list.setIndex(0)
 
 		if init:
-			self.setTitle("EPG / %s / %s %s" % (self.db.channels[self.cid].name, d.strftime("%d"), _(d.strftime("%b"))))
+			self.setTitle("EPG / %s / %s %s" % (self.db.channels[self.cid].name, date.strftime("%d"), _(date.strftime("%b"))))
 			for i, program in enumerate(epg_list):
 				if program.isAt(time):
 					self.list.setIndex(i)
 					break
 
+		self.day_epg.prefetch(self.cid, date + timedelta(1))
+		self.day_epg.prefetch(self.cid, date - timedelta(1))
+
+	def loadFailed(self, err):
+		self._loading = None
+		if err.check(CancelledError):
+			return
+		self.session.open(MessageBox, _("Can not load EPG:") + err.getErrorMessage(), MessageBox.TYPE_ERROR, 5)
+
+	def cancelLoading(self):
+		if self._loading is not None:
+			d, self._loading = self._loading, None
+			d.cancel()
+
 	def updateLabels(self):
 		entry = self.list.getCurrent()
 		if not entry:
@@ -2441,7 +2406,8 @@ class IPtvDreamEpg(Screen):
 					date = date + 60 * 60 * 24
 				begin = date
 				end = date + duration
-			url = self.db.getStreamUrl(self.cid, None, currtime)
+			with self.db.lock:
+				url = self.db.getStreamUrl(self.cid, None, currtime)
 			#if self.cfg.use_hlsgw.value:
 			#	url = "http://localhost:7001/url=%s" % urllib_parse.quote(url)
 			serviceref = eServiceReference(int(self.cfg.playerid.value), 0, url)
@@ -2537,8 +2503,7 @@ class IPtvDreamEpg(Screen):
 	def up(self):
 		idx = self.list.getIndex()
 		if idx == 0:
-			self.prevDay()
-			self.list.setIndex(self.list.count() - 1)
+			self.prevDay(True)
 		else:
 			self.list.selectPrevious()
 
@@ -2552,8 +2517,7 @@ class IPtvDreamEpg(Screen):
 	def pageUp(self):
 		idx = self.list.getIndex()
 		if idx == 0:
-			self.prevDay()
-			self.list.setIndex(self.list.count() - 1)
+			self.prevDay(True)
 		else:
 			self.list.pageUp()
 
@@ -2568,9 +2532,9 @@ class IPtvDreamEpg(Screen):
 		self.day += 1
 		self.fillList()
 
-	def prevDay(self):
+	def prevDay(self, select_last=False):
 		self.day -= 1
-		self.fillList()
+		self.fillList(select_last=select_last)
 
 
 class IPtvDreamEpgInfo(Screen):
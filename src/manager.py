@@ -47,6 +47,7 @@ from .utils import trace, APIException, APILoginFailed
 from .loc import translate as _
 from .settings import IPtvDreamConfig, IPtvDreamWebConfig, SettingsRepository, WebConfig
 from .main import IPtvDreamStreamPlayer, IPtvDreamChannels
+from .lib.tv import cache as picon_cache, PICON_LOCATIONS, PICON_CACHE_SIZES
 
 PLAYERS = [("1", "enigma2 TS (1:)"), ("4097", "Gstreamer/ServiceHisilicon (4097:)"), ("5002", "exteplayer3 (5002:)")]
 KEYMAPS = [("enigma", "enigma"), ("neutrino", "neutrino")]
@@ -60,6 +61,15 @@ pluginConfig.alternative_number_in_servicelist = ConfigYesNo(default=False)
 pluginConfig.ok_open_servicelist = ConfigYesNo(default=False)
 pluginConfig.numbers_history = ConfigInteger(10, (1, 30))
 pluginConfig.default_start_time_archive = ConfigClock(default=mktime((1970, 1, 1, 2, 0, 0, 0, 0, 0))) # 02:00
+pluginConfig.picon_path = ConfigSelection(PICON_LOCATIONS, default=PICON_LOCATIONS[0][0])
+pluginConfig.picon_cache_size = ConfigSelection(PICON_CACHE_SIZES, default="5")
+
+
+def setupPiconCache():
+	picon_cache.setLocation(pluginConfig.picon_path.value, int(pluginConfig.picon_cache_size.value) * 1024 * 1024)
+
+
+setupPiconCache()
 
 
 class TimeInput(ConfigListScreen, Screen):
@@ -572,6 +582,10 @@ class IPtvDreamManager(Screen):
 		if pluginConfig.keymap_type.value == "enigma":
 			actions += [(_("Enable OK for servicelist") + _(": current (%s)") % (pluginConfig.ok_open_servicelist.value and _("yes") or _("no")), self.okShowServicelistMode,)]
 		actions += [(_("Default recordings start time for archive"), self.setArchiveTime,)]
+		actions += [
+			(_("Picon cache location") + _(": current (%s)") % pluginConfig.picon_path.getText(), self.selectPiconPath),
+			(_("Picon cache size") + _(": current (%s)") % pluginConfig.picon_cache_size.getText(), self.selectPiconCacheSize),
+		]
 		self.session.openWithCallback(cb, ChoiceBox, _("Context menu"), actions)
 
 	def setArchiveTime(self):
@@ -605,6 +619,24 @@ class IPtvDreamManager(Screen):
 				pluginConfig.numbers_history.save()
 		self.session.openWithCallback(cb, MinuteInput,basemins=pluginConfig.numbers_history.value)
 
+	def selectPiconPath(self):
+		def cb(selected):
+			if selected is not None:
+				pluginConfig.picon_path.value = selected[1]
+				pluginConfig.picon_path.save()
+				setupPiconCache()
+		choices = [(title, path) for path, title in PICON_LOCATIONS]
+		self.session.openWithCallback(cb, ChoiceBox, title=_("Picon cache location"), list=choices)
+
+	def selectPiconCacheSize(self):
+		def cb(selected):
+			if selected is not None:
+				pluginConfig.picon_cache_size.value = selected[1]
+				pluginConfig.picon_cache_size.save()
+				setupPiconCache()
+		choices = [(title, size) for size, title in PICON_CACHE_SIZES]
+		self.session.openWithCallback(cb, ChoiceBox, title=_("Picon cache size"), list=choices)
+
 	def selectKeymap(self):
 		def cb(selected):
 			if selected is not None:
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+# Enigma2 IPtvDream player framework
+#
+#  Copyright (c) 2020 Alex Maystrenko <alexeytech@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+"""
+Performance instrumentation: named counters and histograms of durations.
+Disabled by default, then instrumented functions cost one global check.
+Enable with IPTVDREAM_PERF=1 environment variable or enable(), and read the
+results with snapshot(), dump() or from /perf of the api proxy.
+"""
+
+import atexit
+import os
+from bisect import bisect_left
+from functools import wraps
+from json import dump as json_dump
+from threading import Lock
+from timeit import default_timer as clock
+
+DUMP_PATH = '/tmp/iptvdream-perf.json'
+
+enabled = False
+_dump_registered = False
+
+
+class Histogram(object):
+	__slots__ = ('count', 'total', 'min', 'max', 'buckets')
+	BOUNDS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1., 5.)  # seconds
+
+	def __init__(self):
+		self.count = 0
+		self.total = 0.
+		self.min = None
+		self.max = 0.
+		self.buckets = [0] * (len(self.BOUNDS) + 1)
+
+	def add(self, value):
+		self.count += 1
+		self.total += value
+		if self.min is None or value < self.min:
+			self.min = value
+		if value > self.max:
+			self.max = value
+		self.buckets[bisect_left(self.BOUNDS, value)] += 1
+
+	def toJson(self):
+		return {
+			'count': self.count, 'total': self.total, 'min': self.min, 'max': self.max,
+			'avg': self.total / self.count if self.count else None,
+			'buckets': dict(zip(['<=%s' % b for b in self.BOUNDS] + ['>%s' % self.BOUNDS[-1]], self.buckets)),
+		}
+
+
+class Registry(object):
+	def __init__(self):
+		self.counters = {}
+		self.histograms = {}
+		self._lock = Lock()
+
+	def count(self, name, n=1):
+		with self._lock:
+			self.counters[name] = self.counters.get(name, 0) + n
+
+	def observe(self, name, seconds):
+		with self._lock:
+			try:
+				h = self.histograms[name]
+			except KeyError:
+				h = self.histograms[name] = Histogram()
+			h.add(seconds)
+
+	def snapshot(self):
+		with self._lock:
+			return {
+				'counters': dict(self.counters),
+				'histograms': dict((name, h.toJson()) for name, h in self.histograms.items()),
+			}
+
+	def reset(self):
+		with self._lock:
+			self.counters.clear()
+			self.histograms.clear()
+
+
+registry = Registry()
+
+
+def enable(value=True):
+	global enabled, _dump_registered
+	enabled = value
+	if enabled and not _dump_registered:
+		_dump_registered = True
+		atexit.register(_dumpAtExit)
+
+
+def _dumpAtExit():
+	if enabled:
+		try:
+			dump()
+		except (IOError, OSError):
+			pass
+
+
+def count(name, n=1):
+	if enabled:
+		registry.count(name, n)
+
+
+def observe(name, seconds):
+	if enabled:
+		registry.observe(name, seconds)
+
+
+def snapshot():
+	return dict(registry.snapshot(), enabled=enabled)
+
+
+def dump(path=DUMP_PATH):
+	with open(path, 'w') as f:
+		json_dump(snapshot(), f, indent=1, sort_keys=True)
+
+
+class span(object):
+	"""
+	Measure duration of a block:
+		with span('epg.worker.update'):
+			...
+	"""
+	__slots__ = ('name', 'start')
+
+	def __init__(self, name):
+		self.name = name
+		self.start = None
+
+	def __enter__(self):
+		if enabled:
+			self.start = clock()
+		return self
+
+	def __exit__(self, *exc):
+		if self.start is not None:
+			registry.observe(self.name, clock() - self.start)
+		return False
+
+
+def timed(name):
+	"""Decorator that records duration of function calls in histogram with given name"""
+	def decorator(f):
+		@wraps(f)
+		def wrapper(*args, **kwargs):
+			if not enabled:
+				return f(*args, **kwargs)
+			start = clock()
+			try:
+				return f(*args, **kwargs)
+			finally:
+				registry.observe(name, clock() - start)
+		return wrapper
+	return decorator
+
+
+if os.environ.get('IPTVDREAM_PERF'):
+	enable()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+# Enigma2 IPtvDream player framework
+#
+#  Copyright (c) 2020 Alex Maystrenko <alexeytech@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+from __future__ import print_function
+
+import re
+from six.moves.urllib_parse import unquote
+
+from .utils import trace
+
+try:
+	from enigma import iRecordableService
+	RECORD_STARTED = tuple(
+		getattr(iRecordableService, e) for e in ('evStart', 'evRecordRunning') if hasattr(iRecordableService, e))
+	RECORD_STOPPED = tuple(
+		getattr(iRecordableService, e) for e in ('evEnd', 'evRecordStopped', 'evRecordFailed', 'evRecordAborted')
+		if hasattr(iRecordableService, e))
+except ImportError:
+	RECORD_STARTED = RECORD_STOPPED = ()
+
+_netloc = re.compile(r'://([^/?#]+)')
+
+
+def streamHosts(url):
+	"""Servers of stream url, including stream passed through the local gateway"""
+	return frozenset(_netloc.findall(unquote(unquote(url))))
+
+
+def _sameService(a, b):
+	try:
+		return a.__deref__() == b.__deref__()
+	except AttributeError:
+		return a == b
+
+
+class ServerRecordings(object):
+	"""
+	Stream recordings running now, indexed by server.
+	Index is updated from record events of navigation, finished timers are never scanned.
+	"""
+
+	def __init__(self, nav):
+		self.nav = nav
+		self.onChanged = []
+		self._running = []  # [(record service, hosts)], few items, one per running recording
+		self._hosts = {}  # host -> number of running recordings
+		nav.record_event.append(self.recordEvent)
+		self.rebuild()
+
+	def trace(self, *args):
+		trace("ServerRecordings", *args)
+
+	@staticmethod
+	def _timerHosts(timer):
+		if timer.justplay or timer.disabled or not timer.service_ref or not timer.service_ref.ref:
+			return frozenset()
+		return streamHosts(timer.service_ref.ref.getPath())
+
+	def _add(self, service, hosts):
+		if not hosts or any(_sameService(s, service) for s, _ in self._running):
+			return False
+		self._running.append((service, hosts))
+		for h in hosts:
+			self._hosts[h] = self._hosts.get(h, 0) + 1
+		return True
+
+	def _remove(self, service):
+		for i, (s, hosts) in enumerate(self._running):
+			if _sameService(s, service):
+				del self._running[i]
+				for h in hosts:
+					n = self._hosts.pop(h) - 1
+					if n > 0:
+						self._hosts[h] = n
+				return True
+		return False
+
+	def rebuild(self):
+		"""Index recordings from pending timers, called once, when recordings could start before us"""
+		self._running = []
+		self._hosts = {}
+		for timer in self.nav.RecordTimer.timer_list:
+			if timer.state in (1, 2) and timer.record_service:
+				self._add(timer.record_service, self._timerHosts(timer))
+
+	def _findTimer(self, service):
+		for timer in self.nav.RecordTimer.timer_list:
+			if timer.record_service and _sameService(timer.record_service, service):
+				return timer
+		return None
+
+	def recordEvent(self, service, event):
+		if event in RECORD_STARTED:
+			timer = self._findTimer(service)
+			changed = timer is not None and self._add(service, self._timerHosts(timer))
+		elif event in RECORD_STOPPED:
+			changed = self._remove(service)
+		else:
+			return
+		if changed:
+			self.trace("recording servers", list(self._hosts.keys()))
+			for f in self.onChanged:
+				f()
+
+	def isRecording(self, hosts):
+		"""True if stream from any of hosts is being recorded"""
+		return any(h in self._hosts for h in hosts)
+
+
+_instance = None
+
+
+def serverRecordings(nav):
+	global _instance
+	if _instance is None:
+		_instance = ServerRecordings(nav)
+	return _instance
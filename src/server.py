@@ -9,82 +9,352 @@
 # (at your option) any later version.
 
 # system imports
+import re
+from os import path as os_path
+from time import time
+from datetime import datetime, timedelta
+from threading import Lock
+from json import dumps as json_dumps
+from six import b
+from six.moves import urllib_parse
 from twisted.internet import reactor
-from twisted.web.server import Site
+from twisted.internet.defer import Deferred
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.threadpool import ThreadPool
+from twisted.web.server import Site, NOT_DONE_YET
 from twisted.web import resource, util
 try:
 	from twisted.web.error import ErrorPage
 except ImportError:
 	from twisted.web.resource import ErrorPage
 
+# enigma2 imports
+from Components.config import config
+
 # plugin imports
 from .manager import manager
+from .layer import eTimer
 from .utils import trace, APIException
+from .api.abstract_api import http_cache
+from . import perf
+
+PROXY_PORT = 9001
+
+# proxy url in service reference, http%3a//localhost%3a9001/<provider>/<cid>
+_proxy_ref = re.compile(r'(?:localhost|127\.0\.0\.1)(?::|%%3a)%d/([^/:]+)/\d+' % PROXY_PORT, re.IGNORECASE)
 
 
 class ApiInstanceManager(object):
-	def __init__(self):
-		self.running = {}
-		manager.onConfigChanged.append(self.reset)
+	"""
+	Keeps started provider instances for the proxy.
+	Provider of the service played on boot is started in background, sessions of recently used
+	instances are renewed in background before they get stale, and only instances whose configuration
+	changed are dropped. Providers are not thread safe, so every call to an instance is done under db.lock,
+	the manager's own per provider lock only serializes creation and renewal of the instance.
+	"""
+	WARMUP_DELAY = 30  # seconds after start, give network time to come up
+	CHECK_INTERVAL = 60  # seconds between session and configuration checks
+	SESSION_TTL = 30 * 60  # renew authorization after this time
+	IDLE_TIME = 2 * 60 * 60  # sessions of instances not used for this time are not renewed in background
+	EXPIRE_AHEAD = timedelta(minutes=10)  # renew before packet expires
 
-	def reset(self):
+	def __init__(self, pool):
+		self.pool = pool
 		self.running = {}
+		self._fingerprints = {}  # name -> configuration the instance was started with
+		self._login_time = {}  # name -> time of the last successful authorization
+		self._used_time = {}  # name -> time of the last request
+		self._renewed_expire = {}  # name -> packet expire date that was already renewed ahead
+		self._refreshing = set()
+		self._checking = False
+		self._locks = {}
+		self._lock = Lock()
+		manager.onConfigChanged.append(self.configChanged)
 
-	def getApiInstance(self, name):
+		self._timer = eTimer()
+		self._timer.callback.append(self.checkSessions)
+		self._warmup_timer = eTimer()
+		self._warmup_timer.callback.append(self.warmUp)
+		self._warmup_timer.startLongTimer(self.WARMUP_DELAY)
+
+	def providerLock(self, name):
+		with self._lock:
+			try:
+				return self._locks[name]
+			except KeyError:
+				lock = self._locks[name] = Lock()
+				return lock
+
+	@staticmethod
+	def _fingerprint(name, db):
+		"""Configuration values that require new instance when changed"""
+		cfg = manager.getConfig(name)
+		settings_file = getattr(db, '_settings_file', None)
 		try:
-			return self.running[name]
-		except KeyError:
-			return self.createApiInstance(name)
+			mtime = settings_file and os_path.getmtime(settings_file)
+		except OSError:
+			mtime = None
+		return cfg.login.value, cfg.password.value, mtime
+
+	def _isStale(self, name):
+		db = self.running[name]
+		return self._fingerprints.get(name) != self._fingerprint(name, db)
+
+	def _drop(self, name):
+		trace("server drop instance", name)
+		self.running.pop(name, None)
+		self._fingerprints.pop(name, None)
+		self._login_time.pop(name, None)
+		self._used_time.pop(name, None)
+		self._renewed_expire.pop(name, None)
+
+	def configChanged(self):
+		for name in list(self.running.keys()):
+			if self._isStale(name):
+				self._drop(name)
+
+	def getApiInstance(self, name):
+		"""
+		Thread safe, provider is started once even if requested from several threads.
+		Configuration is checked on change and periodically, not on every request.
+		"""
+		with self.providerLock(name):
+			self._used_time[name] = time()
+			try:
+				db = self.running[name]
+			except KeyError:
+				return self.createApiInstance(name)
+			if time() - self._login_time.get(name, 0) > self.SESSION_TTL:
+				# idle instance was not renewed in background
+				self._authorize(name, db)
+				if name not in self.running:
+					return self.createApiInstance(name)
+			return db
 
 	def createApiInstance(self, name):
 		apiClass = manager.getApi(name)
 		cfg = manager.getConfig(name)
 		db = apiClass(cfg.login.value, cfg.password.value)
+		fingerprint = self._fingerprint(name, db)
 		db.start()
+		try:
+			db.setChannelsList()
+		except APIException as e:
+			trace("server", name, "setChannelsList failed", e)
 		self.running[name] = db
+		self._fingerprints[name] = fingerprint
+		self._login_time[name] = time()
+		if not self._checking:
+			self._checking = True
+			reactor.callFromThread(self._timer.start, self.CHECK_INTERVAL * 1000)
 		return db
 
+	@staticmethod
+	def activeProvider():
+		"""Provider of the service that enigma2 plays on boot, if it is streamed through the proxy"""
+		try:
+			m = _proxy_ref.search(config.tv.lastservice.value)
+		except AttributeError:
+			return None
+		if m is None:
+			return None
+		name = urllib_parse.unquote(m.group(1))
+		try:
+			cfg = manager.getConfig(name)
+		except KeyError:
+			return None
+		if manager.getApi(name).AUTH_TYPE and not (cfg.login.value or cfg.password.value):
+			return None
+		return name
+
+	def warmUp(self):
+		name = self.activeProvider()
+		if name is not None and name not in self.running:
+			trace("server warm up", name)
+			self._inBackground(self.getApiInstance, name)
+
+	def _needsRenew(self, name, db, now):
+		if now - self._login_time.get(name, 0) > self.SESSION_TTL:
+			return True
+		expire = db.packet_expire
+		return expire is not None and expire - self.EXPIRE_AHEAD <= datetime.now() and \
+			self._renewed_expire.get(name) != expire
+
+	def checkSessions(self):
+		now = time()
+		for name, db in list(self.running.items()):
+			if name in self._refreshing:
+				continue
+			if self._isStale(name):
+				self._drop(name)
+			elif now - self._used_time.get(name, 0) < self.IDLE_TIME and self._needsRenew(name, db, now):
+				self._refreshing.add(name)
+				self._inBackground(self._renewSession, name, db).addBoth(lambda _, n=name: self._refreshing.discard(n))
+
+	def _renewSession(self, name, db):
+		trace("server renew session", name)
+		with self.providerLock(name):
+			if self.running.get(name) is db:
+				self._authorize(name, db)
+
+	def _authorize(self, name, db):
+		"""Call with provider lock held"""
+		expire = db.packet_expire
+		try:
+			with db.lock:
+				db.authorize()
+			self._login_time[name] = time()
+		except APIException as e:
+			trace("server renew failed", name, e)
+			self._drop(name)
+			return
+		if db.packet_expire == expire:
+			# packet was not prolonged, don't renew again until it is
+			self._renewed_expire[name] = expire
+
+	def _inBackground(self, f, *args):
+		def failed(err):
+			trace("server background task failed", err.getErrorMessage())
+		return deferToThreadPool(reactor, self.pool, f, *args).addErrback(failed)
+
 
 class RedirectToStream(resource.Resource):
+	"""
+	Resolve stream url in the thread pool and redirect client to it.
+	Concurrent requests for the same channel share single resolution,
+	and the result is reused for URL_TTL seconds, unless the provider gives out single-use urls.
+	"""
 	isLeaf = True
+	URL_TTL = 15
 
-	def __init__(self):
+	def __init__(self, pool):
 		resource.Resource.__init__(self)
-		self._request = None
-		self.apiInstanceManager = ApiInstanceManager()
+		self.pool = pool
+		self.apiInstanceManager = ApiInstanceManager(pool)
+		self._urls = {}  # (name, cid) -> (expire time, url)
+		self._pending = {}  # (name, cid) -> list of deferreds waiting for resolution
+		manager.onConfigChanged.append(self._urls.clear)
 
-	def _generateError(self, message):
+	@staticmethod
+	def _generateError(request, message):
 		trace("server", message)
-		return ErrorPage(404, "Error", message).render(self._request)
+		return ErrorPage(404, "Error", message).render(request)
 
 	def render(self, request):
 		trace("server render")
-		self._request = request
+		path = request.path
+		if not isinstance(path, str):
+			path = path.decode('utf-8')
 
-		req = request.path.split('/')
+		req = path.split('/')
+		if req[1] == 'perf':
+			return self._renderPerf(request, req[2:])
 		if len(req) != 3:
-			return self._generateError("Bad request format")
+			return self._generateError(request, "Bad request format")
 		name = req[1]
 		try:
 			cid = int(req[2])
 		except ValueError:
-			return self._generateError("Channel id must be integer")
+			return self._generateError(request, "Channel id must be integer")
+
+		closed = []
+		request.notifyFinish().addErrback(lambda err: closed.append(True))
+		if not self._sharedUrl(name):
+			d = deferToThreadPool(reactor, self.pool, self._resolve, name, cid).addBoth(self._result)
+			d.addCallback(self._respond, request, closed)
+			return NOT_DONE_YET
+
+		key = (name, cid)
+		try:
+			expire, url = self._urls[key]
+			if expire > time():
+				return util.redirectTo(b(url), request)
+			del self._urls[key]
+		except KeyError:
+			pass
+
+		d = Deferred()
+		d.addCallback(self._respond, request, closed)
+		try:
+			self._pending[key].append(d)
+		except KeyError:
+			self._pending[key] = [d]
+			deferToThreadPool(reactor, self.pool, self._resolve, name, cid).addBoth(self._resolved, key)
+		return NOT_DONE_YET
+
+	PERF_ACTIONS = {
+		'enable': lambda: perf.enable(True),
+		'disable': lambda: perf.enable(False),
+		'reset': perf.registry.reset,
+		'dump': perf.dump,
+	}
+
+	def _renderPerf(self, request, args):
+		"""/perf returns collected metrics as json, /perf/<action> changes instrumentation state"""
+		if args:
+			try:
+				self.PERF_ACTIONS[args[0]]()
+			except KeyError:
+				return self._generateError(request, "Unknown perf action")
+		request.setHeader(b'Content-Type', b'application/json')
+		data = perf.snapshot()
+		data['http_cache'] = http_cache.stats()
+		return b(json_dumps(data, sort_keys=True))
+
+	def _resolve(self, name, cid):
+		"""Runs in the thread pool. Returns tuple of url and error message"""
 		try:
 			db = self.apiInstanceManager.getApiInstance(name)
 		except KeyError:
-			return self._generateError("Provider not found")
+			return None, "Provider not found"
 		except APIException as e:
-			return self._generateError("Provider cant start (%s)" % e)
+			return None, "Provider cant start (%s)" % e
 		try:
-			url = db.getStreamUrl(cid, None)
-			return util.redirectTo(url, request)
-		except APIException as e:
-			return self._generateError("getStreamUrl failed (%s)" % e)
+			with db.lock:
+				return db.getStreamUrl(cid, None), None
+		except (APIException, KeyError) as e:
+			return None, "getStreamUrl failed (%s)" % e
+
+	@staticmethod
+	def _sharedUrl(name):
+		try:
+			return manager.getApi(name).SHARED_URL
+		except KeyError:
+			return True
+
+	@staticmethod
+	def _result(result):
+		"""Convert result of _resolve or failure to tuple of url and error message"""
+		if isinstance(result, tuple):
+			return result
+		return None, "getStreamUrl failed (%s)" % result.getErrorMessage()
+
+	def _resolved(self, result, key):
+		url, message = self._result(result)
+		if url:
+			self._urls[key] = (time() + self.URL_TTL, url)
+		for d in self._pending.pop(key, []):
+			d.callback((url, message))
+
+	def _respond(self, result, request, closed):
+		if closed:
+			trace("server client gone before url was resolved")
+			return
+		url, message = result
+		if url:
+			body = util.redirectTo(b(url), request)
+		else:
+			body = self._generateError(request, message)
+		request.write(body)
+		request.finish()
 
 
-def startApiProxy(port=9001):
+def startApiProxy(port=PROXY_PORT, threads=4):
 	trace("Start listening on port", port)
+	pool = ThreadPool(0, threads, "IPtvDreamProxy")
+	reactor.callWhenRunning(pool.start)
+	reactor.addSystemEventTrigger('during', 'shutdown', pool.stop)
 	try:
-		reactor.listenTCP(port, Site(RedirectToStream()))
+		reactor.listenTCP(port, Site(RedirectToStream(pool)))
 	except Exception as e:
 		trace("listenTCP error:", e)
@@ -12,12 +12,12 @@
 from __future__ import print_function
 
 try:
-	from typing import List
+	from typing import List, Dict, Optional, Tuple  # pylint: disable=unused-import
 except ImportError:
 	pass
 
 from sys import version_info
-from functools import wraps
+from hashlib import md5
 from datetime import datetime, timedelta
 import time
 
@@ -58,15 +58,14 @@ else:
 		return s.decode('utf-8')
 
 
-def timeit(f):
-	@wraps(f)
-	def wrapper(*args, **kwargs):
-		t = time.time()
-		result = f(*args, **kwargs)
-		d = time.time() - t
-		trace("timeit %s %.6f" % (f, d))
-		return result
-	return wrapper
+def stableHash(text):
+	"""
+	Return non-negative 63-bit hash of text, that is the same across runs and python versions.
+	Use it for ids that are saved, hash() is randomized in python 3.
+	"""
+	if not isinstance(text, bytes):
+		text = text.encode('utf-8')
+	return int(md5(text).hexdigest()[:16], 16) >> 1
 
 
 def getHwAddr(ifname):
@@ -134,6 +133,27 @@ def toDate(t):
 	return t.year, t.month, t.day
 
 
+def archiveJump(shift, seconds):
+	"""
+	Archive shift after jump by seconds, negative jumps back.
+	Shift never gets into the future, 0 means live.
+	"""
+	return min(shift + seconds, 0)
+
+
+def seekDistance(position, length, seconds):
+	"""
+	Relative seek in pts for jump by seconds inside the running service.
+	:param position: play position in pts
+	:param length: downloaded length in pts
+	:return: None if the target is outside of the downloaded part
+	"""
+	pts = seconds * 90000
+	if 0 <= position + pts < length:
+		return pts
+	return None
+
+
 class EPG(object):
 	__slots__ = ('begin', 'end', 'begin_timestamp', 'end_timestamp', 'name', 'description')
 
@@ -360,9 +380,12 @@ class ConfBool(ConfEntry):
 
 
 class EPGDB(object):
+	# Storage is attached on first added program, most channels never get EPG loaded
+	__slots__ = ('l', 'days_start', 'last')
+
 	def __init__(self):
-		self.l = []
-		self.days_start = {}
+		self.l = ()  # type: List[Tuple[int, EPG]]
+		self.days_start = None  # type: Optional[Dict[datetime, datetime]]
 		self.last = 0
 
 	# bisect copies from python library
@@ -446,6 +469,8 @@ class EPGDB(object):
 
 	def epgDay(self, date):
 		# for apis that can't get correct range in getDayEpg
+		if not self.days_start:
+			return []
 		try:
 			t1 = self.days_start[toDate(date)]
 		except KeyError:
@@ -456,6 +481,8 @@ class EPGDB(object):
 		return [x[1] for x in self.l[i1:i2]]  # FIXME: extra copy
 
 	def addEpg(self, epg, hint=-1):
+		if not self.l:
+			self.l = []
 		t = toTimestamp(epg.begin)
 		if self.checkHint(hint, t):
 			i = hint
@@ -463,6 +490,8 @@ class EPGDB(object):
 			i = self.bisect(t)
 		if i > 0:
 			prev = self.l[i-1][1]
+			if prev is epg:
+				return i
 			if prev.begin == epg.begin or prev.end > epg.begin:
 				trace("EPG conflict!")
 				self.l[i-1] = (t, epg)
@@ -478,9 +507,20 @@ class EPGDB(object):
 			hint = self.addEpg(e, hint)
 
 	def addEpgDay(self, date, epglist):
+		if self.days_start is None:
+			self.days_start = {}
 		self.days_start[toDate(date)] = date
 		self.addEpgSorted(epglist)
 
+	def replaceEpgDay(self, date, epglist):
+		"""Same as addEpgDay, but programs of the day that were added before are dropped"""
+		if self.l:
+			i1 = self.bisect_left(toTimestamp(date))
+			i2 = self.bisect_left(toTimestamp(date + timedelta(1)), lo=i1)
+			del self.l[i1:i2]
+			self.last = 0
+		self.addEpgDay(date, epglist)
+
 
 class Group(object):
 	__slots__ = ('gid', 'title', 'channels')
@@ -510,6 +550,8 @@ class Group(object):
 
 
 class Channel(EPGDB):
+	__slots__ = ('cid', 'name', 'number', 'has_archive', 'is_protected', 'lastUpdateFailed', 'alt_number')
+
 	def __init__(self, cid, name, number, has_archive=False, is_protected=False):
 		# type: (int, str, int, bool, bool) -> None
 		"""
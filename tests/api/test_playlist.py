@@ -10,6 +10,7 @@
 
 from __future__ import print_function
 
+from twisted.trial.unittest import SkipTest
 from . import ott_provider
 from src.api.playlist import getOTTProviders
 
@@ -37,6 +38,30 @@ class Test(ott_provider.TestOTTProvider):
 		mse = sqrt(sum((t1 - ta)**2 for t1 in t) / K)
 		print("TIME %f ± %f per loop" % (max(t) / N, mse / N))
 
+	def bench_m3u_memory(self):
+		try:
+			import tracemalloc
+		except ImportError:
+			raise SkipTest("tracemalloc is not available in python 2")
+		prov = OTTProvider("", "")
+		N = 20000
+		lines = [b'#EXTM3U']
+		for i in range(N):
+			lines.append(
+				b'#EXTINF:-1 tvg-id="%d" tvg-logo="http://picons.example.com/logo/%d.png" group-title="Group %d",'
+				b'Channel %d' % (i, i, i % 50, i))
+			lines.append(b'http://stream.example.com/iptv/00000000000000/%d/index.m3u8' % i)
+
+		import gc
+		gc.collect()
+		tracemalloc.start()
+		prov._parsePlaylist(lines)
+		gc.collect()
+		size, peak = tracemalloc.get_traced_memory()
+		tracemalloc.stop()
+		self.assertEqual(len(prov.channels), N)
+		print("MEMORY %d bytes per channel (peak %d)" % (size / N, peak / N))
+
 
 if __name__ == "__main__":
 	from unittest import main
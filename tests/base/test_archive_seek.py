@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+#  enigma2 iptv player
+#
+#  Copyright (c) 2018 Alex Maystrenko <alexeytech@gmail.com>
+#
+# This is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation; either version 2, or (at your option) any later
+# version.
+
+from __future__ import print_function
+
+from twisted.trial import unittest
+
+from src.utils import archiveJump, seekDistance
+
+MINUTE = 60 * 90000  # pts
+
+
+class TestArchiveJump(unittest.TestCase):
+	def test_repeated_jumps(self):
+		# key presses before the stream is restarted add up to one shift
+		shift = -3600
+		for seconds in [-300, -300, 60]:
+			shift = archiveJump(shift, seconds)
+		self.assertEqual(shift, -4140)
+
+	def test_live(self):
+		self.assertEqual(archiveJump(-60, 300), 0)
+		self.assertEqual(archiveJump(-60, 60), 0)
+		self.assertEqual(archiveJump(0, 15), 0)
+
+
+class TestSeekDistance(unittest.TestCase):
+	def test_inside(self):
+		self.assertEqual(seekDistance(5 * MINUTE, 10 * MINUTE, 60), MINUTE)
+		self.assertEqual(seekDistance(5 * MINUTE, 10 * MINUTE, -300), -5 * MINUTE)
+
+	def test_outside(self):
+		# target is not downloaded yet or was before the start of the stream
+		self.assertIsNone(seekDistance(5 * MINUTE, 10 * MINUTE, 300))
+		self.assertIsNone(seekDistance(5 * MINUTE, 10 * MINUTE, -301))
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+#  enigma2 iptv player
+#
+#  Copyright (c) 2018 Alex Maystrenko <alexeytech@gmail.com>
+#
+# This is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation; either version 2, or (at your option) any later
+# version.
+
+from __future__ import print_function
+
+from datetime import datetime
+from twisted.trial import unittest
+
+from src.api import catchup
+from src.utils import toTimestamp
+
+
+class TestCatchup(unittest.TestCase):
+	def setUp(self):
+		self.time = datetime(2020, 5, 1, 12, 30)
+		self.utc = toTimestamp(self.time)
+
+	def test_provider_schemes(self):
+		url = "http://host/channel/video.m3u8"
+		self.assertEqual(
+			catchup.FLUSSONIC_HLS.fill(url, self.time), "http://host/channel/video-timeshift_abs-%d.m3u8" % self.utc)
+		self.assertEqual(catchup.UTC.fill(url, self.time), url + "?utc=%d" % self.utc)
+		self.assertEqual(
+			catchup.FLUSSONIC_TS.fill("http://host/1/mpegts?token=x", self.time),
+			"http://host/1/timeshift_abs-%d.ts?token=x" % self.utc)
+		self.assertTrue(catchup.OFFSET.fill(url + "?version=2", self.time).startswith(url + "?version=2&offset=-"))
+
+	def test_playlist_attributes(self):
+		url = "http://host/live/user/pass/15.ts"
+		t = catchup.fromPlaylist("append", "?utc={utc}&end=${end}&id={catchup-id}", url)
+		self.assertIs(t, catchup.fromPlaylist("append", "?utc={utc}&end=${end}&id={catchup-id}", "http://other"))
+		self.assertEqual(t.fill(url, self.time, 60), url + "?utc=%d&end=%d&id=" % (self.utc, self.utc + 60))
+		t = catchup.CatchupTemplate("{url}?id={catchup-id}&token={token}", fields=('catchup-id', 'token'))
+		self.assertEqual(t.fill(url, self.time, **{'catchup-id': 7, 'token': "x"}), url + "?id=7&token=x")
+		self.assertEqual(
+			catchup.fromPlaylist("xc", "", url).fill(url, self.time, 3600),
+			"http://host/timeshift/user/pass/60/2020-05-01:12-30/15.ts")
+		self.assertEqual(
+			catchup.fromPlaylist("default", "http://archive/{Y}{m}{d}/{H}{M}.ts", url).fill(url, self.time),
+			"http://archive/20200501/1230.ts")
+		self.assertIsNone(catchup.fromPlaylist("", "", url))
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+#  enigma2 iptv player
+#
+#  Copyright (c) 2018 Alex Maystrenko <alexeytech@gmail.com>
+#
+# This is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation; either version 2, or (at your option) any later
+# version.
+
+from __future__ import print_function
+
+from twisted.trial import unittest
+
+from src.utils import stableHash
+from src.api.m3u import M3UProvider, urlCid
+
+RAW_URL = "http://localhost/tv/00000000000000/first.m3u8"
+
+
+class Provider(M3UProvider):
+	NAME = "TestIds"
+	XMLTV = False
+
+	def __init__(self, favourites_file):
+		super(Provider, self).__init__("", "")
+		self._favorites_file = favourites_file
+		self._domain = "example.com"
+		self._key = "secret"
+
+
+class TestChannelIds(unittest.TestCase):
+	def test_stable_hash(self):
+		# ids are saved in favourites, value must not depend on python version
+		self.assertEqual(stableHash("http://host/a"), 1325894094367154833)
+		self.assertEqual(stableHash(u"канал"), 3636169002978068381)
+		self.assertEqual(stableHash(u"канал".encode('utf-8')), 3636169002978068381)
+
+	def test_url_cid(self):
+		self.assertEqual(urlCid("http://host/ch/1.m3u8?token=abc&q=1"), urlCid("http://host/ch/1.m3u8?q=1&token=xyz"))
+		self.assertEqual(urlCid("http://host/ch/1.m3u8?token=abc"), urlCid("http://host/ch/1.m3u8"))
+		self.assertNotEqual(urlCid("http://host/ch/1.m3u8"), urlCid("http://host/ch/2.m3u8"))
+		self.assertNotEqual(urlCid("http://host/ch/1.m3u8?q=1"), urlCid("http://host/ch/1.m3u8?q=2"))
+
+	def test_migrate_favourites(self):
+		path = self.mktemp()
+		with open(path, 'w') as f:
+			f.write("%d,%d" % (hash(RAW_URL), 42))
+		db = Provider(path)
+		db._parsePlaylist([
+			b'#EXTM3U',
+			b'#EXTINF:-1,First',
+			RAW_URL.encode('ascii'),
+			b'#EXTINF:-1,Second',
+			b'http://localhost/tv/00000000000000/second.m3u8',
+		])
+		cid = urlCid(RAW_URL)
+		self.assertEqual(db.channels_data[cid]['url'], "http://example.com/tv/secret/first.m3u8")
+		self.assertEqual(db._legacy_ids, {hash(RAW_URL): cid})
+		self.assertEqual(db.getFavourites(), [cid, 42])
+		with open(path) as f:
+			self.assertEqual(f.read(), "%d,42" % cid)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+#  enigma2 iptv player
+#
+#  Copyright (c) 2018 Alex Maystrenko <alexeytech@gmail.com>
+#
+# This is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation; either version 2, or (at your option) any later
+# version.
+
+from __future__ import print_function
+
+from datetime import datetime, timedelta
+from time import time
+from twisted.trial import unittest
+
+from src.api import abstract_api, antifriz, cbilling
+from src.utils import stableHash
+
+
+def providerClass(base):
+	class Provider(base):
+		def __init__(self):
+			super(Provider, self).__init__("user", "")
+			self.requests = 0
+
+		def _getJson(self, url, params):
+			self.requests += 1
+			t = int(time())
+			return [{
+				'alias': alias,
+				'epg': [{'time': t - 600, 'time_to': t + 600 * (i + 1), 'name': alias, 'descr': ""}],
+			} for i, alias in enumerate(["first", "second", "third"])]
+
+	return Provider
+
+
+class LaterDatetime(datetime):
+	@classmethod
+	def now(cls, tz=None):
+		return datetime.now(tz) + timedelta(minutes=15)
+
+
+class TestAntifrizCurrentEpg(unittest.TestCase):
+	base = antifriz.OTTProvider
+
+	def setUp(self):
+		self.db = providerClass(self.base)()
+		self.cids = [stableHash(alias) for alias in ["first", "second", "third"]]
+
+	def test_requested_only(self):
+		epg = dict(self.db.getChannelsEpg([self.cids[1], 12345]))
+		self.assertEqual(list(epg.keys()), [self.cids[1]])
+		self.assertEqual(epg[self.cids[1]][0].name, "second")
+
+	def test_reuse(self):
+		list(self.db.getChannelsEpg(self.cids[:1]))
+		epg = dict(self.db.getChannelsEpg(self.cids[1:]))
+		self.assertEqual(sorted(epg.keys()), sorted(self.cids[1:]))
+		self.assertEqual(self.db.requests, 1)
+
+	def test_expire(self):
+		list(self.db.getChannelsEpg(self.cids))
+		# program of the first channel ended, response is downloaded again
+		self.patch(abstract_api, 'datetime', LaterDatetime)
+		list(self.db.getChannelsEpg(self.cids))
+		self.assertEqual(self.db.requests, 2)
+
+
+class TestCbillingCurrentEpg(TestAntifrizCurrentEpg):
+	base = cbilling.OTTProvider
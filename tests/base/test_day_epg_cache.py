@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+#  enigma2 iptv player
+#
+#  Copyright (c) 2018 Alex Maystrenko <alexeytech@gmail.com>
+#
+# This is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation; either version 2, or (at your option) any later
+# version.
+
+from __future__ import print_function
+
+from datetime import datetime
+from threading import RLock
+from twisted.trial import unittest
+
+from src import cache
+from src.cache import DayEpgCache
+from src.utils import Channel, EPG, toTimestamp
+
+DAY = datetime(2020, 5, 1)
+EMPTY_DAY = datetime(2020, 5, 2)
+
+
+class DayEpgProvider(object):
+	def __init__(self):
+		self.lock = RLock()
+		self.channels = {1: Channel(1, "First", 1)}
+		self.requests = []
+
+	def getDayEpg(self, cid, date):
+		self.assertLocked()
+		self.requests.append((cid, date))
+		if date.day != DAY.day:
+			return []
+		t = toTimestamp(DAY)
+		return [EPG(t + i * 3600, t + (i + 1) * 3600, "Program %d" % i) for i in range(24)]
+
+	def assertLocked(self):
+		# prefetch thread and the main thread must not use provider at the same time
+		assert self.lock._is_owned(), "db is used without lock"
+
+
+class TestDayEpgCache(unittest.TestCase):
+	def setUp(self):
+		self.db = DayEpgProvider()
+		self.cache = DayEpgCache(self.db)
+
+	def test_load(self):
+		self.assertIsNone(self.cache.get(1, DAY))
+		programs = self.cache.load(1, DAY.replace(hour=15))
+		self.assertEqual(len(programs), 24)
+		self.assertIs(self.cache.load(1, DAY), programs)
+		self.assertEqual(len(self.db.requests), 1)
+		self.assertEqual(self.db.channels[1].epgDay(DAY)[0].name, "Program 0")
+
+	def test_lru(self):
+		self.patch(DayEpgCache, 'SIZE', 2)
+		self.cache.load(1, DAY)
+		self.cache.load(2, DAY)
+		self.cache.get(1, DAY)
+		self.cache.load(3, DAY)
+		self.assertIsNotNone(self.cache.get(1, DAY))
+		self.assertIsNone(self.cache.get(2, DAY))
+
+	def test_empty_day(self):
+		now = [1000.0]
+		self.patch(cache, 'time', lambda: now[0])
+		self.assertEqual(self.cache.load(1, EMPTY_DAY), [])
+		self.assertEqual(self.cache.load(1, EMPTY_DAY), [])
+		self.assertEqual(len(self.db.requests), 1)
+		now[0] += DayEpgCache.EMPTY_TTL + 1
+		self.assertIsNone(self.cache.get(1, EMPTY_DAY))
+		self.cache.load(1, EMPTY_DAY)
+		self.assertEqual(len(self.db.requests), 2)
+
+	def test_prefetch(self):
+		self.cache.prefetch(1, DAY)
+		d = self.cache.loading(1, DAY)
+		self.assertIsNotNone(d)
+		self.cache.prefetch(1, DAY)
+
+		def check(programs):
+			self.assertEqual(len(programs), 24)
+			self.assertIs(self.cache.get(1, DAY), programs)
+			self.assertIsNone(self.cache.loading(1, DAY))
+			self.assertEqual(len(self.db.requests), 1)
+		return d.addCallback(check)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+#  enigma2 iptv player
+#
+#  Copyright (c) 2018 Alex Maystrenko <alexeytech@gmail.com>
+#
+# This is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation; either version 2, or (at your option) any later
+# version.
+
+from __future__ import print_function
+
+import os
+from twisted.trial import unittest
+
+from src.history import History, HistoryEntry
+
+
+def entry(cid):
+	return HistoryEntry(1, None if cid % 2 else 5, 0, cid, cid * 10)
+
+
+class TestHistory(unittest.TestCase):
+	def setUp(self):
+		self.path = self.mktemp()
+		self.history = History(3, self.path)
+		for cid in [1, 2, 3, 2, 4]:
+			self.history.append(entry(cid))
+
+	def test_order(self):
+		self.assertEqual(self.history.cids(), [4, 2, 3])
+		self.assertEqual(self.history.now().cid, 4)
+		self.assertEqual(self.history.historyPrev().cid, 2)
+		self.assertEqual(self.history.historyPrev().cid, 3)
+		self.assertIsNone(self.history.historyPrev())
+		self.assertEqual(self.history.historyNext().cid, 2)
+		# position stays on the same entry
+		self.history.replace(3)
+		self.assertEqual(self.history.cids(), [3, 4, 2])
+		self.assertEqual(self.history.now().cid, 2)
+		self.history.replace(2)
+		self.assertEqual(self.history.cids(), [2, 3, 4])
+		self.assertEqual(self.history.now().cid, 2)
+		self.assertEqual(self.history.historyPrev().cid, 3)
+
+	def test_save_load(self):
+		self.history.historyPrev()
+		self.history.save()
+		self.assertFalse(os.path.exists(self.path + '.tmp'))
+		loaded = History(3, self.path)
+		self.assertEqual(loaded.cids(), [4, 2, 3])
+		self.assertEqual(loaded.now().makeTuple(), entry(2).makeTuple())
+		self.assertIsNone(loaded.historyPrev().gid)
+
+	def test_save_on_zaps(self):
+		# five zaps in setUp
+		self.assertEqual(History(3, self.path).cids(), [4, 2, 3])
+		self.history.append(entry(5))
+		self.assertEqual(History(3, self.path).cids(), [4, 2, 3])
+
+	def test_del_current(self):
+		self.history.historyPrev()
+		self.assertTrue(self.history.delCurrent(4))
+		self.assertEqual(self.history.now().cid, 2)
+		self.assertTrue(self.history.delCurrent(3))
+		self.assertEqual(self.history.now().cid, 2)
+		self.assertFalse(self.history.delCurrent(2))
+
+	def test_del_position(self):
+		# position moves to the older entry, or to the newer when it was the oldest one
+		self.history.historyPrev()
+		self.assertTrue(self.history.delCurrent(2))
+		self.assertEqual(self.history.now().cid, 3)
+		self.assertTrue(self.history.delCurrent(3))
+		self.assertEqual(self.history.now().cid, 4)
+		self.assertIsNone(self.history.historyPrev())
+
+	def test_set_size(self):
+		self.history.historyPrev()
+		self.history.setSize(2)
+		self.assertEqual(self.history.cids(), [4, 2])
+		self.assertEqual(self.history.now().cid, 2)
+		self.history.setSize(1)
+		self.assertEqual(self.history.now().cid, 4)
+
+	def test_clear(self):
+		self.history.historyPrev()
+		self.assertTrue(self.history.clear())
+		self.assertEqual(self.history.cids(), [4])
+		self.assertEqual(self.history.now().cid, 4)
+		self.assertFalse(self.history.clear())
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+#  enigma2 iptv player
+#
+#  Copyright (c) 2018 Alex Maystrenko <alexeytech@gmail.com>
+#
+# This is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation; either version 2, or (at your option) any later
+# version.
+
+from __future__ import print_function
+
+import json
+import os
+import sys
+from io import BytesIO
+from twisted.trial import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'tools'))
+import hlsgw  # noqa: E402 pylint: disable=wrong-import-position
+
+MASTER = """#EXTM3U
+#EXT-X-VERSION:3
+#EXT-X-STREAM-INF:BANDWIDTH=1280000,RESOLUTION=640x360,CODECS="avc1.4d401e,mp4a.40.2"
+low/index.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=2560000,AVERAGE-BANDWIDTH=2000000,RESOLUTION=1280x720
+http://cdn.example.com/high/index.m3u8
+"""
+
+MEDIA = """#EXTM3U
+#EXT-X-TARGETDURATION:6
+#EXT-X-MEDIA-SEQUENCE:100
+#EXT-X-KEY:METHOD=AES-128,URI="key.bin",IV=0x01
+#EXTINF:6.0,first
+seg100.ts
+#EXT-X-DISCONTINUITY
+#EXT-X-BYTERANGE:1000@0
+#EXTINF:5.5,
+seg.ts
+#EXT-X-BYTERANGE:500
+#EXT-X-KEY:METHOD=NONE
+#EXTINF:6,
+seg.ts
+#EXTINF:6,
+seg103.ts
+"""
+
+RENDITIONS = """#EXTM3U
+#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aac",NAME="en",URI="en/audio.m3u8"
+#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aac",NAME="ru",DEFAULT=YES,URI="ru/audio.m3u8"
+"""
+
+URL = "http://example.com/live/playlist.m3u8"
+
+
+def parse(text):
+	return hlsgw.parsePlaylist(text.splitlines(), URL)
+
+
+class TestPlaylistParser(unittest.TestCase):
+	def test_master(self):
+		master = parse(MASTER)
+		self.assertIsInstance(master, hlsgw.MasterPlaylist)
+		self.assertEqual(master.version, 3)
+		low, high = master.variants
+		self.assertEqual(low.uri, "http://example.com/live/low/index.m3u8")
+		self.assertEqual(low.codecs, "avc1.4d401e,mp4a.40.2")
+		self.assertEqual((high.bandwidth, high.average_bandwidth, high.resolution), (2560000, 2000000, "1280x720"))
+		self.assertIs(master.bestVariant(), low)
+		self.assertIs(master.bestVariant(3000000), high)
+
+	def test_media(self):
+		media = parse(MEDIA)
+		self.assertIsInstance(media, hlsgw.MediaPlaylist)
+		self.assertEqual((media.target_duration, media.firstSeq(), media.lastSeq()), (6, 100, 103))
+		self.assertTrue(media.isLive())
+		first, second, third, fourth = media.segments
+		self.assertEqual((first.title, first.duration, first.key.uri), ("first", 6.0, "http://example.com/live/key.bin"))
+		self.assertTrue(second.discontinuity)
+		self.assertEqual(second.byterange, (1000, 0))
+		self.assertEqual(third.byterange, (500, 1000))
+		self.assertIsNone(third.key)
+		self.assertEqual(fourth.uri, "http://example.com/live/seg103.ts")
+
+	def test_new_segments(self):
+		media = parse(MEDIA)
+		self.assertEqual([s.seq for s in media.newSegments(None)], [101, 102, 103])
+		self.assertEqual([s.seq for s in media.newSegments(102)], [103])
+		self.assertEqual(media.newSegments(103), [])
+		self.assertEqual([s.seq for s in media.newSegments(5)], [100, 101, 102, 103])
+
+	def test_vod(self):
+		media = parse(MEDIA + "#EXT-X-ENDLIST\n")
+		self.assertFalse(media.isLive())
+		self.assertEqual(media.liveStart(), 100)
+
+	def test_renditions_only(self):
+		master = parse(RENDITIONS)
+		self.assertIsInstance(master, hlsgw.MasterPlaylist)
+		self.assertEqual(master.variants, [])
+		self.assertEqual(master.renditionUri(), "http://example.com/live/ru/audio.m3u8")
+		self.assertIsNone(parse("#EXTM3U\n#EXT-X-MEDIA:TYPE=CLOSED-CAPTIONS,GROUP-ID=\"cc\"\n").renditionUri())
+
+
+class TestStreamSession(unittest.TestCase):
+	def setUp(self):
+		self.patch(hlsgw, 'CLIENT_QUEUE_SIZE', 2)
+		self.patch(hlsgw, 'CLIENT_STALL_TIMEOUT', 0.2)
+		self.session = hlsgw.StreamSession("http://example.com/live.m3u8", hlsgw.SessionManager())
+
+	def test_no_blocking(self):
+		"""A paused client doesn't hold up data for others"""
+		paused = self.session.subscribe()
+		q = self.session.subscribe()
+		for i in range(10):
+			self.session.broadcast(b"%d" % i)
+			self.assertEqual(q.get_nowait(), b"%d" % i)
+		self.assertEqual(self.session.statsJson()["clients"], 2)
+		self.assertEqual(self.session.stats.bytes_out, 12)
+		self.assertEqual([paused.get_nowait(), paused.get_nowait()], [b"0", b"1"])
+
+	def test_stalled_client(self):
+		now = [1000.0]
+		self.patch(hlsgw, 'time', lambda: now[0])
+		stalled = self.session.subscribe()
+		q = self.session.subscribe()
+		for i in range(3):
+			self.session.broadcast(b"x")
+			q.get_nowait()
+		self.assertEqual(self.session.statsJson()["clients"], 2)
+		now[0] += 1
+		self.session.broadcast(b"x")
+		self.assertEqual(self.session.statsJson()["clients"], 1)
+		self.assertIsNone(stalled.get_nowait())
+
+
+class StatsHandler(hlsgw.HlsHandler):
+	# pylint: disable=super-init-not-called
+	def __init__(self):
+		self.wfile = BytesIO()
+		self.headers_sent = []
+
+	def send_response(self, code, message=None):
+		self.code = code
+
+	def send_header(self, keyword, value):
+		self.headers_sent.append((keyword, value))
+
+	def end_headers(self):
+		pass
+
+
+class TestSessionStats(unittest.TestCase):
+	def setUp(self):
+		self.stats = hlsgw.SessionStats("http://example.com/live.m3u8")
+
+	def test_counters(self):
+		for seconds in [0.05, 0.1, 0.3, 1.5, 20]:
+			self.stats.segmentFetched(seconds, 1000)
+		self.stats.playlistLoaded(0.5)
+		self.stats.playlistLoaded(0.2)
+		self.assertEqual(self.stats.segments, 5)
+		self.assertEqual(self.stats.bytes_in, 5000)
+		self.assertEqual(self.stats.latency, [2, 0, 1, 0, 1, 0, 0, 1])
+		self.assertEqual((self.stats.reloads, self.stats.reload_lag, self.stats.reload_lag_max), (2, 0.2, 0.5))
+
+	def test_json(self):
+		self.stats.segmentFetched(0.3, 100)
+		self.stats.segmentFetched(12, 100)
+		q = hlsgw.queue.Queue(4)
+		q.put_nowait(b"x")
+		data = self.stats.toJson([q])
+		self.assertEqual(data["segment_latency"], {
+			"0.1": 0, "0.25": 0, "0.5": 1, "1": 0, "2": 0, "5": 0, "10": 0, "inf": 1})
+		self.assertEqual(data["segment_latency_avg"], 6.15)
+		self.assertEqual((data["clients"], data["buffer_fill"]), (1, [1]))
+		self.assertIsNone(hlsgw.SessionStats("").toJson([])["segment_latency_avg"])
+
+	def test_stats_page(self):
+		manager = hlsgw.SessionManager()
+		self.patch(hlsgw, 'sessions', manager)
+		# session is not started, so nothing is read from upstream
+		session = manager._sessions[self.stats.url] = hlsgw.StreamSession(self.stats.url, manager)
+		session.subscribe()
+		session.broadcast(b"data")
+		handler = StatsHandler()
+		handler.sendStats()
+		self.assertEqual(handler.code, 200)
+		self.assertIn(('Content-type', "application/json"), handler.headers_sent)
+		data = json.loads(handler.wfile.getvalue().decode('utf-8'))
+		self.assertEqual(len(data["sessions"]), 1)
+		stats = data["sessions"][0]
+		self.assertEqual((stats["url"], stats["clients"], stats["bytes_out"]), (self.stats.url, 1, 4))
+		self.assertEqual(stats["buffer_fill"], [1])
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+#  enigma2 iptv player
+#
+#  Copyright (c) 2018 Alex Maystrenko <alexeytech@gmail.com>
+#
+# This is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation; either version 2, or (at your option) any later
+# version.
+
+from __future__ import print_function
+
+from io import BytesIO
+from twisted.trial import unittest
+
+from src.api import abstract_api
+from src.api.abstract_api import AbstractAPI, HttpCache, responseTtl
+
+
+class Response(BytesIO):
+	def __init__(self, data, headers):
+		BytesIO.__init__(self, data)
+		self.headers = headers
+
+
+class Opener(object):
+	def __init__(self, headers=None):
+		self.headers = headers or {}
+		self.urls = []
+
+	def open(self, url):
+		self.urls.append(url)
+		return Response(b"reply of " + url.encode('ascii'), self.headers)
+
+
+class CachedAPI(AbstractAPI):
+	NAME = "CachedAPI"
+	HTTP_CACHE_TTL = {'/channels': 60}
+
+
+class TestHttpCache(unittest.TestCase):
+	def setUp(self):
+		self.now = [1000.0]
+		self.patch(abstract_api, 'time', lambda: self.now[0])
+
+	def test_lru_bytes(self):
+		cache = HttpCache(10)
+		cache.put('a', b"1234", 60)
+		cache.put('b', b"5678", 60)
+		cache.get('a')
+		cache.put('c', b"90ab", 60)
+		self.assertEqual(cache.size, 8)
+		self.assertEqual(cache.get('a'), b"1234")
+		self.assertIsNone(cache.get('b'))
+		cache.put('big', b"x" * 11, 60)
+		self.assertIsNone(cache.get('big'))
+
+	def test_expire(self):
+		cache = HttpCache(100)
+		cache.put('a', b"reply", 60)
+		cache.put('never', b"reply", 0)
+		self.assertEqual(cache.get('a'), b"reply")
+		self.now[0] += 61
+		self.assertIsNone(cache.get('a'))
+		self.assertIsNone(cache.get('never'))
+		self.assertEqual(cache.size, 0)
+		stats = cache.stats()
+		self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']), (1, 2, 1 / 3.))
+
+	def test_response_ttl(self):
+		self.assertEqual(responseTtl({'Cache-Control': 'public, max-age=300'}), 300)
+		self.assertEqual(responseTtl({'Cache-Control': 'no-cache, max-age=300'}), 0)
+		self.assertEqual(responseTtl({}), 0)
+
+	def test_read_http(self):
+		cache = HttpCache(1024)
+		self.patch(abstract_api, 'http_cache', cache)
+		db = CachedAPI("user", "")
+		db.urlopener = Opener()
+		for _ in range(2):
+			self.assertEqual(db.readHttp("http://host/channels"), b"reply of http://host/channels")
+			db.readHttp("http://host/stream")
+		self.assertEqual(db.urlopener.urls, ["http://host/channels", "http://host/stream", "http://host/stream"])
+		# urls that can't be cached are not counted
+		self.assertEqual((cache.hits, cache.misses), (1, 1))
+		db.dropHttpCache('/channels')
+		db.readHttp("http://host/channels")
+		self.assertEqual(len(db.urlopener.urls), 4)
+
+	def test_headers(self):
+		cache = HttpCache(1024)
+		self.patch(abstract_api, 'http_cache', cache)
+		self.patch(CachedAPI, 'HTTP_CACHE', True)
+		db = CachedAPI("user", "")
+		db.urlopener = Opener({'Cache-Control': 'max-age=10'})
+		db.readHttp("http://host/list")
+		db.readHttp("http://host/list")
+		self.now[0] += 11
+		db.readHttp("http://host/list")
+		self.assertEqual(len(db.urlopener.urls), 2)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+#  enigma2 iptv player
+#
+#  Copyright (c) 2018 Alex Maystrenko <alexeytech@gmail.com>
+#
+# This is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation; either version 2, or (at your option) any later
+# version.
+
+from __future__ import print_function
+
+from datetime import datetime, timedelta
+from twisted.trial import unittest
+
+from src.api import ktv
+from src.api.ktv import KtvStream
+from src.utils import toTimestamp
+
+DAY = datetime(2020, 5, 1)
+EMPTY_DAY = datetime(2020, 5, 10)
+
+
+class Provider(KtvStream):
+	NAME = "TestKtv"
+
+	def __init__(self):
+		super(Provider, self).__init__("user", "")
+		self.requests = []
+
+	def _getDayEpg(self, cid, date):
+		self.requests.append(date)
+		if date >= EMPTY_DAY:
+			return []
+		t = toTimestamp(date)
+		return [(t + h * 3600, "Program %d" % h, "") for h in range(0, 24, 6)]
+
+
+class TestKtvDayEpg(unittest.TestCase):
+	def setUp(self):
+		self.db = Provider()
+
+	def test_every_day_once(self):
+		for i in list(range(7)) + list(reversed(range(7))):
+			day = DAY + timedelta(i)
+			programs = list(self.db.getDayEpg(1, day))
+			self.assertEqual(len(programs), 4)
+			self.assertEqual(programs[-1].end, day + timedelta(1))
+		self.assertEqual(sorted(self.db.requests), [DAY + timedelta(i) for i in range(8)])
+
+	def test_empty_day(self):
+		now = [1000.0]
+		self.patch(ktv, 'time', lambda: now[0])
+		self.assertEqual(list(self.db.getDayEpg(1, EMPTY_DAY)), [])
+		self.assertEqual(list(self.db.getDayEpg(1, EMPTY_DAY)), [])
+		self.assertEqual(len(self.db.requests), 1)
+		now[0] += KtvStream.EMPTY_DAY_TTL + 1
+		list(self.db.getDayEpg(1, EMPTY_DAY))
+		self.assertEqual(len(self.db.requests), 2)
+
+	def test_last_day(self):
+		# end of the last program is unknown when the next day is empty
+		programs = list(self.db.getDayEpg(1, EMPTY_DAY - timedelta(1)))
+		self.assertEqual(len(programs), 3)
+		list(self.db.getDayEpg(1, EMPTY_DAY - timedelta(1)))
+		self.assertEqual(len(self.db.requests), 2)
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+#  enigma2 iptv player
+#
+#  Copyright (c) 2018 Alex Maystrenko <alexeytech@gmail.com>
+#
+# This is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation; either version 2, or (at your option) any later
+# version.
+
+from __future__ import print_function
+
+from datetime import timedelta
+from io import BytesIO
+from time import gmtime, strftime
+from twisted.trial import unittest
+
+from src.api.m3u import M3UProvider
+from src.utils import syncTime, toTimestamp
+
+PLAYLIST = [
+	b'#EXTM3U url-tvg="http://example.com/guide.xml"',
+	b'#EXTINF:-1 tvg-id="1",First',
+	b'http://host/first.m3u8',
+	b'#EXTINF:-1 tvg-id="2",Second',
+	b'http://host/second.m3u8',
+	b'#EXTINF:-1,Third',
+	b'http://host/third.m3u8',
+	b'#EXTINF:-1,Third',
+	b'http://host/third-hd.m3u8',
+]
+
+
+def xmltvTime(t):
+	return strftime("%Y%m%d%H%M%S +0000", gmtime(t))
+
+
+class Opener(object):
+	def __init__(self, today):
+		self.start = toTimestamp(today - timedelta(1))
+		self.shift = 0
+
+	def open(self, url):
+		# hourly programs of the first channel from yesterday till the end of tomorrow
+		# channel without id in playlist is found by name
+		guide = [
+			b'<?xml version="1.0" encoding="utf-8"?>\n<tv>',
+			b'<channel id="3"><display-name>Third</display-name></channel>',
+		]
+		for h in range(3 * 24):
+			t = self.start + h * 3600 + self.shift
+			for channel in ["1", "3"]:
+				guide.append(('<programme start="%s" stop="%s" channel="%s"><title>Program %d</title></programme>' % (
+					xmltvTime(t), xmltvTime(t + 3600), channel, h)).encode('utf-8'))
+		guide.append(b'</tv>')
+		return BytesIO(b'\n'.join(guide))
+
+
+class Provider(M3UProvider):
+	NAME = "TestXmltv"
+
+	def __init__(self):
+		super(Provider, self).__init__("", "")
+		self.site = "http://epg.example.com"
+		self.today = syncTime().replace(hour=0, minute=0, second=0, microsecond=0)
+		self.urlopener = Opener(self.today)
+		self.requests = []
+
+	def getJsonData(self, url, params, name='', fromauth=None):
+		self.requests.append((url, params))
+		return {'data': []}
+
+
+class TestPlaylistGuide(unittest.TestCase):
+	def setUp(self):
+		self.db = Provider()
+		self.db._parsePlaylist(list(PLAYLIST))
+		self.cid = self.db.tvg_ids[1][0]
+
+	def test_day_epg(self):
+		self.db._loadXmltv()
+		self.assertEqual(len(self.db.getDayEpg(self.cid, self.db.today)), 24)
+		self.assertEqual(self.db.requests, [])
+		# days that are not kept from the guide and channels without guide are requested from server
+		self.db.getDayEpg(self.cid, self.db.today + timedelta(3))
+		self.db.getDayEpg(self.db.tvg_ids[2][0], self.db.today)
+		self.assertEqual(len(self.db.requests), 2)
+
+	def test_reload(self):
+		self.db._loadXmltv()
+		self.db.urlopener.shift = 30 * 60
+		self.db._loadXmltv()
+		programs = self.db.getDayEpg(self.cid, self.db.today)
+		self.assertEqual(len(programs), 24)
+		self.assertEqual(toTimestamp(programs[0].begin), toTimestamp(self.db.today) + 30 * 60)
+
+	def test_playlist_reload(self):
+		self.assertEqual(self.db.xmltv_urls, ["http://example.com/guide.xml"])
+		self.db._parsePlaylist(PLAYLIST[1:])
+		self.assertEqual((self.db.xmltv_urls, self.db._xmltv_ids), ([], {}))
+
+	def test_same_names(self):
+		self.db._loadXmltv()
+		cids = [cid for cid, c in self.db.channels.items() if c.name == "Third"]
+		self.assertEqual(len(cids), 2)
+		for cid in cids:
+			self.assertEqual(len(self.db.getDayEpg(cid, self.db.today)), 24)
+		self.assertEqual(self.db.requests, [])
+
+	def test_disabled(self):
+		self.patch(Provider, 'XMLTV', False)
+		self.db._parsePlaylist(list(PLAYLIST))
+		self.assertEqual(self.db.xmltv_urls, [])
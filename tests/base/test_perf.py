@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+#  enigma2 iptv player
+#
+#  Copyright (c) 2018 Alex Maystrenko <alexeytech@gmail.com>
+#
+# This is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation; either version 2, or (at your option) any later
+# version.
+
+from __future__ import print_function
+
+from twisted.trial import unittest
+from src import perf
+
+
+class TestPerf(unittest.TestCase):
+	def setUp(self):
+		self.was_enabled = perf.enabled
+		perf.registry.reset()
+
+	def tearDown(self):
+		perf.enabled = self.was_enabled
+		perf.registry.reset()
+
+	def test_disabled(self):
+		perf.enabled = False
+
+		@perf.timed('f')
+		def f(x):
+			return x * 2
+
+		self.assertEqual(f(2), 4)
+		perf.count('c')
+		with perf.span('s'):
+			pass
+		self.assertEqual(perf.snapshot()['counters'], {})
+		self.assertEqual(perf.snapshot()['histograms'], {})
+
+	def test_enabled(self):
+		perf.enabled = True
+
+		@perf.timed('f')
+		def f():
+			raise ValueError()
+
+		self.assertRaises(ValueError, f)
+		self.assertRaises(ValueError, f)
+		perf.count('c', 3)
+		perf.count('c')
+		with perf.span('s'):
+			pass
+		snapshot = perf.snapshot()
+		self.assertEqual(snapshot['counters'], {'c': 4})
+		self.assertEqual(snapshot['histograms']['f']['count'], 2)
+		self.assertEqual(snapshot['histograms']['s']['count'], 1)
+		self.assertEqual(sum(snapshot['histograms']['f']['buckets'].values()), 2)
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+#  enigma2 iptv player
+#
+#  Copyright (c) 2018 Alex Maystrenko <alexeytech@gmail.com>
+#
+# This is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation; either version 2, or (at your option) any later
+# version.
+
+from __future__ import print_function
+
+import os
+import shutil
+from twisted.internet.defer import Deferred, CancelledError, succeed
+from twisted.trial import unittest
+
+from src.lib import tv
+from src.common import DownloadException
+from src.lib.tv import PiconCache, DownloadScheduler, PRIORITY_HIGH
+
+PICON_SIZE = 400
+
+
+class Downloader(object):
+	def __init__(self):
+		self.urls = []
+
+	def __call__(self, url, path, headers=None):
+		self.urls.append(url)
+		with open(path, 'wb') as f:
+			f.write(b'x' * PICON_SIZE)
+		return succeed(None)
+
+
+class PendingDownloader(object):
+	def __init__(self):
+		self.running = {}
+		self.cancelled = []
+
+	def __call__(self, url, path, headers=None):
+		if '://' not in url:
+			return None
+		d = self.running[url] = Deferred(lambda _d: self.cancelled.append(url))
+		return d
+
+	def finish(self, url):
+		self.running.pop(url).callback(None)
+
+
+class TestDownloadScheduler(unittest.TestCase):
+	def setUp(self):
+		self.download = PendingDownloader()
+		self.patch(tv, 'downloadPage', self.download)
+		self.scheduler = DownloadScheduler(max_active=3, max_per_host=2)
+
+	def test_limits(self):
+		for url in ["http://a/1", "http://a/2", "http://a/3", "http://b/1", "http://c/1"]:
+			self.scheduler.download(url, None)
+		self.assertEqual(sorted(self.download.running), ["http://a/1", "http://a/2", "http://b/1"])
+		self.download.finish("http://a/1")
+		self.assertEqual(sorted(self.download.running), ["http://a/2", "http://a/3", "http://b/1"])
+		self.download.finish("http://b/1")
+		self.assertEqual(sorted(self.download.running), ["http://a/2", "http://a/3", "http://c/1"])
+
+	def test_priority(self):
+		self.scheduler.max_active = 1
+		self.scheduler.download("http://a/1", None)
+		self.scheduler.download("http://b/1", None)
+		self.scheduler.download("http://c/1", None, priority=PRIORITY_HIGH)
+		d = self.scheduler.download("http://d/1", None)
+		self.scheduler.raisePriority(d, PRIORITY_HIGH)
+		finished = []
+		for _ in range(4):
+			url = list(self.download.running)[0]
+			finished.append(url)
+			self.download.finish(url)
+		self.assertEqual(finished, ["http://a/1", "http://c/1", "http://d/1", "http://b/1"])
+
+	def test_cancel(self):
+		self.scheduler.max_active = 1
+		running = self.scheduler.download("http://a/1", None)
+		queued = self.scheduler.download("http://b/1", None)
+		queued.cancel()
+		self.assertEqual(self.download.cancelled, [])
+		running.cancel()
+		self.assertEqual(self.download.cancelled, ["http://a/1"])
+		self.assertEqual((self.scheduler._running, self.scheduler._hosts), (0, {}))
+		self.assertFailure(queued, CancelledError)
+		return self.assertFailure(running, CancelledError)
+
+	def test_bad_url(self):
+		return self.assertFailure(self.scheduler.download("bad url", None), DownloadException)
+
+
+class TestPiconCache(unittest.TestCase):
+	def setUp(self):
+		self.path = os.path.abspath(self.mktemp()) + '/'
+		self.download = Downloader()
+		self.patch(tv, 'downloadPage', self.download)
+		self.patch(tv, 'scheduler', DownloadScheduler())
+		self.cache = self.createCache()
+
+	def createCache(self):
+		cache = PiconCache()
+		self.addCleanup(cache._save_timer.stop)
+		cache.setLocation(self.path, 1000)
+		return cache
+
+	def get(self, url, cache=None):
+		result = []
+		(cache or self.cache).get(url).addCallback(result.append)
+		return result[0]
+
+	def test_lru(self):
+		for i in range(3):
+			self.assertEqual(self.get("http://host/%d.png" % i), self.path + PiconCache.key("http://host/%d.png" % i))
+		self.assertEqual(self.cache.size, 2 * PICON_SIZE)
+		self.get("http://host/1.png")
+		self.get("http://host/0.png")
+		self.assertEqual(len(self.download.urls), 4)
+		self.assertEqual(list(self.cache.picons), [PiconCache.key("http://host/%d.png" % i) for i in (1, 0)])
+
+	def test_hit(self):
+		self.get("http://host/0.png")
+		self.get("http://host/1.png")
+		self.cache.saveIndex()
+		self.assertFalse(self.cache._dirty)
+		self.get("http://host/1.png")
+		self.assertFalse(self.cache._dirty)
+		self.get("http://host/0.png")
+		self.assertTrue(self.cache._dirty)
+		self.assertEqual(len(self.download.urls), 2)
+
+	def test_save_index(self):
+		for i in range(2):
+			self.get("http://host/%d.png" % i)
+		self.cache.saveIndex()
+		self.assertEqual(sorted(os.listdir(self.path)), sorted(list(self.cache.picons) + [PiconCache.INDEX_FILE]))
+		cache = self.createCache()
+		self.get("http://host/0.png", cache)
+		self.assertEqual(dict(cache.picons), dict(self.cache.picons))
+		self.assertEqual(len(self.download.urls), 2)
+
+	def test_rebuild_index(self):
+		self.get("http://host/0.png")
+		cache = self.createCache()
+		self.get("http://host/0.png", cache)
+		self.assertEqual(len(self.download.urls), 1)
+		self.assertEqual(cache.picons[PiconCache.key("http://host/0.png")][0], "http://host/0.png")
+		self.assertTrue(cache._dirty)
+
+	def test_scaled(self):
+		self.patch(tv, 'Image', object())
+		self.patch(tv, 'scalePicon', lambda src, dst, width, height: shutil.copy(src, dst))
+		original = self.get("http://host/0.png")
+		scaled = original[:-len(".png")] + "_100x60.png"
+
+		def check(result):
+			self.assertEqual(result, (scaled, True))
+			self.assertEqual(self.cache.size, 2 * PICON_SIZE)
+			return self.cache.getScaled("http://host/0.png", 100, 60).addCallback(self.assertEqual, (scaled, True))
+		return self.cache.getScaled("http://host/0.png", 100, 60).addCallback(check)
+
+	def test_prefetch(self):
+		self.cache.prefetch(["http://host/0.png", None, "http://host/1.png"])
+		self.assertEqual(self.download.urls, ["http://host/0.png", "http://host/1.png"])
+		self.assertEqual(self.cache._prefetch, [])
+		self.cache.prefetch(["http://host/1.png"])
+		self.assertEqual(len(self.download.urls), 2)
+
+	def test_scale_failed(self):
+		def scale(src, dst, width, height):
+			open(dst, 'wb').close()
+			raise IOError("broken picon")
+
+		self.patch(tv, 'Image', object())
+		self.patch(tv, 'scalePicon', scale)
+		original = self.get("http://host/0.png")
+
+		def check(result):
+			self.assertEqual(result, (original, False))
+			self.assertEqual(os.listdir(self.path), [os.path.basename(original)])
+		return self.cache.getScaled("http://host/0.png", 100, 60).addCallback(check)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+#  enigma2 iptv player
+#
+#  Copyright (c) 2018 Alex Maystrenko <alexeytech@gmail.com>
+#
+# This is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation; either version 2, or (at your option) any later
+# version.
+
+from __future__ import print_function
+
+import json
+from threading import Lock
+from twisted.trial import unittest
+
+from src.api.sharavoz import OTTProvider
+from src.utils import syncTime, toTimestamp
+
+
+class Provider(OTTProvider):
+	EPG_THREADS = 2
+
+	def __init__(self):
+		super(Provider, self).__init__("user", "")
+		self.site = "http://epg.example.com/api"
+		self.tvg_map = {}
+		self.requests = []
+		self._requests_lock = Lock()
+		playlist = [b'#EXTM3U']
+		for i in range(6):
+			# two channels for each teleguide id
+			playlist.append(b'#EXTINF:-1 tvg-id="%d",Channel %d' % (i // 2 + 1, i))
+			playlist.append(b'http://host/%d/mpegts' % (100 + i))
+		self._parsePlaylist(playlist)
+
+	def readHttp(self, request):
+		with self._requests_lock:
+			self.requests.append(request)
+		if "epg=3&" in request:
+			return b""
+		t = toTimestamp(syncTime())
+		return json.dumps({'epg_data': [
+			{'time': t - 600, 'time_to': t + 600, 'name': "Now", 'descr': ""},
+			{'time': t + 600, 'time_to': t + 1200, 'name': "Next", 'descr': ""},
+		]}).encode('utf-8')
+
+
+class TestSharavozEpg(unittest.TestCase):
+	def setUp(self):
+		self.db = Provider()
+
+	def test_channels_epg(self):
+		epg = dict(self.db.getChannelsEpg(list(self.db.channels)))
+		self.assertEqual(sorted(epg), [100, 101, 102, 103])
+		self.assertEqual([e.name for e in epg[100]], ["Now"])
+		self.assertEqual(len(self.db.requests), 3)
+		# the whole day is kept, only the teleguide id without program is requested again
+		self.assertEqual(len(dict(self.db.getChannelsEpg(list(self.db.channels)))), 4)
+		self.assertEqual(len(self.db.requests), 4)
+		self.assertIn("epg=3&", self.db.requests[-1])
+
+	def test_day_epg(self):
+		list(self.db.getChannelsEpg([101]))
+		self.assertEqual([e.name for e in self.db.getDayEpg(101, syncTime())], ["Now", "Next"])
+		self.assertEqual(len(self.db.requests), 1)
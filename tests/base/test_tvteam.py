@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+#  enigma2 iptv player
+#
+#  Copyright (c) 2018 Alex Maystrenko <alexeytech@gmail.com>
+#
+# This is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation; either version 2, or (at your option) any later
+# version.
+
+from __future__ import print_function
+
+from datetime import datetime, timedelta
+from twisted.trial import unittest
+
+from src.api import tvteam
+from src.api.tvteam import OTTProvider, TokenPool
+from src.utils import toTimestamp, APIException
+
+DAY = datetime(2020, 5, 1)
+
+
+class Provider(OTTProvider):
+	def __init__(self):
+		super(Provider, self).__init__("user", "")
+		self.site = "http://tvteam.example.com/api/?"
+		self.requests = []
+		self.days = 2
+
+	def _getJson(self, url, params, reauth=True):
+		self.requests.append(params['apiAction'])
+		if params['apiAction'] == 'getRandomTokens':
+			assert self.lock._is_owned(), "session is used without lock"
+			return {'tokens': ["token%d" % i for i in range(params['cnt'])]}
+		t = toTimestamp(DAY)
+		programs = [{
+			'prStartSec': t + i * 3 * 3600, 'prStopSec': t + (i + 1) * 3 * 3600,
+			'prTitle': "Program %d" % i, 'prSubTitle': "",
+		} for i in range(self.days * 8)]
+		return {'tvProgram': list(reversed(programs))}
+
+
+class TestSchedule(unittest.TestCase):
+	def setUp(self):
+		self.now = [1000.0]
+		self.patch(tvteam, 'time', lambda: self.now[0])
+		self.db = Provider()
+
+	def test_slice(self):
+		for i in range(2):
+			programs = self.db.getDayEpg(1, DAY + timedelta(i, hours=15))
+			self.assertEqual([p.name for p in programs], ["Program %d" % (i * 8 + j) for j in range(8)])
+		self.assertEqual(self.db.requests, ['getTvProgram'])
+
+	def test_beyond_horizon(self):
+		self.db.getDayEpg(1, DAY)
+		self.assertEqual(self.db.getDayEpg(1, DAY + timedelta(2)), [])
+		self.assertEqual(len(self.db.requests), 1)
+		self.db.days = 3
+		self.now[0] += OTTProvider.SCHEDULE_RETRY + 1
+		self.assertEqual(len(self.db.getDayEpg(1, DAY + timedelta(2))), 8)
+		self.assertEqual(len(self.db.requests), 2)
+
+	def test_ttl(self):
+		self.db.getDayEpg(1, DAY)
+		self.now[0] += OTTProvider.SCHEDULE_RETRY + 1
+		self.db.getDayEpg(1, DAY)
+		self.assertEqual(len(self.db.requests), 1)
+		self.now[0] += OTTProvider.SCHEDULE_TTL
+		self.db.getDayEpg(1, DAY)
+		self.assertEqual(len(self.db.requests), 2)
+
+
+class SyncThread(object):
+	def __init__(self, target):
+		self.target = target
+		self.daemon = False
+
+	def start(self):
+		self.target()
+
+
+class TestTokenPool(unittest.TestCase):
+	def setUp(self):
+		self.now = [1000.0]
+		self.patch(tvteam, 'time', lambda: self.now[0])
+		self.patch(tvteam, 'Thread', SyncThread)
+		self.patch(TokenPool, 'BATCH', 3)
+		self.patch(TokenPool, 'LOW_WATER', 1)
+		self.downloads = 0
+		self.pool = TokenPool(self.download)
+
+	def download(self, count):
+		self.downloads += 1
+		return ["%d-%d" % (self.downloads, i) for i in range(count)]
+
+	def test_take(self):
+		self.assertEqual([self.pool.take() for _ in range(3)], ["1-0", "1-1", "1-2"])
+		# refill was started when the last one was taken
+		self.assertEqual(self.downloads, 2)
+		self.assertEqual(self.pool.take(), "2-0")
+
+	def test_stale(self):
+		self.pool.take()
+		self.now[0] += TokenPool.TTL + 1
+		self.assertEqual(self.pool.take(), "2-0")
+
+	def test_empty(self):
+		self.pool = TokenPool(lambda count: [])
+		self.assertRaises(APIException, self.pool.take)
+
+	def test_provider_lock(self):
+		db = Provider()
+		db._tokens.refill()
+		self.assertEqual(db._tokens.take(), "token0")
+		self.assertEqual(db.requests, ['getRandomTokens'])
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+#  enigma2 iptv player
+#
+#  Copyright (c) 2018 Alex Maystrenko <alexeytech@gmail.com>
+#
+# This is free software; you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free
+# Software Foundation; either version 2, or (at your option) any later
+# version.
+
+from __future__ import print_function
+
+import zlib
+from io import BytesIO
+from twisted.trial import unittest
+
+from src.api.xmltv import parseTime, iterProgrammes, openGuide
+
+GUIDE = b"""<?xml version="1.0" encoding="utf-8"?>
+<tv>
+<channel id="first"><display-name>First</display-name></channel>
+<channel id="2"><display-name lang="ru">Second</display-name></channel>
+<channel id="3"><display-name>Third</display-name></channel>
+<programme start="20200501120000 +0000" stop="20200501130000 +0000" channel="first">
+<title>News</title><desc>Daily news</desc></programme>
+<programme start="20200501120000 +0300" stop="20200501124500 +0300" channel="2"><title>Film</title></programme>
+<programme start="20200501120000 +0300" stop="20200501124500 +0300" channel="3"><title>Skipped</title></programme>
+</tv>
+"""
+
+
+class TestXmltv(unittest.TestCase):
+	def test_time(self):
+		self.assertEqual(parseTime("20200501120000 +0000"), 1588334400)
+		self.assertEqual(parseTime("20200501120000 +0300"), 1588334400 - 3 * 3600)
+		self.assertEqual(parseTime("20200501120000 -0130"), 1588334400 + 90 * 60)
+		self.assertEqual(parseTime("20200501120000"), 1588334400)
+
+	def test_programmes(self):
+		z = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+		gz = z.compress(GUIDE) + z.flush()
+		f = openGuide(BytesIO(gz), "http://example.com/guide.xml.gz?key=1")
+		programmes = list(iterProgrammes(f, {'first': 1}, {'second': 2}))
+		self.assertEqual(programmes, [
+			(1, 1588334400, 1588338000, "News", "Daily news"),
+			(2, 1588323600, 1588326300, "Film", ""),
+		])
@@ -20,9 +20,13 @@
 
 
 from __future__ import print_function
+import re
 import socket
-from six.moves import urllib_request, urllib_parse
-from time import sleep
+import threading
+from six.moves import urllib_request, urllib_parse, queue
+from time import sleep, time
+from bisect import bisect_left
+import json
 from datetime import datetime
 from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
 from six.moves.socketserver import ThreadingMixIn
@@ -37,16 +41,19 @@ if version_info[0] >= 3:
 SUPPORTED_VERSION = 3
 USER_AGENT = "hlsgw/0.1"
 PORT_NUMBER = 7001
+CLIENT_QUEUE_SIZE = 256  # chunks buffered per client, data is skipped for the client while its queue is full
+CLIENT_STALL_TIMEOUT = 30  # seconds a client may not read before it is dropped
+CLIENT_TIMEOUT = 60  # seconds without data from upstream before the client is released
 
+log = logging.getLogger('hlsgw')
 
-def getBestBitrate(variants, bitrate=0):
-	"""return the (uri, dict) of the best matching playlist"""
-	_, best = min((abs(int(x[1][0].split('=')[1]) - bitrate), x) for x in variants)
-	return best[0]
 
-
-def readM3U8Chunks(URL, duration=30, chunk_size=1024*4):
-	req = urllib_request.Request(url=URL, headers={'User-Agent': USER_AGENT})
+def readM3U8Chunks(URL, duration=30, chunk_size=1024*4, byterange=None):
+	headers = {'User-Agent': USER_AGENT}
+	if byterange is not None:
+		length, offset = byterange
+		headers['Range'] = 'bytes=%d-%d' % (offset, offset + length - 1)
+	req = urllib_request.Request(url=URL, headers=headers)
 	conn = urllib_request.urlopen(url=req, timeout=60)
 	while True:
 		data = conn.read(chunk_size)
@@ -94,123 +101,379 @@ def getM3U8Lines_iterator(url):
 				yield l.rstrip('\r\n').decode(enc)
 
 
-def parseM3U8Tag(line):
-	if ':' not in line:
-		return line, []
-	tag, attribstr = line.split(':', 1)
-	attribs = []
-	last = 0
-	quote = False
-	for i, c in enumerate(attribstr+','):
-		if c == '"':
-			quote = not quote
-		if quote:
-			continue
-		if c == ',':
-			attribs.append(attribstr[last:i])
-			last = i+1
-	return tag, attribs
-
-
-def parseM3U8KeyValue(attribs, known_keys=None):
-	d = {}
-	for item in attribs:
-		k, v = item.split('=', 1)
-		k = k.strip()
-		v = v.strip().strip('"')
-		if known_keys is not None and k not in known_keys:
-			raise ValueError("unknown attribute %s" % k)
-		d[k] = v
-	return d
-
-
-def getM3U8MediaList(url):
-	seq = 0
-	duration = 5
-	targetduration = 5
-	for line in getM3U8Lines_iterator(url):
-		if line.startswith('#EXT'):
-			tag, attribs = parseM3U8Tag(line)
-			if tag == '#EXTINF':
-				duration = float(attribs[0])
-			elif tag == '#EXT-X-TARGETDURATION':
-				targetduration = int(attribs[0])
-			elif tag == '#EXT-X-MEDIA-SEQUENCE':
-				seq = int(attribs[0])
-			elif tag == '#EXT-X-ENDLIST':
-				assert not attribs
-				yield None
-				return
-			elif tag == '#EXT-X-VERSION':
-				assert len(attribs) == 1
-				if int(attribs[0]) > SUPPORTED_VERSION:
-					log.warn(
-						"file version %s exceeds supported version %d; some things might be broken",
-						attribs[0], SUPPORTED_VERSION)
-			else:
-				pass
-		else:
-			seq += 1
-			yield (seq, duration, targetduration, line)
+# HLS playlist parser
+
+ATTRIBUTE_RE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+
+def parseAttributeList(value):
+	"""
+	Parse attribute-list of the tag into dict, quoted-string values are unquoted
+	:type value: str
+	:rtype: dict
+	"""
+	return dict((k, v[1:-1] if v[:1] == '"' else v) for k, v in ATTRIBUTE_RE.findall(value))
+
 
+def parseByteRange(value, last_end):
+	"""Return (length, offset) tuple from <n>[@<o>] notation"""
+	length, _, offset = value.partition('@')
+	if offset:
+		return int(length), int(offset)
+	return int(length), last_end
 
-def serveHLS(url, write_cb, bitrate=0):
-	variants = []
-	variant = None
-	for line in getM3U8Lines_iterator(url):
-		if line.startswith('#EXT'):
-			tag, attribs = parseM3U8Tag(line)
-			if tag == '#EXT-X-STREAM-INF':
-				variant = [v for v in attribs if v.startswith('BANDWIDTH')]
-		elif variant:
-			variants.append((line, variant))
-			variant = None
 
-	root_url = url
+class Key(object):
+	__slots__ = ('method', 'uri', 'iv')
 
-	last_seq = -1
-	targetduration = 5
+	def __init__(self, method, uri=None, iv=None):
+		self.method = method
+		self.uri = uri
+		self.iv = iv
+
+	def __repr__(self):
+		return "Key(%s, %s)" % (self.method, self.uri)
+
+
+class Variant(object):
+	__slots__ = ('uri', 'bandwidth', 'average_bandwidth', 'resolution', 'codecs', 'attrs')
+
+	def __init__(self, uri, attrs):
+		self.uri = uri
+		self.attrs = attrs
+		self.bandwidth = int(attrs.get('BANDWIDTH', 0))
+		self.average_bandwidth = int(attrs.get('AVERAGE-BANDWIDTH', 0)) or self.bandwidth
+		self.resolution = attrs.get('RESOLUTION')
+		self.codecs = attrs.get('CODECS')
+
+	def __repr__(self):
+		return "Variant(%d, %s)" % (self.bandwidth, self.uri)
+
+
+class Segment(object):
+	__slots__ = ('seq', 'uri', 'duration', 'title', 'discontinuity', 'key', 'byterange', 'program_date_time')
+
+	def __init__(
+			self, seq, uri, duration, title='', discontinuity=False, key=None, byterange=None, program_date_time=None):
+		self.seq = seq
+		self.uri = uri
+		self.duration = duration
+		self.title = title
+		self.discontinuity = discontinuity
+		self.key = key
+		self.byterange = byterange
+		self.program_date_time = program_date_time
+
+	def __repr__(self):
+		return "Segment(%d, %.3f, %s)" % (self.seq, self.duration, self.uri)
+
+
+class MasterPlaylist(object):
+	def __init__(self, url):
+		self.url = url
+		self.version = 1
+		self.variants = []  # type: List[Variant]
+		self.media = []  # type: List[dict]
+
+	def bestVariant(self, bitrate=0):
+		"""Return variant with bandwidth closest to the bitrate, lowest one when bitrate is unknown"""
+		return min(self.variants, key=lambda v: abs(v.bandwidth - bitrate))
+
+	def renditionUri(self):
+		"""
+		Uri of the alternative rendition to play when master has no variants, default one is preferred
+		:rtype: str|None
+		"""
+		renditions = [m for m in self.media if m.get('URI')]
+		if not renditions:
+			return None
+		rendition = next((m for m in renditions if m.get('DEFAULT') == 'YES'), renditions[0])
+		return urllib_parse.urljoin(self.url, rendition['URI'])
+
+
+class MediaPlaylist(object):
+	LIVE_EDGE_SEGMENTS = 3  # start live playback no earlier than three segments from the end
+
+	def __init__(self, url):
+		self.url = url
+		self.version = 1
+		self.target_duration = 5
+		self.media_sequence = 0
+		self.discontinuity_sequence = 0
+		self.playlist_type = None
+		self.endlist = False
+		self.segments = []  # type: List[Segment]
+
+	def isLive(self):
+		return not self.endlist and self.playlist_type != 'VOD'
+
+	def firstSeq(self):
+		return self.media_sequence
+
+	def lastSeq(self):
+		return self.media_sequence + len(self.segments) - 1
+
+	def duration(self):
+		return sum(s.duration for s in self.segments)
+
+	def liveStart(self):
+		"""Sequence number where playback of the live playlist should begin"""
+		if not self.isLive():
+			return self.media_sequence
+		return self.media_sequence + max(0, len(self.segments) - self.LIVE_EDGE_SEGMENTS)
+
+	def newSegments(self, last_seq):
+		"""
+		Return segments following last_seq. Sequence numbers are contiguous,
+		so the position is computed instead of scanning the whole list.
+		:type last_seq: int|None
+		:rtype: List[Segment]
+		"""
+		if last_seq is None or last_seq > self.lastSeq() + len(self.segments):
+			# first load, or upstream restarted numbering
+			return self.segments[self.liveStart() - self.media_sequence:]
+		return self.segments[max(0, last_seq - self.media_sequence + 1):]
+
+
+def parsePlaylist(lines, url):
+	"""
+	Parse lines of m3u8 file into MasterPlaylist or MediaPlaylist.
+	Relative uris are resolved against url.
+	:rtype: MasterPlaylist|MediaPlaylist
+	"""
+	master = MasterPlaylist(url)
+	media = MediaPlaylist(url)
+	segments = media.segments
+	is_master = False
+
+	duration = 0.0
+	title = ''
+	discontinuity = False
+	key = None
+	byterange = None
+	byterange_end = {}
+	program_date_time = None
+	stream_inf = None
+	seq = None
+
+	for line in lines:
+		if not line:
+			continue
+		if line[0] != '#':
+			uri = urllib_parse.urljoin(url, line.strip())
+			if stream_inf is not None:
+				master.variants.append(Variant(uri, stream_inf))
+				stream_inf = None
+				continue
+			if seq is None:
+				seq = media.media_sequence
+			if byterange is not None:
+				length, offset = byterange
+				if offset is None:
+					offset = byterange_end.get(uri, 0)
+				byterange = (length, offset)
+				byterange_end[uri] = offset + length
+			segments.append(Segment(seq, uri, duration, title, discontinuity, key, byterange, program_date_time))
+			seq += 1
+			title = ''
+			discontinuity = False
+			byterange = None
+			program_date_time = None
+			continue
+
+		tag, _, value = line.partition(':')
+		if tag == '#EXTINF':
+			d, _, title = value.partition(',')
+			duration = float(d)
+		elif tag == '#EXT-X-BYTERANGE':
+			byterange = parseByteRange(value, None)
+		elif tag == '#EXT-X-KEY':
+			attrs = parseAttributeList(value)
+			method = attrs.get('METHOD', 'NONE')
+			if method == 'NONE':
+				key = None
+			else:
+				key_uri = attrs.get('URI')
+				key = Key(method, key_uri and urllib_parse.urljoin(url, key_uri), attrs.get('IV'))
+		elif tag == '#EXT-X-DISCONTINUITY':
+			discontinuity = True
+		elif tag == '#EXT-X-PROGRAM-DATE-TIME':
+			program_date_time = value
+		elif tag == '#EXT-X-STREAM-INF':
+			is_master = True
+			stream_inf = parseAttributeList(value)
+		elif tag == '#EXT-X-MEDIA':
+			is_master = True
+			master.media.append(parseAttributeList(value))
+		elif tag == '#EXT-X-TARGETDURATION':
+			media.target_duration = int(value)
+		elif tag == '#EXT-X-MEDIA-SEQUENCE':
+			media.media_sequence = int(value)
+		elif tag == '#EXT-X-DISCONTINUITY-SEQUENCE':
+			media.discontinuity_sequence = int(value)
+		elif tag == '#EXT-X-PLAYLIST-TYPE':
+			media.playlist_type = value
+		elif tag == '#EXT-X-ENDLIST':
+			media.endlist = True
+		elif tag == '#EXT-X-VERSION':
+			media.version = master.version = int(value)
+			if media.version > SUPPORTED_VERSION:
+				log.warn(
+					"file version %s exceeds supported version %d; some things might be broken",
+					value, SUPPORTED_VERSION)
+
+	if is_master:
+		return master
+	return media
+
+
+def loadPlaylist(url, stats=None):
+	t = time()
+	playlist = parsePlaylist(getM3U8Lines_iterator(url), url)
+	if stats is not None:
+		stats.playlistLoaded(time() - t)
+	return playlist
+
+
+class SessionStats(object):
+	"""
+	Counters of a single upstream session, updated by the reader thread.
+	Only plain attribute updates are done on the hot path, snapshot is built on request.
+	"""
+	LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0)  # seconds, last bucket is +inf
+
+	def __init__(self, url):
+		self.url = url
+		self.variant = None
+		self.started = time()
+		self.segments = 0
+		self.latency = [0] * (len(self.LATENCY_BUCKETS) + 1)
+		self.latency_sum = 0.0
+		self.bytes_in = 0
+		self.bytes_out = 0
+		self.stalls = 0
+		self.empty_reloads = 0
+		self.reloads = 0
+		self.reload_lag = 0.0
+		self.reload_lag_max = 0.0
+
+	def segmentFetched(self, seconds, size):
+		self.segments += 1
+		self.latency[bisect_left(self.LATENCY_BUCKETS, seconds)] += 1
+		self.latency_sum += seconds
+		self.bytes_in += size
+
+	def playlistLoaded(self, seconds):
+		self.reloads += 1
+		self.reload_lag = seconds
+		if seconds > self.reload_lag_max:
+			self.reload_lag_max = seconds
+
+	def toJson(self, clients):
+		"""
+		:param clients: list of client queues, to report buffer fill
+		"""
+		labels = ["%g" % b for b in self.LATENCY_BUCKETS] + ["inf"]
+		return {
+			"url": self.url,
+			"variant": self.variant,
+			"uptime": round(time() - self.started, 1),
+			"segments": self.segments,
+			"segment_latency": dict(zip(labels, self.latency)),
+			"segment_latency_avg": round(self.latency_sum / self.segments, 3) if self.segments else None,
+			"bytes_in": self.bytes_in,
+			"bytes_out": self.bytes_out,
+			"stalls": self.stalls,
+			"empty_reloads": self.empty_reloads,
+			"reloads": self.reloads,
+			"reload_lag": round(self.reload_lag, 3),
+			"reload_lag_max": round(self.reload_lag_max, 3),
+			"clients": len(clients),
+			"buffer_fill": [q.qsize() for q in clients],
+			"buffer_size": CLIENT_QUEUE_SIZE,
+		}
+
+
+def serveHLS(url, write_cb, bitrate=0, stats=None):
+	if stats is None:
+		stats = SessionStats(url)
+	playlist = loadPlaylist(url, stats)
+	media_url = url
+	if not isinstance(playlist, MasterPlaylist):
+		master = None
+		media = playlist
+	elif playlist.variants:
+		master = playlist
+		media = None
+	else:
+		# master with EXT-X-MEDIA renditions only
+		media_url = playlist.renditionUri()
+		if media_url is None:
+			raise Exception("Master playlist without variants and renditions: %s" % url)
+		master = None
+		media = loadPlaylist(media_url, stats)
+
+	last_seq = None
 	media_bytes_total = 0
 	buffering_needed = False
+	changed = 0
+	warned_key = False
 
 	while True:
-		if bitrate:
-			bitrate -= (bitrate // 10)
-		if len(variants):
-			url = urllib_parse.urljoin(root_url, getBestBitrate(variants, bitrate))
+		if master is not None:
+			if bitrate:
+				bitrate -= (bitrate // 10)
+			variant = master.bestVariant(bitrate)
+			stats.variant = {"uri": variant.uri, "bandwidth": variant.bandwidth, "resolution": variant.resolution}
+			media = loadPlaylist(variant.uri, stats)
+		elif media is None:
+			media = loadPlaylist(media_url, stats)
 
 		media_start_time = datetime.now()
 		media_bytes_total = 0
+		duration = media.target_duration
 		if py3:
 			data = b''
 		else:
 			data = ''
-		for media in list(getM3U8MediaList(url)):
-			if media is None:
-				continue
-			seq, duration, targetduration, media_url = media
-			if seq > last_seq:
-				for chunk in readM3U8Chunks(urllib_parse.urljoin(url, media_url), targetduration or duration):
-					data += chunk
-					media_bytes_total += len(chunk)
-					if buffering_needed and len(data) < 15000000 // 8:
-						continue
-					write_cb(data)
-					if py3:
-						data = b''
-					else:
-						data = ''
-					buffering_needed = False
-				if data:
-					write_cb(data)
-					if py3:
-						data = b''
-					else:
-						data = ''
-				last_seq = seq
-				changed = 1
-		if len(variants):
-			bitrate = int((media_bytes_total*8) // (datetime.now() - media_start_time).total_seconds())
+		for segment in media.newSegments(last_seq):
+			if segment.key is not None and not warned_key:
+				log.warn("encrypted stream (%s) is not supported", segment.key.method)
+				warned_key = True
+			if segment.discontinuity:
+				log.debug("discontinuity at %d", segment.seq)
+			duration = segment.duration
+			segment_start = time()
+			segment_bytes = 0
+			for chunk in readM3U8Chunks(segment.uri, media.target_duration or duration, byterange=segment.byterange):
+				data += chunk
+				segment_bytes += len(chunk)
+				if buffering_needed and len(data) < 15000000 // 8:
+					continue
+				write_cb(data)
+				if py3:
+					data = b''
+				else:
+					data = ''
+				buffering_needed = False
+			if data:
+				write_cb(data)
+				if py3:
+					data = b''
+				else:
+					data = ''
+			media_bytes_total += segment_bytes
+			stats.segmentFetched(time() - segment_start, segment_bytes)
+			last_seq = segment.seq
+			changed = 1
+		if not media.isLive() and last_seq is not None and last_seq >= media.lastSeq():
+			return
+		if master is not None:
+			bitrate = int((media_bytes_total*8) // max((datetime.now() - media_start_time).total_seconds(), 0.001))
+		targetduration = media.target_duration
+		media = None
+		if changed < 1:
+			stats.empty_reloads += 1
 		if changed == 1:
 			# initial minimum reload delay
 			delta = (datetime.now() - media_start_time).total_seconds()
@@ -218,6 +481,7 @@ def serveHLS(url, write_cb, bitrate=0):
 				sleep(duration - delta)
 			else:
 				buffering_needed = True
+				stats.stalls += 1
 		elif changed == 0:
 			# first attempt
 			sleep(targetduration*0.5)
@@ -230,12 +494,164 @@ def serveHLS(url, write_cb, bitrate=0):
 		changed -= 1
 
 
+class SessionClosed(Exception):
+	"""Raised from broadcast when the last client left, to stop the upstream reader"""
+
+
+class StreamSession(object):
+	"""
+	Single upstream reader for the url, that broadcasts data to all subscribed clients.
+	Each client has a bounded queue and the reader never waits for it, so a paused client doesn't hold up others.
+	A client whose queue stays full longer than CLIENT_STALL_TIMEOUT is disconnected.
+	"""
+
+	def __init__(self, url, sessions):
+		self.url = url
+		self.closed = False
+		self.stats = SessionStats(url)
+		self._sessions = sessions
+		self._clients = []
+		self._last_put = {}  # client queue -> time when data was queued for it last time
+		self._lock = threading.Lock()
+		self._thread = threading.Thread(target=self.run, name="hls %s" % url)
+		self._thread.daemon = True
+
+	def start(self):
+		self._thread.start()
+
+	def subscribe(self):
+		"""Return client queue, or None when session is already closing"""
+		q = queue.Queue(CLIENT_QUEUE_SIZE)
+		with self._lock:
+			if self.closed:
+				return None
+			self._clients.append(q)
+			self._last_put[q] = time()
+			total = len(self._clients)
+		log.debug("client joined %s, total %d", self.url, total)
+		return q
+
+	def unsubscribe(self, q):
+		with self._lock:
+			try:
+				self._clients.remove(q)
+			except ValueError:
+				pass
+			self._last_put.pop(q, None)
+			total = len(self._clients)
+			if not total:
+				self.closed = True
+		# unblock the reader if it waits for this queue
+		self._drain(q)
+		log.debug("client left %s, total %d", self.url, total)
+
+	def broadcast(self, data):
+		with self._lock:
+			if self.closed:
+				raise SessionClosed()
+			clients = self._clients[:]
+		now = time()
+		delivered = []
+		full = []
+		for q in clients:
+			try:
+				q.put_nowait(data)
+				delivered.append(q)
+			except queue.Full:
+				full.append(q)
+		self.stats.bytes_out += len(data) * len(delivered)
+		with self._lock:
+			for q in delivered:
+				if q in self._last_put:
+					self._last_put[q] = now
+			for q in full:
+				if now - self._last_put.get(q, now) > CLIENT_STALL_TIMEOUT:
+					log.warn("stalled client dropped from %s", self.url)
+					self._clients.remove(q)
+					del self._last_put[q]
+					self._release(q)
+			if not self._clients:
+				self.closed = True
+				raise SessionClosed()
+
+	@staticmethod
+	def _drain(q):
+		while True:
+			try:
+				q.get_nowait()
+			except queue.Empty:
+				break
+
+	@classmethod
+	def _release(cls, q):
+		# free space for the end-of-stream marker, client is stopped anyway
+		cls._drain(q)
+		q.put_nowait(None)
+
+	def statsJson(self):
+		with self._lock:
+			clients = self._clients[:]
+		return self.stats.toJson(clients)
+
+	def run(self):
+		log.debug("Serving HLS url %s", self.url)
+		try:
+			serveHLS(self.url, self.broadcast, stats=self.stats)
+			log.debug("Serving HLS ended")
+		except SessionClosed:
+			log.debug("Serving HLS stopped, no clients left")
+		except Exception:  # pylint: disable=broad-except
+			log.exception("Serving HLS ended with exception")
+		finally:
+			with self._lock:
+				self.closed = True
+				clients, self._clients = self._clients, []
+				self._last_put.clear()
+			for q in clients:
+				self._release(q)
+			self._sessions.remove(self)
+
+
+class SessionManager(object):
+	"""Deduplicate upstream sessions by url"""
+
+	def __init__(self):
+		self._sessions = {}
+		self._lock = threading.Lock()
+
+	def subscribe(self, url):
+		"""Return (session, client queue), session is started when url is requested first time"""
+		with self._lock:
+			session = self._sessions.get(url)
+			q = session and session.subscribe()
+			if q is None:
+				session = self._sessions[url] = StreamSession(url, self)
+				q = session.subscribe()
+				session.start()
+		return session, q
+
+	def remove(self, session):
+		with self._lock:
+			if self._sessions.get(session.url) is session:
+				del self._sessions[session.url]
+
+	def statsJson(self):
+		with self._lock:
+			running = list(self._sessions.values())
+		return {"sessions": [s.statsJson() for s in running]}
+
+
+sessions = SessionManager()
+
+
 class HlsHandler(BaseHTTPRequestHandler):
 	"""This class will handles any incoming request from the browser"""
 
 	def do_GET(self):
 		"""Handler for the GET requests"""
 		try:
+			if self.path == '/stats':
+				return self.sendStats()
 			url = urllib_parse.unquote(self.path)
 			n = url.find('url=')
 			if n == -1 or not len(url[n+4:]):
@@ -248,22 +664,47 @@ class HlsHandler(BaseHTTPRequestHandler):
 			self.send_response(200)
 			self.send_header('Content-type', "video/mp2t")
 			self.end_headers()
-
-			log.debug("Serving HLS url %s", url)
-			serveHLS(url, self.wfile.write)
-			log.debug("Serving HLS ended")
+			self.streamFrom(url)
 		except Exception:  # pylint: disable=broad-except
-			log.exception("Serving HLS ended with exception")
+			log.exception("Serving client ended with exception")
+
+	def sendStats(self):
+		body = json.dumps(sessions.statsJson(), indent=1)
+		if py3:
+			body = body.encode('utf-8')
+		self.send_response(200)
+		self.send_header('Content-type', "application/json")
+		self.send_header('Content-length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def streamFrom(self, url):
+		session, q = sessions.subscribe(url)
+		try:
+			while True:
+				try:
+					data = q.get(timeout=CLIENT_TIMEOUT)
+				except queue.Empty:
+					log.warn("no data from upstream %s", url)
+					return
+				if data is None:
+					return
+				self.wfile.write(data)
+		except socket.error as e:
+			log.debug("client disconnected: %s", e)
+		finally:
+			session.unsubscribe(q)
 
 
 class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
 	"""Handle requests in a separate thread."""
+	daemon_threads = True
 
 
 def serve():
 	try:
 		socket.setdefaulttimeout(30)
-		server = HTTPServer(('127.0.0.1', PORT_NUMBER), HlsHandler)
+		server = ThreadedHTTPServer(('127.0.0.1', PORT_NUMBER), HlsHandler)
 		log.info('Started hls gateway on port %d', PORT_NUMBER)
 		server.serve_forever(poll_interval=3)
 	except KeyboardInterrupt:
@@ -272,7 +713,6 @@ def serve():
 
 
 if __name__ == '__main__':
-	log = logging.getLogger('hlsgw')
 	log.setLevel(logging.DEBUG)
 	log.addHandler(RotatingFileHandler('/tmp/hlsgw.log', maxBytes=10 * 1024))
 	try: